@@ -0,0 +1,6 @@
+"""Benchmarks for fyta_cli.
+
+The benchmarks import the installed fyta_cli, so install it first
+(pip install -e .) or run them from the root of a checkout with
+PYTHONPATH=src, e.g. PYTHONPATH=src python -m benchmarks.run
+"""
@@ -0,0 +1,19 @@
+"""Synthetic plant data for benchmarks."""
+
+from datetime import datetime, timezone
+import random
+from typing import Any
+
+from fyta_cli.fyta_emulator import synthetic_plant
+
+
+def plant_details(count: int, seed: int = 0) -> list[dict[str, Any]]:
+    """Generate the plant details of a fleet of count plants.
+
+    The plants are generated like the plants of the FYTA emulator.
+    """
+
+    rng = random.Random(seed)
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    return [{"plant": synthetic_plant(plant_id, rng, now)} for plant_id in range(count)]
@@ -0,0 +1,65 @@
+"""Memory per Plant: slotted plants with shared thresholds vs plain dataclass.
+
+Run with: PYTHONPATH=src python -m benchmarks.plant_memory [number of plants]
+(or without PYTHONPATH, if fyta_cli is installed)
+"""
+
+from dataclasses import fields, make_dataclass
+import gc
+import json
+import sys
+import tracemalloc
+from typing import Any, Callable
+
+from fyta_cli.fyta_models import Plant
+
+from .fleet import plant_details
+
+# Plant as plain dataclass (with __dict__), as before the compact representation
+DictPlant = make_dataclass("DictPlant", [(f.name, f.type) for f in fields(Plant)])
+
+
+def _copy(value: Any) -> Any:
+    """Copy a value into a new object (undo sharing of floats and strings)."""
+
+    if isinstance(value, float):
+        return value + 0.0
+    if isinstance(value, str) and len(value) > 1:
+        return value[:1] + value[1:]
+    return value
+
+
+def _dict_plant(plant: Plant) -> Any:
+    """Create a plain dataclass plant with unshared values."""
+    return DictPlant(**{f.name: _copy(getattr(plant, f.name)) for f in fields(Plant)})
+
+
+def measure(create: Callable[[], list[Any]]) -> float:
+    """Measure the memory allocated per object by create."""
+
+    gc.collect()
+    tracemalloc.start()
+    objects = create()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return size / len(objects)
+
+
+def run(count: int) -> dict[str, float]:
+    """Compare the memory of count plants."""
+
+    raw_plants = [json.dumps(details["plant"]) for details in plant_details(count)]
+    plants = [Plant.from_dict(json.loads(raw)) for raw in raw_plants]
+
+    return {
+        "plants": count,
+        "dataclass_bytes_per_plant": measure(lambda: [_dict_plant(p) for p in plants]),
+        "compact_bytes_per_plant": measure(
+            lambda: [Plant.from_dict(json.loads(raw)) for raw in raw_plants]
+        ),
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(int(sys.argv[1]) if len(sys.argv) > 1 else 10000), indent=2))
@@ -0,0 +1,293 @@
+"""Benchmark suite for the hot paths of fyta_cli.
+
+Runs offline against the FYTA emulator and prints the results
+as JSON, so that runs of different versions can be compared. Run it from
+the root of a checkout with fyta_cli installed (pip install -e .) or with
+PYTHONPATH=src:
+
+    PYTHONPATH=src python -m benchmarks.run --plants 200 --output results.json
+"""
+
+import argparse
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+import json
+import platform
+import time
+from typing import Any, Callable
+from zoneinfo import ZoneInfo
+
+from fyta_cli.fyta_client import ACCEPT_ENCODING
+from fyta_cli.fyta_emulator import FytaEmulator
+from fyta_cli.fyta_fleet import FleetView
+from fyta_cli.fyta_metrics import MetricsCollector
+from fyta_cli.fyta_models import LazyPlant, Plant
+from fyta_cli.fyta_time import TimestampCodec
+
+from . import plant_memory
+from .fleet import plant_details
+
+
+def bench_from_dict(plants: int, repeat: int = 5) -> dict[str, float]:
+    """Throughput of Plant.from_dict."""
+
+    data = [details["plant"] for details in plant_details(plants)]
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for plant in data:
+            Plant.from_dict(plant)
+        best = min(best, time.perf_counter() - start)
+
+    return {"plants_per_second": plants / best, "seconds_per_plant": best / plants}
+
+
+def bench_lazy_plant(plants: int, repeat: int = 5) -> dict[str, float]:
+    """Throughput of LazyPlant, when 5 fields are accessed (e.g. to forward them)."""
+
+    data = [details["plant"] for details in plant_details(plants)]
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for plant_data in data:
+            plant = LazyPlant.from_raw(plant_data)
+            _ = (
+                plant.plant_id,
+                plant.moisture,
+                plant.temperature,
+                plant.battery_level,
+                plant.last_updated,
+            )
+        best = min(best, time.perf_counter() - start)
+
+    return {"plants_per_second": plants / best, "seconds_per_plant": best / plants}
+
+
+def bench_timestamps(plants: int, repeat: int = 5) -> dict[str, float]:
+    """Conversion of last_updated: fromisoformat + astimezone against the codec.
+
+    "codec_cold" converts new timestamps, "codec_warm" unchanged timestamps
+    (as for plants without new sensor data in the next update).
+    """
+
+    tz = ZoneInfo("Europe/Berlin")
+    values = [
+        details["plant"]["sensor"]["received_data_at"]
+        for details in plant_details(plants)
+    ]
+
+    def best_of(convert: Callable[[str], datetime], fresh: bool) -> float:
+        best = float("inf")
+        for _ in range(repeat):
+            if fresh:
+                convert = TimestampCodec(tz).localize
+            start = time.perf_counter()
+            for value in values:
+                convert(value)
+            best = min(best, time.perf_counter() - start)
+        return best / plants
+
+    warm = TimestampCodec(tz)
+    for value in values:
+        warm.localize(value)
+
+    return {
+        "astimezone_seconds": best_of(
+            lambda value: datetime.fromisoformat(value).astimezone(tz), False
+        ),
+        "codec_cold_seconds": best_of(warm.localize, True),
+        "codec_warm_seconds": best_of(warm.localize, False),
+    }
+
+
+def bench_fleet_view(plants: int, repeat: int = 5) -> dict[str, float]:
+    """Query of the plants outside their moisture bounds: fleet view against loop.
+
+    "view_seconds" is the time to create the view, which pays off over
+    repeated queries.
+    """
+
+    fleet = {
+        plant_id: Plant.from_dict(details["plant"])
+        for plant_id, details in enumerate(plant_details(plants))
+    }
+
+    def loop() -> list[int]:
+        return [
+            plant_id
+            for plant_id, plant in fleet.items()
+            if plant.moisture is not None
+            and (
+                (
+                    plant.moisture_min_good is not None
+                    and plant.moisture < plant.moisture_min_good
+                )
+                or (
+                    plant.moisture_max_good is not None
+                    and plant.moisture > plant.moisture_max_good
+                )
+            )
+        ]
+
+    def best_of(function: Callable[[], Any]) -> float:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    view = FleetView.from_plants(fleet)
+
+    return {
+        "view_seconds": best_of(lambda: FleetView.from_plants(fleet)),
+        "query_seconds": best_of(lambda: view.ids(view.outside("moisture"))),
+        "loop_seconds": best_of(loop),
+    }
+
+
+async def bench_update_all_plants(
+    plants: int, latency: float, max_concurrency: int
+) -> dict[str, float]:
+    """Wall-clock time of update_all_plants against the FYTA emulator."""
+
+    async with FytaEmulator(plants, latency=latency) as emulator:
+        connector = emulator.connector()
+        await connector.login()
+        start = time.perf_counter()
+        await connector.update_all_plants(max_concurrency=max_concurrency)
+        elapsed = time.perf_counter() - start
+        await connector.client.close()
+
+    return {
+        "max_concurrency": max_concurrency,
+        "seconds": elapsed,
+        "requests": sum(emulator.requests.values()) - 1,
+    }
+
+
+async def bench_bytes_on_wire(plants: int) -> dict[str, dict[str, int]]:
+    """Bytes of the responses of update_all_plants, compressed and not.
+
+    The bytes are taken from the Content-Length of the responses, which the
+    emulator sends with all responses (chunked responses would not count).
+    """
+
+    results: dict[str, dict[str, int]] = {}
+    for accept_encoding in ("identity", ACCEPT_ENCODING):
+        collector = MetricsCollector(keep_slowest=0)
+        async with FytaEmulator(plants) as emulator:
+            connector = emulator.connector(instrumentation=collector)
+            connector.client.accept_encoding = accept_encoding
+            await connector.update_all_plants(max_concurrency=16)
+            await connector.client.close()
+
+        results[accept_encoding] = {
+            endpoint: count
+            for (endpoint, _), count in collector.bytes_received.items()
+        }
+
+    return results
+
+
+async def bench_loop_lag(plants: int, executor: Executor | None) -> dict[str, float]:
+    """Maximal event loop lag during update_all_plants (parsing on/off the loop)."""
+
+    async with FytaEmulator(plants) as emulator:
+        connector = emulator.connector(parse_executor=executor)
+        connector.client.request_timeout = 600
+        await connector.login()
+
+        lags: list[float] = []
+
+        async def ticker() -> None:
+            while True:
+                start = time.perf_counter()
+                await asyncio.sleep(0.001)
+                lags.append(time.perf_counter() - start - 0.001)
+
+        task = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        await connector.update_all_plants(max_concurrency=64)
+        elapsed = time.perf_counter() - start
+        task.cancel()
+        await connector.client.close()
+
+    return {
+        "seconds": elapsed,
+        "max_loop_lag": max(lags, default=0.0),
+        "total_loop_lag": sum(lags),
+    }
+
+
+async def bench_login(logins: int, latency: float) -> dict[str, float]:
+    """Time of a login and of the token check of every request."""
+
+    async with FytaEmulator(0, latency=latency) as emulator:
+        connector = emulator.connector()
+
+        start = time.perf_counter()
+        for _ in range(logins):
+            connector.client.access_token = ""
+            await connector.login()
+        login = (time.perf_counter() - start) / logins
+
+        checks = 10000
+        start = time.perf_counter()
+        for _ in range(checks):
+            await connector.client.login()
+        check = (time.perf_counter() - start) / checks
+
+        await connector.client.close()
+
+    return {"seconds_per_login": login, "seconds_per_token_check": check}
+
+
+async def run(args: argparse.Namespace, executor: Executor) -> dict[str, Any]:
+    """Run all benchmarks."""
+
+    return {
+        "python": platform.python_version(),
+        "parameters": vars(args),
+        "plant_from_dict": bench_from_dict(args.plants),
+        "lazy_plant": bench_lazy_plant(args.plants),
+        "timestamps": bench_timestamps(args.plants),
+        "fleet_view": bench_fleet_view(args.plants),
+        "update_all_plants": [
+            await bench_update_all_plants(args.plants, args.latency, concurrency)
+            for concurrency in (1, args.concurrency)
+        ],
+        "loop_lag": {
+            "event_loop": await bench_loop_lag(args.plants, None),
+            "process_pool": await bench_loop_lag(args.plants, executor),
+        },
+        "login": await bench_login(20, args.latency),
+        "bytes_on_wire": await bench_bytes_on_wire(args.plants),
+        "plant_memory": plant_memory.run(args.plants),
+    }
+
+
+def main() -> None:
+    """Run the benchmark suite from the command line."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--plants", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--output", help="file to write the results to")
+    args = parser.parse_args()
+
+    with ProcessPoolExecutor() as executor:
+        list(executor.map(abs, range(64)))  # start the workers
+        results = json.dumps(asyncio.run(run(args, executor)), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(results)
+    print(results)
+
+
+if __name__ == "__main__":
+    main()
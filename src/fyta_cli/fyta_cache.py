@@ -0,0 +1,183 @@
+"""Response caches for FYTA API."""
+
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+DEFAULT_CACHE_TTL: dict[str, float] = {
+    "plant": 60,
+    "measurements": 300,
+}
+
+
+@dataclass
+class CacheEntry:
+    """Cached response of the FYTA API."""
+
+    data: Any
+    stored_at: float
+    etag: str | None = None
+    last_modified: str | None = None
+
+
+class ResponseCache(ABC):
+    """Base class of response caches.
+
+    Entries are keyed by endpoint and plant ID, e.g. "plant/123".
+    Caches with blocking I/O are called in a worker thread by the client,
+    so their methods must be thread-safe.
+    """
+
+    # the client calls the cache in a worker thread, if it blocks (I/O)
+    blocking = True
+
+    @abstractmethod
+    def get(self, key: str) -> CacheEntry | None:
+        """Get a cached response."""
+
+    @abstractmethod
+    def set(self, key: str, entry: CacheEntry) -> None:
+        """Store a response."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove a cached response."""
+
+    def flush(self) -> None:
+        """Write pending changes to the storage."""
+
+    def close(self) -> None:
+        """Release resources of the cache."""
+
+
+class FileResponseCache(ResponseCache):
+    """Response cache storing each entry as JSON file in a directory."""
+
+    def __init__(self, directory: str | Path) -> None:
+        """Initialize file cache."""
+
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        """Path of the file of a cache entry."""
+        return self.directory / f"{key.replace('/', '_')}.json"
+
+    def get(self, key: str) -> CacheEntry | None:
+        """Get a cached response."""
+
+        try:
+            content = self._path(key).read_text(encoding="utf-8")
+            return CacheEntry(**json.loads(content))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        """Store a response."""
+
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp_path.write_text(json.dumps(entry.__dict__), encoding="utf-8")
+        tmp_path.replace(path)
+
+    def delete(self, key: str) -> None:
+        """Remove a cached response."""
+        self._path(key).unlink(missing_ok=True)
+
+
+class SQLiteResponseCache(ResponseCache):
+    """Response cache storing the entries in a SQLite database.
+
+    Changes are committed in batches: after `commit_every` changes or
+    `commit_interval` seconds, and on flush() and close().
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        commit_every: int = 64,
+        commit_interval: float = 1.0,
+    ) -> None:
+        """Initialize SQLite cache."""
+
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, data TEXT, stored_at REAL, "
+            "etag TEXT, last_modified TEXT)"
+        )
+        self.connection.commit()
+
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._committed_at = time.monotonic()
+
+    def get(self, key: str) -> CacheEntry | None:
+        """Get a cached response."""
+
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT data, stored_at, etag, last_modified FROM responses "
+                "WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+
+        return CacheEntry(json.loads(row[0]), row[1], row[2], row[3])
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        """Store a response."""
+
+        data = json.dumps(entry.data)
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, data, entry.stored_at, entry.etag, entry.last_modified),
+            )
+            self._changed()
+
+    def delete(self, key: str) -> None:
+        """Remove a cached response."""
+
+        with self._lock:
+            self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._changed()
+
+    def flush(self) -> None:
+        """Commit pending changes."""
+
+        with self._lock:
+            self._commit()
+
+    def close(self) -> None:
+        """Commit pending changes and close the database."""
+
+        self.flush()
+        self.connection.close()
+
+    def _changed(self) -> None:
+        """Count a change and commit the batch, if it is complete."""
+
+        self._pending += 1
+        if (
+            self._pending >= self.commit_every
+            or time.monotonic() - self._committed_at >= self.commit_interval
+        ):
+            self._commit()
+
+    def _commit(self) -> None:
+        """Commit pending changes (with the lock held)."""
+
+        if self._pending:
+            self.connection.commit()
+            self._pending = 0
+        self._committed_at = time.monotonic()
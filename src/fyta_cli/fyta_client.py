@@ -4,25 +4,73 @@
 
 from __future__ import annotations
 
+import asyncio
+from collections.abc import AsyncIterator, Callable, Coroutine, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar, copy_context
 from datetime import datetime, timedelta, tzinfo
+from functools import partial
+import hashlib
 import logging
-from typing import Any
-
-from aiohttp import BasicAuth, ClientSession, ClientTimeout,ClientResponseError
+import time
+from typing import Any, TypeVar
+
+from aiohttp import (
+    BasicAuth,
+    ClientConnectionError,
+    ClientError,
+    ClientResponse,
+    ClientSession,
+    ClientTimeout,
+)
+from aiohttp import compression_utils
 
+from .fyta_cache import DEFAULT_CACHE_TTL, CacheEntry, ResponseCache
 from .fyta_exceptions import (
     FytaConnectionError,
     FytaAuthentificationError,
     FytaPasswordError,
     FytaPlantError,
+    FytaRateLimitError,
 )
+from .fyta_images import ImageCache
+from .fyta_metrics import Instrumentation, RequestMetric
 from .fyta_models import Credentials
+from .fyta_ratelimit import RetryPolicy, TokenBucket
+from .fyta_stream import iter_json_array
 
 FYTA_AUTH_URL = "https://web.fyta.de/api/auth/login"
 FYTA_PLANT_URL = "https://web.fyta.de/api/user-plant"
 
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# timelines of the measurement history and the periods they cover
+TIMELINE_PERIODS = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+    "month": timedelta(days=30),
+}
+
+# content encodings, which the installed aiohttp can decode
+ACCEPT_ENCODING = ", ".join(
+    encoding
+    for encoding, available in (
+        ("zstd", getattr(compression_utils, "HAS_ZSTD", False)),
+        ("br", compression_utils.HAS_BROTLI),
+        ("gzip", True),
+        ("deflate", True),
+    )
+    if available
+)
+
 _LOGGER = logging.getLogger(__name__)
 
+_T = TypeVar("_T")
+
+# deadline (event loop time) of the requests in the current context
+_DEADLINE: ContextVar[float | None] = ContextVar("fyta_deadline", default=None)
+
 
 class Client:
     """Client class to access FYTA API."""
@@ -53,14 +101,42 @@ class Client:
         else:
             self.session = session
 
-        self._close_session = True
+        self._close_session = session is None
+
+        self.auth_url = FYTA_AUTH_URL
+        self.plant_url = FYTA_PLANT_URL
 
         self.request_timeout = 60
+        self.connect_timeout: float | None = 10
+        self.read_timeout: float | None = 30
+        self.accept_encoding = ACCEPT_ENCODING
+        self.batch_window = 0.0
+        self.request_semaphore: asyncio.Semaphore | None = None
+        self.rate_limiters: list[TokenBucket] = []
+        self.retry_policy: RetryPolicy | None = RetryPolicy()
+        self.stream_plant_list = False
+        self.image_cache: ImageCache | None = None
+        self.token_refresh_margin = timedelta(seconds=60)
+
+        self.cache: ResponseCache | None = None
+        self.cache_ttl: dict[str, float] = DEFAULT_CACHE_TTL.copy()
+
+        self.instrumentation: Instrumentation | None = None
+
+        self._login_task: asyncio.Task[Credentials] | None = None
+        self._plant_requests: dict[int, asyncio.Task[dict[str, Any]]] = {}
+        self._shared_waiters: dict[asyncio.Task[Any], int] = {}
+
+        # request templates, rebuilt when the settings they depend on change
+        self._header_key: tuple[str, str] | None = None
+        self._header: dict[str, str] = {}
+        self._timeout_key: tuple[Any, ...] | None = None
+        self._client_timeout = ClientTimeout()
 
     async def test_connection(self) -> bool:
         """Test the connection to FYTA-Server"""
 
-        response = await self.session.post(FYTA_AUTH_URL)
+        response = await self.session.post(self.auth_url)
         r = await response.text()
 
         if r == '{"message": "Unsupported Media Type"}':
@@ -68,34 +144,101 @@ class Client:
 
         return False
 
-    async def login(self) -> Credentials:
-        """Handle a request to FYTA."""
+    @property
+    def token_valid(self) -> bool:
+        """Check if the access token is valid beyond the refresh margin."""
 
-        if (
+        return (
             self.access_token != ""
-            and self.expiration.timestamp() > datetime.now().timestamp()
-        ):
+            and self._expires_at - self.token_refresh_margin.total_seconds()
+            > time.time()
+        )
+
+    @property
+    def expiration(self) -> datetime:
+        """Expiration of the access token."""
+        return self._expiration
+
+    @expiration.setter
+    def expiration(self, expiration: datetime) -> None:
+        """Set the expiration and keep it as epoch seconds for token_valid."""
+
+        self._expiration = expiration
+        self._expires_at = expiration.timestamp()
+
+    @contextmanager
+    def deadline(self, budget: float | None) -> Iterator[None]:
+        """Limit all requests within the context to a budget of seconds in total.
+
+        The timeouts of the requests are shortened to the remaining budget.
+        Requests, which are not finished when the budget is used up, are
+        cancelled and raise FytaConnectionError. A budget of None sets no
+        deadline.
+        """
+
+        if budget is None:
+            yield
+            return
+
+        deadline = asyncio.get_running_loop().time() + budget
+        if (outer := _DEADLINE.get()) is not None:
+            deadline = min(deadline, outer)
+
+        token = _DEADLINE.set(deadline)
+        try:
+            yield
+        finally:
+            _DEADLINE.reset(token)
+
+    async def login(self) -> Credentials:
+        """Handle a request to FYTA.
+
+        A new access token is requested, if the current token expires within
+        `token_refresh_margin`. Concurrent callers share a single request.
+        """
+
+        if self.token_valid:
             return Credentials(access_token=self.access_token, expiration=self.expiration)
 
+        if self._login_task is None:
+            self._login_task = self._start_shared(self._request_access_token())
+            self._login_task.add_done_callback(self._login_done)
+
+        return await self._wait_shared(
+            self._login_task, "Deadline exceeded while waiting for the access token"
+        )
+
+    def _login_done(self, task: asyncio.Task[Credentials]) -> None:
+        """Reset the pending login request."""
+
+        self._login_task = None
+        if not task.cancelled():
+            task.exception()  # exception is raised to the waiting callers
+
+    async def _request_access_token(self) -> Credentials:
+        """Request a new access token from FYTA."""
+
         payload = {
             "email": self.email,
             "password": self.password,
         }
 
+        start = time.perf_counter()
         try:
-            response = await self.session.post(
-                url=FYTA_AUTH_URL,
+            response = await self._send(
+                "POST",
+                self.auth_url,
+                "login",
                 auth=BasicAuth(self.email, self.password),
                 json=payload,
-                timeout=ClientTimeout(total=self.request_timeout),
             )
+            json_response = await response.json()
+        except FytaConnectionError:
+            _LOGGER.exception("Request of access token failed")
+            self._token_refreshed(start, False)
+            raise
 
-        except TimeoutError as exception:
-            _LOGGER.exception("timeout error")
-            msg = "Timeout occurred while connecting to Fyta-server"
-            raise FytaConnectionError(msg) from exception
-
-        json_response = await response.json()
+        self._token_refreshed(start, "access_token" in json_response)
 
         if json_response == {"statusCode": 404, "error": "Not Found"}:
             _LOGGER.exception("Authentication failed")
@@ -118,128 +261,647 @@ class Client:
     async def get_plants(self) -> dict[int, str]:
         """Get a list of all available plants from FYTA"""
 
+        plants: dict[int, str] = {}
+        async for plant in self.iter_plant_list():
+            plants |= {int(plant["id"]): plant["nickname"]}
+
+        return plants
+
+    async def iter_plant_list(self) -> AsyncIterator[dict[str, Any]]:
+        """Iterate over the raw entries of all available plants from FYTA
+
+        If `stream_plant_list` is set, the response is parsed incrementally
+        and the entries are returned as they arrive, otherwise the complete
+        response is parsed at once.
+        """
+
+        if not self.stream_plant_list:
+            for plant in await self.get_plant_list():
+                yield plant
+            return
+
         if self.session is None:
             self.session = ClientSession()
             self._close_session = True
 
-        if self.expiration.timestamp() < datetime.now().timestamp():
-            await self.login()  # get new access token, if current token expired
-
-        header = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json",
-        }
+        _LOGGER.debug("Try streaming list of plants")
+
+        async with self._request_slot():
+            response = await self._send_authorized("GET", self.plant_url, "plant_list")
+            self._check_encoding(response)
+
+            content_type = response.headers.get("Content-Type", "")
+
+            if content_type.count("text/html") > 0:
+                text = await response.text()
+                msg = "Error occurred while fetching plant data"
+                raise FytaPlantError(
+                    msg,
+                    {"Content-Type": content_type, "response": text},
+                )
+
+            try:
+                async for plant in iter_json_array(
+                    response.content.iter_chunked(STREAM_CHUNK_SIZE), "plants"
+                ):
+                    yield plant
+            except (TimeoutError, ClientError) as exception:
+                msg = "Error occurred while reading the response of Fyta-server"
+                raise FytaConnectionError(msg) from exception
+            except ValueError as exception:
+                msg = "Error occurred while parsing the list of plants"
+                raise FytaPlantError(
+                    msg, {"Content-Type": content_type, "error": str(exception)}
+                ) from exception
+            finally:
+                response.release()
+
+    async def get_plant_list(self) -> list[dict[str, Any]]:
+        """Get the raw entries of all available plants from FYTA"""
 
         _LOGGER.debug("Try getting list of plants")
 
-        try:
-            response = await self.session.get(
-                url=FYTA_PLANT_URL,
-                headers=header,
-                timeout=ClientTimeout(total=self.request_timeout),
+        _, json_response = await self._request_json(
+            "GET",
+            self.plant_url,
+            "plant_list",
+            "Error occurred while fetching plant data",
+        )
+
+        plant_list: list[dict[str, Any]] = json_response["plants"]
+        _LOGGER.debug("List of plants: %s", plant_list)
+
+        return plant_list
+
+    async def get_plant_data(self, plant_id: int) -> dict[str, Any]:
+        """Get information about a specific plant
+
+        Concurrent requests for the same plant share a single request. If
+        `batch_window` is set, the request is sent after that many seconds,
+        so that all requests for the plant within the window are coalesced.
+        """
+
+        cache_key = f"plant/{plant_id}"
+        cache_entry = await self._get_cache_entry(cache_key)
+        if self._cache_entry_fresh("plant", cache_entry):
+            _LOGGER.debug("Cached data used for plant: %s", plant_id)
+            return cache_entry.data  # type: ignore [union-attr]
+
+        request = self._plant_requests.get(plant_id)
+        if request is None:
+            request = self._start_shared(
+                self._request_plant_data(plant_id, cache_entry)
             )
-        except TimeoutError as exception:
-            msg = "Timeout occurred while connecting to Fyta-server"
-            raise FytaConnectionError(msg) from exception
+            request.add_done_callback(partial(self._plant_request_done, plant_id))
+            self._plant_requests[plant_id] = request
+        else:
+            _LOGGER.debug("Pending request used for plant: %s", plant_id)
 
-        content_type = response.headers.get("Content-Type", "")
+        return await self._wait_shared(
+            request, f"Deadline exceeded while waiting for plant {plant_id}"
+        )
+
+    def _plant_request_done(
+        self, plant_id: int, task: asyncio.Task[dict[str, Any]]
+    ) -> None:
+        """Reset the pending request of a plant."""
+
+        if self._plant_requests.get(plant_id) is task:
+            del self._plant_requests[plant_id]
+        if not task.cancelled():
+            task.exception()  # exception is raised to the waiting callers
+
+    async def _request_plant_data(
+        self, plant_id: int, cache_entry: CacheEntry | None
+    ) -> dict[str, Any]:
+        """Request the information about a specific plant from FYTA.
+
+        The cached response (if any) is revalidated by the request.
+        """
+
+        if self.batch_window > 0:
+            await asyncio.sleep(self.batch_window)
+
+        cache_key = f"plant/{plant_id}"
+
+        _LOGGER.debug("Try getting data for plant: %s", plant_id)
+
+        response, plant = await self._request_json(
+            "GET",
+            f"{self.plant_url}/{plant_id}",
+            "plant",
+            f"Error occurred while fetching plant data for plant {plant_id}",
+            headers=self._conditional_headers(cache_entry),
+        )
 
-        if content_type.count("text/html") > 0:
-            text = await response.text()
-            msg = "Error occurred while fetching plant data"
-            raise FytaPlantError(
-                msg,
-                {"Content-Type": content_type, "response": text},
+        if response.status == 304:
+            _LOGGER.debug("Plant data not modified: %s", plant_id)
+            return await self._revalidate_cache_entry(
+                cache_key,
+                cache_entry,
+                f"Error occurred while fetching plant data for plant {plant_id}",
             )
 
-        json_response = await response.json()
+        _LOGGER.debug("Plant data received: %s", plant)
 
-        plant_list: dict = json_response["plants"]
-        _LOGGER.debug("List of plants: %s", plant_list)
+        await self._set_cache_entry(cache_key, plant, response)
 
-        plants: dict[int, str] = {}
-        for plant in plant_list:
-            plants |= {int(plant["id"]): plant["nickname"]}
+        return plant
 
-        return plants
+    async def get_plant_data_raw(self, plant_id: int) -> bytes:
+        """Get the raw JSON response about a specific plant
 
-    async def get_plant_data(self, plant_id: int) -> dict[str, Any]:
-        """Get information about a specific plant"""
+        The response is neither decoded nor cached, so that it can be parsed
+        outside of the event loop.
+        """
 
-        if self.session is None:
-            self.session = ClientSession()
-            self._close_session = True
+        _LOGGER.debug("Try getting raw data for plant: %s", plant_id)
 
-        if self.expiration.timestamp() < datetime.now().timestamp():
-            await self.login()  # get new access token, if current token expired
+        _, body = await self._request_json(
+            "GET",
+            f"{self.plant_url}/{plant_id}",
+            "plant",
+            f"Error occurred while fetching plant data for plant {plant_id}",
+            raw=True,
+        )
 
-        header = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json",
-        }
+        return body
 
-        url = f"{FYTA_PLANT_URL}/{plant_id}"
+    async def get_plant_measurements(
+        self, plant_id: int, timeline: str = "month"
+    ) -> dict[str, Any]:
+        """Get the measurement history of a specific plant
 
-        _LOGGER.debug("Try getting data for plant: %s", plant_id)
+        timeline: period of the history ("hour", "day", "week" or "month")
+        """
 
-        try:
-            response = await self.session.get(
-                url=url,
-                headers=header,
-                timeout=ClientTimeout(total=self.request_timeout),
+        cache_key = f"measurements/{plant_id}/{timeline}"
+        cache_entry = await self._get_cache_entry(cache_key)
+        if self._cache_entry_fresh("measurements", cache_entry):
+            _LOGGER.debug("Cached measurements used for plant: %s", plant_id)
+            return cache_entry.data  # type: ignore [union-attr]
+
+        _LOGGER.debug("Try getting measurements for plant: %s", plant_id)
+
+        response, measurements = await self._request_json(
+            "POST",
+            f"{self.plant_url}/measurements/{plant_id}",
+            "measurements",
+            f"Error occurred while fetching measurements for plant {plant_id}",
+            payload={"search": {"timeline": timeline}},
+            headers=self._conditional_headers(cache_entry),
+        )
+
+        if response.status == 304:
+            _LOGGER.debug("Measurements not modified: %s", plant_id)
+            return await self._revalidate_cache_entry(
+                cache_key,
+                cache_entry,
+                f"Error occurred while fetching measurements for plant {plant_id}",
             )
-        except TimeoutError as exception:
-            msg = "Timeout occurred while connecting to Fyta-server"
-            raise FytaConnectionError(msg) from exception
 
-        content_type = response.headers.get("Content-Type", "")
+        _LOGGER.debug("Measurements received for plant: %s", plant_id)
 
-        if content_type.count("text/html") > 0:
-            text = await response.text()
-            msg = f"Error occurred while fetching plant data for plant {plant_id}"
-            raise FytaPlantError(
-                msg,
-                {"Content-Type": content_type, "response": text},
+        await self._set_cache_entry(cache_key, measurements, response)
+
+        return measurements
+
+    async def _request_json(
+        self,
+        method: str,
+        url: str,
+        endpoint: str,
+        error_msg: str,
+        payload: dict[str, Any] | None = None,
+        headers: dict[str, str] | None = None,
+        raw: bool = False,
+    ) -> tuple[ClientResponse, Any]:
+        """Send an authorized request to FYTA and return the JSON response.
+
+        The JSON response is None, if the server answers "304 Not Modified".
+        If `raw` is set, the undecoded response body is returned.
+        """
+
+        if self.session is None:
+            self.session = ClientSession()
+            self._close_session = True
+
+        async with self._request_slot():
+            response = await self._send_authorized(
+                method, url, endpoint, headers, json=payload
             )
+            self._check_encoding(response)
 
-        plant = await response.json()
-        _LOGGER.debug("Plant data received: %s", plant)
+            content_type = response.headers.get("Content-Type", "")
 
-        return plant
+            if content_type.count("text/html") > 0:
+                text = await response.text()
+                raise FytaPlantError(
+                    error_msg,
+                    {"Content-Type": content_type, "response": text},
+                )
+
+            if response.status == 304:
+                return response, None
+
+            try:
+                if raw:
+                    return response, await response.read()
+
+                return response, await response.json()
+            except (TimeoutError, ClientError) as exception:
+                msg = "Error occurred while reading the response of Fyta-server"
+                raise FytaConnectionError(msg) from exception
 
     async def get_plant_image(self, image_url) -> tuple[str | None, bytes] | None:
-        """Fetch the user image from the API."""
+        """Fetch the user image from the API.
 
-        if self.expiration.timestamp() < datetime.now().timestamp():
-            await self.login()  # get new access token, if current token expired
+        If an image cache is configured, images of known URLs are taken from
+        the cache without download.
+        """
 
-        header = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json",
-        }
+        if self.image_cache is not None:
+            image = await self.image_cache.async_get(image_url)
+            if image is not None:
+                _LOGGER.debug("Cached image used")
+                return image.content_type, image.content
+
+        if self.session is None:
+            self.session = ClientSession()
+            self._close_session = True
 
         _LOGGER.debug("Try downloading plant image")
 
         try:
-            response = await self.session.get(
-                url=image_url,
-                headers=header,
-                timeout=ClientTimeout(total=self.request_timeout),
-            )
-            response.raise_for_status()
-        except (TimeoutError, ClientResponseError) as err:
+            async with self._request_slot():
+                # a rejection by the image server does not revoke the token
+                response = await self._send_authorized(
+                    "GET", image_url, "image", renew_token=False
+                )
+                try:
+                    content_type = response.headers.get("Content-Type")
+
+                    if response.status != 200 or content_type is None:
+                        _LOGGER.debug(
+                            "Error downloading image: %s %s",
+                            response.status,
+                            content_type,
+                        )
+                        return None
+
+                    if self.image_cache is None:
+                        return content_type, await response.read()
+
+                    digest = hashlib.sha256()
+                    chunks: list[bytes] = []
+                    async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                        digest.update(chunk)
+                        chunks.append(chunk)
+                finally:
+                    response.release()
+        except (TimeoutError, ClientError, FytaConnectionError) as err:
             _LOGGER.debug("Error downloading image: %s", err)
             return None
 
         _LOGGER.debug("Download of image successful")
 
-        content_type=response.headers.get("Content-Type")
+        image = await self.image_cache.async_set(
+            image_url, content_type, b"".join(chunks), digest.hexdigest()
+        )
+
+        return image.content_type, image.content
+
+    @staticmethod
+    def _start_shared(coro: Coroutine[Any, Any, _T]) -> asyncio.Task[_T]:
+        """Start a request shared with other callers.
+
+        The request runs without the deadline of the caller starting it, as
+        every caller applies its own deadline in `_wait_shared`. It is
+        cancelled, when the last of its callers stops waiting.
+        """
+
+        context = copy_context()
+        context.run(_DEADLINE.set, None)
+        return asyncio.create_task(coro, context=context)
+
+    async def _wait_shared(self, request: asyncio.Task[_T], msg: str) -> _T:
+        """Wait for a request shared with other callers within the deadline.
+
+        The shared request is not cancelled, when the deadline of a caller is
+        exceeded, so that it is still available to the other callers. Once
+        no caller is waiting any more, the request is cancelled.
+        """
+
+        self._shared_waiters[request] = self._shared_waiters.get(request, 0) + 1
+        try:
+            async with asyncio.timeout_at(_DEADLINE.get()):
+                return await asyncio.shield(request)
+        except TimeoutError as exception:
+            raise FytaConnectionError(msg) from exception
+        finally:
+            if waiters := self._shared_waiters.pop(request) - 1:
+                self._shared_waiters[request] = waiters
+            elif not request.done():
+                request.cancel()
+
+    @asynccontextmanager
+    async def _request_slot(self) -> AsyncIterator[None]:
+        """Hold a slot of `request_semaphore` (if set) during a request.
+
+        The slot is awaited within the deadline of the context, so that
+        requests queued behind others do not outlast it.
+        """
+
+        semaphore = self.request_semaphore
+        if semaphore is None:
+            yield
+            return
+
+        try:
+            async with asyncio.timeout_at(_DEADLINE.get()):
+                await semaphore.acquire()
+        except TimeoutError as exception:
+            msg = "Deadline exceeded while waiting for a request slot"
+            raise FytaConnectionError(msg) from exception
+
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    async def _send_authorized(
+        self,
+        method: str,
+        url: str,
+        endpoint: str,
+        headers: dict[str, str] | None = None,
+        renew_token: bool = True,
+        **kwargs: Any,
+    ) -> ClientResponse:
+        """Send a request to FYTA with the access token.
+
+        If the server rejects the access token (401), e.g. because it was
+        revoked before its expiration, a new access token is requested and
+        the request is sent once more. Without `renew_token`, the rejecting
+        response is returned, e.g. for servers other than the FYTA API.
+        """
+
+        for attempt in range(2):
+            await self.login()  # get new access token, if current token expires
+
+            access_token = self.access_token
+            header = self._headers() | headers if headers else self._headers()
+            response = await self._send(method, url, endpoint, headers=header, **kwargs)
+            if response.status != 401 or not renew_token:
+                return response
+
+            response.release()
+            _LOGGER.debug("Access token rejected by Fyta-server")
+            if attempt == 0 and self.access_token == access_token:
+                self.access_token = ""  # not renewed by a concurrent request
+
+        raise FytaAuthentificationError("Access token rejected by Fyta-server")
+
+    async def _send(
+        self, method: str, url: str, endpoint: str, **kwargs: Any
+    ) -> ClientResponse:
+        """Send a request to FYTA.
+
+        The request waits for the rate limiters and is retried according to
+        the retry policy, if the server is overloaded or fails (429, 5xx) or
+        the connection fails.
+        """
+
+        instrumentation = self.instrumentation
+        if instrumentation is not None:
+            instrumentation.request_started(endpoint, method, url)
+        start = time.perf_counter()
+        response: ClientResponse | None = None
+        attempt = 0
 
-        if response.status != 200 or content_type is None:
-            _LOGGER.debug("Error downloading image: %s", content_type)
+        try:
+            async with asyncio.timeout_at(_DEADLINE.get()):
+                while True:
+                    for rate_limiter in self.rate_limiters:
+                        await rate_limiter.acquire()
+
+                    policy = self.retry_policy
+                    try:
+                        response = await self.session.request(
+                            method,
+                            url=url,
+                            timeout=self._timeout(),
+                            **kwargs,
+                        )
+                    except TimeoutError as exception:
+                        response = None
+                        msg = "Timeout occurred while connecting to Fyta-server"
+                        raise FytaConnectionError(msg) from exception
+                    except ClientError as exception:
+                        response = None
+                        if (
+                            not isinstance(exception, ClientConnectionError)
+                            or policy is None
+                            or attempt >= policy.max_retries
+                        ):
+                            msg = f"Error occurred while connecting to Fyta-server: {exception}"
+                            raise FytaConnectionError(msg) from exception
+
+                        # failed connections are retried like server errors
+                        await asyncio.sleep(
+                            self._retry_delay(policy, endpoint, attempt, None)
+                        )
+                        attempt += 1
+                        continue
+
+                    if policy is None or response.status not in policy.retry_statuses:
+                        return response
+
+                    if attempt >= policy.max_retries:
+                        break
+
+                    delay = self._retry_delay(
+                        policy,
+                        endpoint,
+                        attempt,
+                        response.status,
+                        response.headers.get("Retry-After"),
+                    )
+                    response.release()
+                    await asyncio.sleep(delay)
+                    attempt += 1
+
+            response.release()
+            msg = f"Request to Fyta-server failed with status {response.status}"
+            if response.status == 429:
+                raise FytaRateLimitError(msg)
+            raise FytaConnectionError(msg)
+        except TimeoutError as exception:
+            msg = "Deadline exceeded before the Fyta-server responded"
+            raise FytaConnectionError(msg) from exception
+        finally:
+            if instrumentation is not None:
+                instrumentation.request_finished(
+                    RequestMetric(
+                        endpoint,
+                        method,
+                        url,
+                        None if response is None else response.status,
+                        time.perf_counter() - start,
+                        None if response is None else response.content_length,
+                        attempt,
+                        None
+                        if response is None
+                        else response.headers.get("Content-Encoding"),
+                    )
+                )
+
+    def _retry_delay(
+        self,
+        policy: RetryPolicy,
+        endpoint: str,
+        attempt: int,
+        status: int | None,
+        retry_after: str | None = None,
+    ) -> float:
+        """Delay before the retry of a failed attempt (reported as retry)."""
+
+        delay = policy.delay(attempt, retry_after)
+        _LOGGER.debug(
+            "Request failed with status %s, retry in %.1f s",
+            status or "connection error",
+            delay,
+        )
+        if self.instrumentation is not None:
+            self.instrumentation.request_retried(endpoint, status, delay)
+
+        return delay
+
+    def _headers(self) -> dict[str, str]:
+        """Headers of authorized requests (shared, must not be modified).
+
+        Requests have no body except for JSON payloads, for which the
+        Content-Type is set by aiohttp.
+        """
+
+        key = (self.access_token, self.accept_encoding)
+        if key != self._header_key:
+            self._header = {
+                "Authorization": f"Bearer {self.access_token}",
+                "Accept-Encoding": self.accept_encoding,
+            }
+            self._header_key = key
+
+        return self._header
+
+    def _timeout(self) -> ClientTimeout:
+        """Timeouts of a request, shortened to the deadline of the context."""
+
+        if (deadline := _DEADLINE.get()) is not None:
+            remaining = deadline - asyncio.get_running_loop().time()
+            return ClientTimeout(
+                total=max(min(self.request_timeout, remaining), 0.001),  # 0: none
+                connect=self.connect_timeout,
+                sock_read=self.read_timeout,
+            )
+
+        key = (self.request_timeout, self.connect_timeout, self.read_timeout)
+        if key != self._timeout_key:
+            self._client_timeout = ClientTimeout(
+                total=self.request_timeout,
+                connect=self.connect_timeout,
+                sock_read=self.read_timeout,
+            )
+            self._timeout_key = key
+
+        return self._client_timeout
+
+    def _check_encoding(self, response: ClientResponse) -> None:
+        """Check that a response is encoded in an accepted content encoding."""
+
+        encoding = response.headers.get("Content-Encoding", "identity").lower()
+        if encoding != "identity" and encoding not in {
+            accepted.split(";")[0].strip() for accepted in self.accept_encoding.split(",")
+        }:
+            response.release()
+            msg = f"Response of Fyta-server has unsupported encoding {encoding}"
+            raise FytaConnectionError(msg)
+
+    def _token_refreshed(self, start: float, success: bool) -> None:
+        """Report a token refresh to the instrumentation."""
+
+        if self.instrumentation is not None:
+            self.instrumentation.token_refreshed(time.perf_counter() - start, success)
+
+    async def _call_cache(self, method: Callable[..., Any], *args: Any) -> Any:
+        """Call the cache, in a worker thread, if it does blocking I/O."""
+
+        if self.cache is not None and self.cache.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def _get_cache_entry(self, key: str) -> CacheEntry | None:
+        """Get a cached response, if a cache is configured."""
+
+        if self.cache is None:
             return None
 
-        return content_type, await response.read()
+        return await self._call_cache(self.cache.get, key)
+
+    def _cache_entry_fresh(self, endpoint: str, entry: CacheEntry | None) -> bool:
+        """Check if a cached response is within the TTL of its endpoint."""
+
+        return (
+            entry is not None
+            and time.time() - entry.stored_at < self.cache_ttl.get(endpoint, 0)
+        )
+
+    def _conditional_headers(self, entry: CacheEntry | None) -> dict[str, str]:
+        """Headers to revalidate a cached response."""
+
+        header: dict[str, str] = {}
+        if entry is None:
+            return header
+
+        if entry.etag is not None:
+            header["If-None-Match"] = entry.etag
+        if entry.last_modified is not None:
+            header["If-Modified-Since"] = entry.last_modified
+
+        return header
+
+    async def _revalidate_cache_entry(
+        self, key: str, entry: CacheEntry | None, error_msg: str
+    ) -> Any:
+        """Renew a cached response confirmed by the server (304)."""
+
+        if entry is None:
+            raise FytaPlantError(error_msg, {"status": 304})
+
+        entry.stored_at = time.time()
+        if self.cache is not None:
+            await self._call_cache(self.cache.set, key, entry)
+
+        return entry.data
+
+    async def _set_cache_entry(
+        self, key: str, data: Any, response: ClientResponse
+    ) -> None:
+        """Store a response, if a cache is configured."""
+
+        if self.cache is None:
+            return
+
+        await self._call_cache(
+            self.cache.set,
+            key,
+            CacheEntry(
+                data=data,
+                stored_at=time.time(),
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+            ),
+        )
 
     async def close(self) -> None:
         """Close open client session."""
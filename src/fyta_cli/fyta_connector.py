@@ -1,12 +1,30 @@
 """Connector class to manage access to FYTA API."""
 
-from datetime import datetime, tzinfo, UTC
+import asyncio
+from collections.abc import Iterable
+from concurrent.futures import Executor
+from dataclasses import replace
+from datetime import datetime, timedelta, tzinfo, UTC
+import json
+import logging
+import time
+from typing import Any
 from zoneinfo import ZoneInfo
 
 from aiohttp import ClientSession
 
-from .fyta_client import Client
-from .fyta_models import Credentials, Plant
+from .fyta_cache import ResponseCache
+from .fyta_client import TIMELINE_PERIODS, Client
+from .fyta_events import PlantEventEmitter
+from .fyta_exceptions import FytaConnectionError, FytaError, FytaPlantError
+from .fyta_fleet import FleetView
+from .fyta_images import ImageCache
+from .fyta_metrics import Instrumentation
+from .fyta_models import Credentials, LazyPlant, Plant, PlantMeasurements
+from .fyta_snapshot import dump_state, load_state
+from .fyta_time import timestamp_codec
+
+_LOGGER = logging.getLogger(__name__)
 
 
 class FytaConnector:
@@ -24,8 +42,19 @@ class FytaConnector:
         expiration: datetime | None = None,
         tz: str = "",
         session: ClientSession | None = None,
+        cache: ResponseCache | None = None,
+        image_cache: ImageCache | None = None,
+        instrumentation: Instrumentation | None = None,
+        parse_executor: Executor | None = None,
     ) -> None:
-        """Initialize connector class."""
+        """Initialize connector class.
+
+        cache: optional cache for plant and measurement responses
+        image_cache: optional cache for plant images
+        instrumentation: optional hooks for request and parse metrics
+        parse_executor: optional thread or process pool, in which the plant
+            responses are decoded and parsed (bypasses the response cache)
+        """
 
         timezone: tzinfo = UTC if tz == "" else ZoneInfo(tz)
         ex: datetime = (
@@ -35,9 +64,22 @@ class FytaConnector:
         )
         self.online: bool = False
         self.plant_list: dict[int, str] = {}
+        self.plant_received_data_at: dict[int, datetime | None] = {}
+        self.plant_has_sensor: dict[int, bool] = {}
+        self.plant_garden: dict[int, int | None] = {}
         self.plants: dict[int, Plant] = {}
+        self.failed_plants: list[int] = []
+        self.measurements: dict[int, PlantMeasurements] = {}
+        self.plant_events = PlantEventEmitter()
+        self.parse_executor = parse_executor
+        self.parse_batch_size = 64
+        # plants as LazyPlant, which convert their fields on first access
+        self.lazy_plants = False
 
         self.client = Client(email, password, access_token, ex, timezone, session)
+        self.client.cache = cache
+        self.client.image_cache = image_cache
+        self.client.instrumentation = instrumentation
 
     async def test_connection(self) -> bool:
         """Test if connection to FYTA API works."""
@@ -57,46 +99,341 @@ class FytaConnector:
     async def update_plant_list(self) -> dict[int, str]:
         """Get list of all available plants."""
 
-        self.plant_list = await self.client.get_plants()
+        plant_list: dict[int, str] = {}
+        plant_received_data_at: dict[int, datetime | None] = {}
+        plant_has_sensor: dict[int, bool] = {}
+        plant_garden: dict[int, int | None] = {}
+        async for plant in self.client.iter_plant_list():
+            plant_id = int(plant["id"])
+            plant_list[plant_id] = plant["nickname"]
+            plant_received_data_at[plant_id] = self._sensor_received_data_at(plant)
+            sensor = plant.get("sensor")
+            plant_has_sensor[plant_id] = sensor is not None and sensor.get(
+                "has_sensor", True
+            ) is not False
+            plant_garden[plant_id] = (plant.get("garden") or {}).get("id")
+
+        self.plant_list = plant_list
+        self.plant_received_data_at = plant_received_data_at
+        self.plant_has_sensor = plant_has_sensor
+        self.plant_garden = plant_garden
 
         return self.plant_list
 
-    async def update_all_plants(self) -> dict[int, Plant]:
-        """Get data of all available plants."""
+    async def update_all_plants(
+        self,
+        max_concurrency: int = 1,
+        incremental: bool = False,
+        timeout: float | None = None,
+    ) -> dict[int, Plant]:
+        """Get data of all available plants.
+
+        Up to `max_concurrency` plants are fetched in parallel. Plants that
+        could not be fetched are skipped and their IDs are stored in
+        `failed_plants`, so that the data of all other plants is kept.
+
+        If `incremental` is set, only plants whose sensor has sent data since
+        the last update are fetched, all other plants are taken from `plants`.
+
+        If a `timeout` is given, the update finishes within this budget of
+        seconds: requests, which are still outstanding, are cancelled and
+        their plants are stored in `failed_plants`.
+        """
+
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        # plants without sensor data, which were successfully fetched before
+        plants_without_data = (
+            set(self.plant_list) - set(self.plants) - set(self.failed_plants)
+        )
+
+        with self.client.deadline(timeout):
+            plant_list: dict[int, str] = await self.update_plant_list()
+
+            plants: dict[int, Plant] = {}
+            outdated_plants: list[int] = []
+            for plant_id, nickname in plant_list.items():
+                cached_plant = self._unchanged_plant(plant_id) if incremental else None
+                if cached_plant is None:
+                    if (
+                        incremental
+                        and plant_id in plants_without_data
+                        and self.plant_received_data_at[plant_id] is None
+                    ):
+                        continue
+                    outdated_plants.append(plant_id)
+                elif cached_plant.name != nickname:
+                    plants |= {plant_id: replace(cached_plant, name=nickname)}
+                else:
+                    plants |= {plant_id: cached_plant}
+
+            results = await self._fetch_plants(outdated_plants, max_concurrency)
+
+        failed_plants: list[int] = []
+        for plant_id, result in zip(outdated_plants, results):
+            if isinstance(result, (FytaConnectionError, FytaPlantError)):
+                failed_plants.append(plant_id)
+            elif isinstance(result, BaseException):
+                raise result
+            elif result is not None:
+                plants |= {plant_id: result}
+
+        self.plants = {
+            plant_id: plants[plant_id] for plant_id in plant_list if plant_id in plants
+        }
+        self.failed_plants = failed_plants
+
+        self.plant_events.publish(
+            self.plants,
+            removed=[
+                plant_id
+                for plant_id in self.plant_events.plants
+                if plant_id not in self.plants and plant_id not in failed_plants
+            ],
+        )
+
+        return self.plants
+
+    async def _fetch_plants(
+        self, plant_ids: list[int], max_concurrency: int
+    ) -> list[Any]:
+        """Fetch plants concurrently, returns the plants or the exceptions."""
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def fetch(plant_id: int) -> Plant | None:
+            async with semaphore:
+                return await self.update_plant_data(plant_id)
+
+        async def fetch_raw(plant_id: int) -> bytes | None:
+            if self.plant_has_sensor.get(plant_id) is False:
+                return None
+            async with semaphore:
+                return await self.client.get_plant_data_raw(plant_id)
+
+        if self.parse_executor is None:
+            return await asyncio.gather(
+                *(fetch(plant_id) for plant_id in plant_ids), return_exceptions=True
+            )
 
-        plants: dict[int, Plant] = {}
+        results: list[Any] = await asyncio.gather(
+            *(fetch_raw(plant_id) for plant_id in plant_ids), return_exceptions=True
+        )
+        await self._parse_in_executor(plant_ids, results)
+
+        return results
+
+    async def _parse_in_executor(self, plant_ids: list[int], results: list[Any]) -> None:
+        """Replace the raw responses in results by the parsed plants.
+
+        The responses are parsed in batches of `parse_batch_size` plants.
+        """
+
+        loop = asyncio.get_running_loop()
+        bodies = [
+            (index, result)
+            for index, result in enumerate(results)
+            if isinstance(result, bytes)
+        ]
+        batches = [
+            bodies[start : start + self.parse_batch_size]
+            for start in range(0, len(bodies), self.parse_batch_size)
+        ]
+
+        start = time.perf_counter()
+        parsed_batches = await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    self.parse_executor,
+                    parse_plants,
+                    [body for _, body in batch],
+                    self.client.timezone,
+                    self.lazy_plants,
+                )
+                for batch in batches
+            ),
+            return_exceptions=True,
+        )
+        seconds = (time.perf_counter() - start) / max(1, len(bodies))
+
+        for batch, parsed in zip(batches, parsed_batches):
+            for (index, _), plant in zip(
+                batch,
+                parsed if isinstance(parsed, list) else [parsed] * len(batch),
+            ):
+                results[index] = plant
+                if self.client.instrumentation is not None and isinstance(
+                    plant, Plant
+                ):
+                    self.client.instrumentation.plant_parsed(plant_ids[index], seconds)
+
+    def _unchanged_plant(self, plant_id: int) -> Plant | None:
+        """Return the cached plant, if its sensor has not sent new data."""
+
+        cached_plant = self.plants.get(plant_id)
+        received_data_at = self.plant_received_data_at.get(plant_id)
+
+        if (
+            cached_plant is None
+            or cached_plant.last_updated is None
+            or received_data_at is None
+            or received_data_at > cached_plant.last_updated
+        ):
+            return None
 
-        plant_list: dict[int, str] = await self.update_plant_list()
+        return cached_plant
 
-        for plant in plant_list:
-            current_plant: Plant | None = await self.update_plant_data(plant)
-            if current_plant is not None:
-                plants |= {plant: current_plant}
+    def _sensor_received_data_at(self, plant: dict[str, Any]) -> datetime | None:
+        """Get the time of the last sensor data from a plant list entry."""
 
-        self.plants = plants
+        received_data_at = (plant.get("sensor") or {}).get("received_data_at")
+        if received_data_at is None:
+            return None
 
-        return plants
+        try:
+            return timestamp_codec(self.client.timezone).localize(received_data_at)
+        except ValueError:
+            return None
 
     async def update_plant_data(self, plant_id: int) -> Plant | None:
-        """Get data of specific plant."""
+        """Get data of specific plant.
 
-        p: dict = await self.client.get_plant_data(plant_id)
+        Plants without sensor according to the plant list are answered
+        without request.
+        """
 
-        if ("plant" not in p) or (p["plant"]["sensor"] is None):
+        if self.plant_has_sensor.get(plant_id) is False:
             return None
 
-        plant_data: dict = p["plant"]
+        if self.parse_executor is not None:
+            results: list[Any] = [await self.client.get_plant_data_raw(plant_id)]
+            await self._parse_in_executor([plant_id], results)
+            if isinstance(results[0], BaseException):
+                raise results[0]
+            return results[0]
 
-        current_plant = Plant.from_dict(plant_data)
-        if current_plant.last_updated is not None:
-            current_plant.last_updated = current_plant.last_updated.astimezone(self.client.timezone)
+        p: dict = await self.client.get_plant_data(plant_id)
+
+        start = time.perf_counter()
+        current_plant = _plant_from_data(p, self.client.timezone, self.lazy_plants)
+        if self.client.instrumentation is not None and current_plant is not None:
+            self.client.instrumentation.plant_parsed(
+                plant_id, time.perf_counter() - start
+            )
 
         return current_plant
 
+    async def update_plant_measurements(
+        self, plant_id: int, timeline: str = "month"
+    ) -> PlantMeasurements:
+        """Get measurement history of specific plant."""
+
+        m: dict = await self.client.get_plant_measurements(plant_id, timeline)
+
+        measurements = PlantMeasurements.from_dict(m)
+        self.measurements[plant_id] = measurements
+
+        return measurements
+
+    async def sync_plant_measurements(
+        self, plant_id: int, max_age: timedelta | None = None
+    ) -> PlantMeasurements:
+        """Sync the measurement history of a plant incrementally.
+
+        The history is requested for the shortest timeline, which covers the
+        time since the newest sample in `measurements`, and only newer
+        samples are appended. Samples older than `max_age` are removed, to
+        keep the memory of long histories bounded.
+        """
+
+        stored = self.measurements.get(plant_id)
+        last_sample_at = None if stored is None else stored.last_sample_at()
+
+        timeline = "month"
+        if last_sample_at is not None:
+            since = timedelta(seconds=time.time() - last_sample_at)
+            timeline = next(
+                (name for name, period in TIMELINE_PERIODS.items() if period >= since),
+                "month",
+            )
+
+        m: dict = await self.client.get_plant_measurements(plant_id, timeline)
+        measurements = PlantMeasurements.from_dict(m)
+
+        if stored is None:
+            stored = self.measurements[plant_id] = PlantMeasurements.from_dict({})
+        stored.extend(measurements)
+
+        if max_age is not None:
+            stored.trim(time.time() - max_age.total_seconds())
+
+        return stored
+
     async def get_plant_image(self, image_url) -> tuple[str | None, bytes] | None:
         """Fetch the user image from the API."""
         return await self.client.get_plant_image(image_url)
 
+    async def get_plant_images(
+        self,
+        plants: Iterable[Plant] | None = None,
+        thumbnails: bool = True,
+        originals: bool = False,
+        max_concurrency: int = 8,
+    ) -> dict[str, tuple[str | None, bytes] | None]:
+        """Fetch the images of several plants (default: all plants) concurrently.
+
+        The images are returned by URL, images shared by several plants
+        (e.g. the pictures of a species) are fetched once. Images, which fail
+        to download, are returned as None.
+        """
+
+        fields: list[str] = []
+        if thumbnails:
+            fields += ["user_thumb_path", "plant_thumb_path"]
+        if originals:
+            fields += ["user_picture_path", "plant_origin_path"]
+
+        urls = {
+            url: None
+            for plant in (self.plants.values() if plants is None else plants)
+            for field in fields
+            if (url := getattr(plant, field))
+        }
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def fetch(url: str) -> tuple[str | None, bytes] | None:
+            async with semaphore:
+                try:
+                    return await self.get_plant_image(url)
+                except FytaError as err:
+                    _LOGGER.debug("Error downloading image %s: %s", url, err)
+                    return None
+
+        images = await asyncio.gather(*(fetch(url) for url in urls))
+
+        return dict(zip(urls, images))
+
+    def fleet_view(self) -> FleetView:
+        """Columnar view of all plants for fleet-wide queries."""
+        return FleetView.from_plants(self.plants, self.plant_garden)
+
+    def dump(self) -> bytes:
+        """Dump the state (token, plant list, plants and measurements).
+
+        The password is not part of the snapshot.
+        """
+        return dump_state(self)
+
+    def load(self, data: bytes) -> None:
+        """Load the state from a snapshot created by dump.
+
+        Raises ValueError, if the snapshot is invalid or belongs to another
+        account.
+        """
+        load_state(self, data)
+
     @property
     def access_token(self) -> str:
         """Access token for FYTA API."""
@@ -121,3 +458,56 @@ class FytaConnector:
     def fyta_id(self) -> str:
         """ID for FYTA object."""
         return self.email
+
+
+def _plant_from_data(
+    p: dict[str, Any], tz: tzinfo, lazy: bool = False
+) -> Plant | None:
+    """Create a plant from the plant data of FYTA (None for plants without sensor).
+
+    Malformed plant data raises FytaPlantError.
+    """
+
+    try:
+        if ("plant" not in p) or (p["plant"]["sensor"] is None):
+            return None
+
+        plant_data: dict = p["plant"]
+
+        if lazy:
+            return LazyPlant.from_raw(plant_data, tz)
+
+        current_plant = Plant.from_dict(plant_data)
+        if current_plant.last_updated is not None:
+            current_plant.last_updated = timestamp_codec(tz).localize(
+                current_plant.last_updated
+            )
+    except (LookupError, TypeError, ValueError) as err:
+        msg = "Error occurred while parsing plant data"
+        raise FytaPlantError(msg, {"error": str(err)}) from err
+
+    return current_plant
+
+
+def parse_plants(
+    bodies: list[bytes], tz: tzinfo, lazy: bool = False
+) -> list[Plant | FytaPlantError | None]:
+    """Decode and parse raw plant responses of FYTA.
+
+    Runs in the parse executor of the connector, so it is a module-level
+    function, which can be used with process pools. Plants, which fail to
+    parse, are returned as FytaPlantError, so that the other plants of the
+    batch are kept.
+    """
+
+    plants: list[Plant | FytaPlantError | None] = []
+    for body in bodies:
+        try:
+            plants.append(_plant_from_data(json.loads(body), tz, lazy))
+        except FytaPlantError as err:
+            plants.append(err)
+        except ValueError as err:
+            msg = "Error occurred while decoding plant data"
+            plants.append(FytaPlantError(msg, {"error": str(err)}))
+
+    return plants
@@ -0,0 +1,598 @@
+"""Emulator of the FYTA API for load tests and offline development."""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import hashlib
+import json
+import math
+import random
+import secrets
+import time
+from datetime import UTC, datetime, timedelta
+from typing import Any, Self
+
+from aiohttp import web
+
+from .fyta_client import TIMELINE_PERIODS
+from .fyta_connector import FytaConnector
+
+SPECIES = (
+    "Ficus elastica",
+    "Theobroma cacao",
+    "Monstera deliciosa",
+    "Ocimum basilicum",
+    "Solanum lycopersicum",
+)
+
+TIMELINE_POINTS = {"hour": 12, "day": 96, "week": 168, "month": 720}
+
+_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+_BASE_URL = "{base_url}"  # replaced by the URL of the emulator in responses
+
+_UNAUTHORIZED = {
+    "statusCode": 401,
+    "error": "Unauthorized",
+    "errors": [{"message": "Could not authenticate user"}],
+}
+
+_THRESHOLDS = ("min_good", "max_good", "min_acceptable", "max_acceptable")
+
+# plant details as returned by FYTA (see tests/fixtures/get_plant_details_0.json)
+_PLANT_TEMPLATE: dict[str, Any] = {
+    "id": 0,
+    "nickname": "",
+    "scientific_name": "",
+    "genus": None,
+    "status": 2,
+    "plant_id": 201,
+    "family_id": None,
+    "thumb_path": None,
+    "origin_path": None,
+    "plant_thumb_path": None,
+    "plant_origin_path": None,
+    "received_data_at": None,
+    "gathering_data": False,
+    "is_illegal": False,
+    "is_productive_plant": False,
+    "not_supported": False,
+    "sensor_update_available": False,
+    "fertilisation": {
+        "last_fertilised_at": "2024-11-16",
+        "fertilise_at": "2025-01-11",
+        "was_repotted": True,
+    },
+    "notifications": {
+        "light": False,
+        "temperature": False,
+        "water": True,
+        "nutrition": True,
+    },
+    "dismissed_sensor_message_at": None,
+    "garden": {"id": 123, "name": "Home"},
+    "sensor": {
+        "id": "AA:AA:AA:2B:AF:F4",
+        "has_sensor": True,
+        "status": 1,
+        "uuid_android": None,
+        "uuid_ios": "AAAAA6BF-0457-3233-8A43-032B5377E763",
+        "version": "0.30.0",
+        "is_battery_low": False,
+        "received_data_at": None,
+        "created_at": "2022-01-01 01:10:10",
+    },
+    "hub": {
+        "id": 123,
+        "hub_id": "AA:AA:AA:27:7D:6A",
+        "status": 1,
+        "received_data_at": None,
+        "reached_hub_at": None,
+    },
+    "measurements": {
+        "ph": {
+            "status": None,
+            "values": {"min": "4", "max": "7", "current": None},
+            "unit": "pH",
+            "absolute_values": {"min": "0", "max": "7.5"},
+        },
+        "nutrients": {"type": "nutrients", "status": 3},
+        "temperature": {
+            "status": 2,
+            "values": {
+                "min_good": "17",
+                "max_good": "36",
+                "min_acceptable": "10",
+                "max_acceptable": "42",
+                "current": None,
+                "optimal_hours": 22,
+            },
+            "unit": "°C/h",
+            "absolute_values": {"min": "0", "max": "50"},
+        },
+        "light": {
+            "status": 1,
+            "values": {
+                "min_good": "20",
+                "max_good": "450",
+                "min_acceptable": "18",
+                "max_acceptable": "675",
+                "current": None,
+                "optimal_hours": 0,
+            },
+            "dli_values": {
+                "min_good": "0.25",
+                "max_good": "9",
+                "min_acceptable": "0.06",
+                "max_acceptable": "9",
+            },
+            "unit": "μmol/h",
+            "absolute_values": {"min": "0", "max": "700"},
+        },
+        "moisture": {
+            "status": 3,
+            "values": {
+                "min_good": "35",
+                "max_good": "70",
+                "min_acceptable": "25",
+                "max_acceptable": "80",
+                "current": None,
+            },
+            "unit": "%/h",
+            "absolute_values": {"min": "0", "max": "85"},
+        },
+        "salinity": {
+            "status": 2,
+            "values": {
+                "min_good": "0.6",
+                "max_good": "1",
+                "min_acceptable": "0.4",
+                "max_acceptable": "1.2",
+                "current": None,
+            },
+            "unit": "mS/h",
+            "absolute_values": {"min": "0", "max": "1.4"},
+        },
+        "battery": "100",
+    },
+    "temperature_unit": 1,
+    "know_hows": [],
+}
+
+# fields of the plant details, which are part of the plant list
+_PLANT_LIST_FIELDS = (
+    "id",
+    "nickname",
+    "scientific_name",
+    "status",
+    "plant_id",
+    "family_id",
+    "thumb_path",
+    "origin_path",
+    "plant_thumb_path",
+    "plant_origin_path",
+    "received_data_at",
+    "garden",
+    "sensor",
+    "hub",
+)
+
+
+def synthetic_plant(
+    plant_id: int, rng: random.Random, now: datetime, has_sensor: bool = True
+) -> dict[str, Any]:
+    """Generate the details of a plant.
+
+    Plants of the same species have the same thresholds, the current values
+    and the time of the last sensor data vary.
+    """
+
+    species = plant_id % len(SPECIES)
+    plant = copy.deepcopy(_PLANT_TEMPLATE)
+
+    plant["id"] = plant_id
+    plant["nickname"] = f"Plant {plant_id}"
+    plant["scientific_name"] = SPECIES[species]
+    for kind in ("thumb", "origin"):
+        plant[f"{kind}_path"] = f"{_BASE_URL}/images/{plant_id}/{kind}.jpg"
+        plant[f"plant_{kind}_path"] = f"{_BASE_URL}/images/species/{species}_{kind}.jpg"
+
+    if not has_sensor:
+        plant["sensor"] = None
+        plant["hub"] = None
+        del plant["measurements"]
+        return plant
+
+    received_data_at = now - timedelta(seconds=rng.uniform(0, 3600))
+    plant["received_data_at"] = received_data_at.strftime(_DATE_FORMAT)
+    plant["sensor"]["received_data_at"] = plant["received_data_at"]
+    plant["hub"]["received_data_at"] = plant["received_data_at"]
+    plant["hub"]["reached_hub_at"] = plant["received_data_at"]
+    plant["sensor"]["is_battery_low"] = rng.random() < 0.05
+
+    for measurement in ("light", "moisture", "salinity", "temperature"):
+        values = plant["measurements"][measurement]["values"]
+        for bound in _THRESHOLDS:
+            values[bound] = str(float(values[bound]) + species)
+        values["current"] = str(
+            round(
+                rng.uniform(
+                    float(values["min_acceptable"]), float(values["max_acceptable"])
+                ),
+                1,
+            )
+        )
+        plant["measurements"][measurement]["status"] = rng.randint(1, 5)
+
+    return plant
+
+
+def synthetic_measurements(
+    plant: dict[str, Any], timeline: str, now: datetime
+) -> dict[str, Any]:
+    """Generate the measurement history of a plant.
+
+    The values follow a daily cycle between the acceptable thresholds.
+    """
+
+    points = TIMELINE_POINTS.get(timeline, TIMELINE_POINTS["month"])
+    step = TIMELINE_PERIODS.get(timeline, TIMELINE_PERIODS["month"]) / points
+    measurements = plant.get("measurements", {})
+
+    def value(name: str, phase: float) -> float:
+        values = measurements.get(name, {}).get("values", {})
+        low = float(values.get("min_acceptable", 0))
+        high = float(values.get("max_acceptable", 0))
+        return round(low + (high - low) * (1 + math.sin(phase)) / 2, 2)
+
+    history = []
+    for index in range(points):
+        date = now - step * (points - index)
+        phase = 2 * math.pi * (date.timestamp() % 86400) / 86400
+        history.append(
+            {
+                "light": max(0.0, value("light", phase)),
+                "temperature": value("temperature", phase),
+                "soil_moisture": value("moisture", phase / 7),
+                "soil_moisture_anomaly": False,
+                "soil_fertility": value("salinity", phase / 7),
+                "soil_fertility_anomaly": False,
+                "date_utc": date.strftime(_DATE_FORMAT),
+            }
+        )
+
+    days = max(1, round((step * points) / timedelta(days=1)))
+    dli_light = [
+        {
+            "dli_light": round(3 + 2 * math.sin(day), 2),
+            "date_utc": (now - timedelta(days=days - day)).strftime("%Y-%m-%d 00:00:00"),
+        }
+        for day in range(days)
+    ]
+
+    absolute_values = {
+        name: {
+            "min": measurements[key]["absolute_values"]["min"],
+            "max": measurements[key]["absolute_values"]["max"],
+        }
+        for name, key in (
+            ("light", "light"),
+            ("temperature", "temperature"),
+            ("soil_moisture", "moisture"),
+            ("soil_fertility", "salinity"),
+        )
+        if key in measurements
+    }
+    thresholds = {
+        f"{name}_{bound}": float(measurements[name]["values"][bound])
+        for name in ("temperature", "light", "moisture", "salinity")
+        if name in measurements
+        for bound in _THRESHOLDS
+    }
+
+    return {
+        "measurements": history,
+        "dli_light": dli_light,
+        "absolute_values": absolute_values,
+        "thresholds": thresholds,
+    }
+
+
+class FytaEmulator:
+    """Local aiohttp server emulating the FYTA API with a synthetic fleet.
+
+    The emulator implements the login, the plant list, the plant details, the
+    measurements and the plant images. Latency, errors, throttling and the
+    lifetime of access tokens are configurable to test the behavior of the
+    client under load.
+
+        async with FytaEmulator(plants=5000, latency=0.05) as emulator:
+            connector = emulator.connector()
+            await connector.update_all_plants(max_concurrency=16)
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    # pylint: disable=too-many-arguments
+
+    def __init__(
+        self,
+        plants: int = 100,
+        *,
+        email: str = "emulator@example.com",
+        password: str = "password",
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit: float | None = None,
+        burst: int | None = None,
+        token_lifetime: timedelta = timedelta(days=60),
+        sensorless_ratio: float = 0.0,
+        compression: bool = True,
+        seed: int = 0,
+    ) -> None:
+        """Initialize emulator.
+
+        latency, jitter: seconds added to each response (latency + U(0, jitter))
+        error_rate: share of requests answered with a server error (5xx)
+        rate_limit, burst: requests per second and burst allowed before "429"
+        token_lifetime: lifetime of the issued access tokens
+        sensorless_ratio: share of plants without sensor
+        compression: compress JSON responses, if the client accepts it
+        """
+
+        self.email = email
+        self.password = password
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.burst = burst if burst is not None else max(1, int(rate_limit or 1))
+        self.token_lifetime = token_lifetime
+        self.compression = compression
+
+        self.requests: dict[str, int] = {}
+        self.throttled = 0
+        self.errors = 0
+        self.url = ""
+
+        self._rng = random.Random(seed)
+        self._tokens: dict[str, float] = {}
+        self._allowance = float(self.burst)
+        self._allowance_at = time.monotonic()
+        self._runner: web.AppRunner | None = None
+
+        now = datetime.now(UTC).replace(microsecond=0)
+        self.plants: dict[int, dict[str, Any]] = {
+            plant_id: synthetic_plant(
+                plant_id, self._rng, now, self._rng.random() >= sensorless_ratio
+            )
+            for plant_id in range(plants)
+        }
+        self._plant_bodies = {
+            plant_id: json.dumps({"plant": plant})
+            for plant_id, plant in self.plants.items()
+        }
+        self._plant_list_body = json.dumps(
+            {
+                "gardens": [
+                    {
+                        "id": 123,
+                        "garden_name": "Home",
+                        "origin_path": None,
+                        "thumb_path": None,
+                        "mac_address": None,
+                    }
+                ],
+                "plants": [
+                    {key: plant[key] for key in _PLANT_LIST_FIELDS}
+                    for plant in self.plants.values()
+                ],
+            }
+        )
+
+    @property
+    def auth_url(self) -> str:
+        """URL of the login."""
+        return f"{self.url}/api/auth/login"
+
+    @property
+    def plant_url(self) -> str:
+        """URL of the plants."""
+        return f"{self.url}/api/user-plant"
+
+    def create_app(self) -> web.Application:
+        """Create the aiohttp application of the emulator."""
+
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_post("/api/auth/login", self._login)
+        app.router.add_get("/api/user-plant", self._plant_list)
+        app.router.add_get(r"/api/user-plant/{plant_id:\d+}", self._plant)
+        app.router.add_post(
+            r"/api/user-plant/measurements/{plant_id:\d+}", self._measurements
+        )
+        app.router.add_get("/images/{path:.+}", self._image)
+
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        """Start the emulator (on a free port by default)."""
+
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+
+        self.url = f"http://{host}:{self._runner.addresses[0][1]}"
+
+    async def stop(self) -> None:
+        """Stop the emulator."""
+
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def connector(self, **kwargs: Any) -> FytaConnector:
+        """Create a connector using the emulator."""
+
+        connector = FytaConnector(self.email, self.password, **kwargs)
+        connector.client.auth_url = self.auth_url
+        connector.client.plant_url = self.plant_url
+
+        return connector
+
+    def expire_tokens(self) -> None:
+        """Invalidate all issued access tokens."""
+        self._tokens.clear()
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler: Any) -> web.StreamResponse:
+        """Count requests and apply latency, throttling and errors."""
+
+        route = request.match_info.route.resource
+        name = route.canonical if route is not None else request.path
+        self.requests[name] = self.requests.get(name, 0) + 1
+
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + self._rng.uniform(0, self.jitter))
+
+        if self.rate_limit is not None and not self._take_allowance():
+            self.throttled += 1
+            retry_after = math.ceil((1 - self._allowance) / self.rate_limit)
+            return web.json_response(
+                {"statusCode": 429, "error": "Too Many Requests"},
+                status=429,
+                headers={"Retry-After": str(retry_after)},
+            )
+
+        if self.error_rate and self._rng.random() < self.error_rate:
+            self.errors += 1
+            return web.json_response(
+                {"statusCode": 503, "error": "Service Unavailable"}, status=503
+            )
+
+        response: web.StreamResponse = await handler(request)
+        return response
+
+    def _take_allowance(self) -> bool:
+        """Take a request from the token bucket of the rate limit."""
+
+        now = time.monotonic()
+        self._allowance = min(
+            float(self.burst),
+            self._allowance + (now - self._allowance_at) * (self.rate_limit or 0),
+        )
+        self._allowance_at = now
+
+        if self._allowance < 1:
+            return False
+
+        self._allowance -= 1
+        return True
+
+    def _authorized(self, request: web.Request) -> bool:
+        """Check the access token of a request."""
+
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        expiration = self._tokens.get(token)
+
+        return expiration is not None and expiration > time.time()
+
+    def _json(self, request: web.Request, body: str) -> web.Response:
+        """JSON response with the URLs of the emulator."""
+
+        response = web.Response(
+            text=body.replace(_BASE_URL, f"{request.scheme}://{request.host}"),
+            content_type="application/json",
+        )
+        if self.compression:
+            response.enable_compression()  # as accepted by the client
+
+        return response
+
+    async def _login(self, request: web.Request) -> web.Response:
+        """Issue an access token."""
+
+        try:
+            credentials = await request.json()
+        except ValueError:
+            return web.json_response({"message": "Unsupported Media Type"}, status=415)
+
+        if credentials.get("email") != self.email:
+            return web.json_response({"statusCode": 404, "error": "Not Found"})
+        if credentials.get("password") != self.password:
+            return web.json_response(_UNAUTHORIZED)
+
+        token = secrets.token_hex(20)
+        lifetime = self.token_lifetime.total_seconds()
+        self._tokens[token] = time.time() + lifetime
+
+        return web.json_response(
+            {
+                "access_token": token,
+                "token_type": "Bearer",
+                "expires_in": int(lifetime),
+                "refresh_token": secrets.token_hex(20),
+                "scope": "mobile",
+            }
+        )
+
+    async def _plant_list(self, request: web.Request) -> web.Response:
+        """Answer the list of all plants."""
+
+        if not self._authorized(request):
+            return web.json_response(_UNAUTHORIZED, status=401)
+
+        return self._json(request, self._plant_list_body)
+
+    async def _plant(self, request: web.Request) -> web.Response:
+        """Answer the details of a plant."""
+
+        if not self._authorized(request):
+            return web.json_response(_UNAUTHORIZED, status=401)
+
+        body = self._plant_bodies.get(int(request.match_info["plant_id"]))
+        if body is None:
+            return web.json_response({"statusCode": 404, "error": "Not Found"}, status=404)
+
+        return self._json(request, body)
+
+    async def _measurements(self, request: web.Request) -> web.Response:
+        """Answer the measurement history of a plant."""
+
+        if not self._authorized(request):
+            return web.json_response(_UNAUTHORIZED, status=401)
+
+        plant = self.plants.get(int(request.match_info["plant_id"]))
+        if plant is None:
+            return web.json_response({"statusCode": 404, "error": "Not Found"}, status=404)
+
+        try:
+            timeline = (await request.json())["search"]["timeline"]
+        except (ValueError, KeyError, TypeError):
+            timeline = "month"
+
+        return web.json_response(
+            synthetic_measurements(
+                plant, timeline, datetime.now(UTC).replace(microsecond=0)
+            )
+        )
+
+    async def _image(self, request: web.Request) -> web.Response:
+        """Answer a plant image (deterministic bytes for each path)."""
+
+        if not self._authorized(request):
+            return web.json_response(_UNAUTHORIZED, status=401)
+
+        seed = hashlib.sha256(request.match_info["path"].encode()).digest()
+        return web.Response(body=seed * 256, content_type="image/jpeg")
+
+    async def __aenter__(self) -> Self:
+        """Async enter."""
+
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_exc_info: object) -> None:
+        """Async exit."""
+
+        await self.stop()
@@ -0,0 +1,211 @@
+"""Change events of FYTA plants."""
+
+import asyncio
+from collections.abc import Callable, Iterable, Mapping
+from dataclasses import dataclass, fields
+from operator import attrgetter
+from typing import Any, Self
+
+from .fyta_models import Plant
+
+_PLANT_FIELDS = tuple(f.name for f in fields(Plant))
+_get_plant_values = attrgetter(*_PLANT_FIELDS)
+
+
+@dataclass(frozen=True, slots=True)
+class PlantAdded:
+    """A new plant is available."""
+
+    plant_id: int
+    plant: Plant
+
+
+@dataclass(frozen=True, slots=True)
+class PlantRemoved:
+    """A plant is not available anymore."""
+
+    plant_id: int
+    plant: Plant
+
+
+@dataclass(frozen=True, slots=True)
+class PlantChanged:
+    """A field of a plant has changed (e.g. moisture_status or low_battery)."""
+
+    plant_id: int
+    field: str
+    old_value: Any
+    new_value: Any
+    plant: Plant
+
+
+PlantEvent = PlantAdded | PlantRemoved | PlantChanged
+
+_CLOSED: Any = object()
+
+
+class PlantEventStream:
+    """Async iterator over the events of an emitter, subscribed on creation.
+
+    Up to `maxsize` events are buffered. If the consumer falls behind, the
+    oldest events are dropped and counted in `dropped`.
+
+        async with connector.plant_events.events() as events:
+            async for event in events:
+                ...
+    """
+
+    def __init__(self, maxsize: int, on_close: Callable[[], None]) -> None:
+        """Initialize stream."""
+
+        self.dropped = 0
+        self.closed = False
+
+        self._queue: asyncio.Queue[PlantEvent] = asyncio.Queue(maxsize)
+        self._on_close = on_close
+
+    def __aiter__(self) -> "PlantEventStream":
+        """Async iterator."""
+        return self
+
+    async def __anext__(self) -> PlantEvent:
+        """Next event, waits for the next publication."""
+
+        if self.closed and self._queue.empty():
+            raise StopAsyncIteration
+
+        event = await self._queue.get()
+        if event is _CLOSED:
+            raise StopAsyncIteration
+        return event
+
+    async def __aenter__(self) -> Self:
+        """Async enter."""
+        return self
+
+    async def __aexit__(self, *_exc_info: object) -> None:
+        """Async exit."""
+        self.close()
+
+    def put(self, event: PlantEvent) -> None:
+        """Buffer an event, dropping the oldest event if the buffer is full."""
+
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(event)
+
+    def close(self) -> None:
+        """Unsubscribe, buffered events are still returned."""
+
+        if self.closed:
+            return
+
+        self.closed = True
+        self._on_close()
+        if self._queue.empty():
+            self._queue.put_nowait(_CLOSED)  # wake up a waiting consumer
+
+    async def aclose(self) -> None:
+        """Unsubscribe (like async generators)."""
+        self.close()
+
+
+class PlantEventEmitter:
+    """Emitter of the changes of plants to callbacks and async iterators.
+
+    The changes are computed once per update against the last published
+    state of each plant and then passed to all subscribers. The state is
+    kept up to date without subscribers, so that subscribers joining later
+    only get the changes since the last publication.
+    """
+
+    def __init__(self) -> None:
+        """Initialize emitter."""
+
+        self.plants: dict[int, Plant] = {}
+
+        self._callbacks: list[Callable[[PlantEvent], None]] = []
+        self._streams: list[PlantEventStream] = []
+
+    @property
+    def has_subscribers(self) -> bool:
+        """Check if anybody is interested in the events."""
+        return bool(self._callbacks or self._streams)
+
+    def subscribe(self, callback: Callable[[PlantEvent], None]) -> Callable[[], None]:
+        """Call callback for each event, returns a function to unsubscribe."""
+
+        self._callbacks.append(callback)
+
+        def unsubscribe() -> None:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+        return unsubscribe
+
+    def events(self, maxsize: int = 1024) -> PlantEventStream:
+        """Async iterator over all events from now on (subscribed immediately).
+
+        Up to `maxsize` events are buffered, the oldest events are dropped
+        first. The stream must be closed to unsubscribe.
+        """
+
+        def unsubscribe() -> None:
+            self._streams.remove(stream)
+
+        stream = PlantEventStream(maxsize, unsubscribe)
+        self._streams.append(stream)
+
+        return stream
+
+    def publish(
+        self, plants: Mapping[int, Plant], removed: Iterable[int] = ()
+    ) -> list[PlantEvent]:
+        """Publish the changes of updated and removed plants.
+
+        Without subscribers, only the state of the plants is updated.
+        """
+
+        if not self.has_subscribers:
+            self.plants.update(plants)
+            for plant_id in removed:
+                self.plants.pop(plant_id, None)
+            return []
+
+        events: list[PlantEvent] = []
+
+        for plant_id, plant in plants.items():
+            previous = self.plants.get(plant_id)
+            self.plants[plant_id] = plant
+            if previous is None:
+                events.append(PlantAdded(plant_id, plant))
+            elif previous is not plant:
+                events += _changes(plant_id, previous, plant)
+
+        for plant_id in removed:
+            if (previous := self.plants.pop(plant_id, None)) is not None:
+                events.append(PlantRemoved(plant_id, previous))
+
+        for event in events:
+            for callback in list(self._callbacks):
+                callback(event)
+            for stream in self._streams:
+                stream.put(event)
+
+        return events
+
+
+def _changes(plant_id: int, previous: Plant, plant: Plant) -> list[PlantEvent]:
+    """Changed fields of a plant."""
+
+    old_values = _get_plant_values(previous)
+    new_values = _get_plant_values(plant)
+    if old_values == new_values:
+        return []
+
+    return [
+        PlantChanged(plant_id, name, old_value, new_value, plant)
+        for name, old_value, new_value in zip(_PLANT_FIELDS, old_values, new_values)
+        if old_value != new_value
+    ]
@@ -15,3 +15,6 @@ class FytaPasswordError(FytaError):
 
 class FytaPlantError(FytaError):
     """Fyta exception in getting plants."""
+
+class FytaRateLimitError(FytaConnectionError):
+    """Fyta exception for requests rejected because of too many requests."""
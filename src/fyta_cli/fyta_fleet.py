@@ -0,0 +1,365 @@
+"""Columnar view of the plants of a fleet for fleet-wide queries."""
+
+from __future__ import annotations
+
+import operator
+from array import array
+from collections.abc import Callable, Iterable, Mapping
+from functools import reduce
+from itertools import compress, repeat
+from math import isnan
+from operator import attrgetter
+from typing import Any
+
+from .fyta_models import Plant
+
+try:
+    import numpy  # type: ignore [import-not-found]
+
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+FLOAT_FIELDS = (
+    "battery_level",
+    "ph",
+    *(
+        f"{measurement}{suffix}"
+        for measurement in ("light", "moisture", "salinity", "temperature")
+        for suffix in (
+            "",
+            "_min_acceptable",
+            "_min_good",
+            "_max_acceptable",
+            "_max_good",
+        )
+    ),
+)
+STATUS_FIELDS = (
+    "light_status",
+    "moisture_status",
+    "nutrients_status",
+    "salinity_status",
+    "temperature_status",
+    "sensor_status",
+    "status",
+)
+BOOL_FIELDS = ("low_battery", "online", "sensor_available")
+
+NO_GARDEN = -1
+
+# comparisons with NaN are false, except for "!=" (computed by "<" and ">")
+_OPERATORS: dict[str, Callable[[Any, Any], bool]] = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+_NAN = float("nan")
+
+
+class FleetView:
+    """Columnar view of plants: one array per field.
+
+    Floats are stored as arrays of doubles (None as NaN), statuses and flags
+    as arrays of bytes. Masks are arrays of bytes (1 selected, 0 not).
+    Comparisons with NaN are false for all operators (including "!="), so
+    plants without a value are never selected.
+
+    Queries run over whole columns, vectorized by numpy, if it is installed,
+    otherwise by the builtins without Python code per plant. Creating the
+    view reads every field of every plant once, so it pays off for repeated
+    queries.
+
+        view = connector.fleet_view()
+        dry = view.ids(view.compare("moisture", "<", "moisture_min_good"))
+        temperatures = view.aggregate("temperature", "mean", by="garden")
+    """
+
+    def __init__(
+        self,
+        plant_ids: array,
+        gardens: array,
+        columns: dict[str, array],
+    ) -> None:
+        """Initialize fleet view."""
+
+        self.plant_ids = plant_ids
+        self.gardens = gardens
+        self.columns = columns
+
+    @classmethod
+    def from_plants(
+        cls,
+        plants: Mapping[int, Plant],
+        gardens: Mapping[int, int | None] | None = None,
+    ) -> FleetView:
+        """Create a view of plants (with the garden IDs of the plants)."""
+
+        gardens = gardens or {}
+        plant_list = list(plants.values())
+
+        columns: dict[str, array] = {}
+        for name in FLOAT_FIELDS:
+            values = list(map(attrgetter(name), plant_list))
+            if None in values:
+                values = [_NAN if value is None else value for value in values]
+            columns[name] = array("d", values)
+        for name in (*STATUS_FIELDS, *BOOL_FIELDS):
+            columns[name] = array("b", list(map(attrgetter(name), plant_list)))
+
+        return cls(
+            array("q", plants),
+            array(
+                "q",
+                (
+                    NO_GARDEN if (garden := gardens.get(plant_id)) is None else garden
+                    for plant_id in plants
+                ),
+            ),
+            columns,
+        )
+
+    def __len__(self) -> int:
+        """Number of plants."""
+        return len(self.plant_ids)
+
+    def column(self, name: str) -> array:
+        """Values of a field ("garden" for the garden IDs)."""
+
+        if name == "garden":
+            return self.gardens
+        try:
+            return self.columns[name]
+        except KeyError as err:
+            raise ValueError(f"Unknown field '{name}'") from err
+
+    def compare(self, name: str, op: str, other: str | float) -> array:
+        """Mask of the plants, where field `op` other field or value is true."""
+
+        compare = _OPERATORS.get(op)
+        if compare is None:
+            raise ValueError(f"Unknown operator '{op}'")
+
+        values = self.column(name)
+        others: Any
+        if isinstance(other, str):
+            others = self.column(other)
+        elif isnan(other):
+            return array("b", bytes(len(values)))
+        else:
+            others = other
+
+        if HAS_NUMPY:
+            values = _as_numpy(values)
+            if isinstance(others, array):
+                others = _as_numpy(others)
+            if op == "!=":
+                return _as_mask((values < others) | (values > others))
+            return _as_mask(compare(values, others))
+
+        if not isinstance(others, array):
+            others = repeat(others)
+        if op == "!=":
+            return _combine(
+                (
+                    bytes(map(operator.lt, values, others)),
+                    bytes(map(operator.gt, values, others)),
+                ),
+                operator.or_,
+            )
+        return array("b", bytes(map(compare, values, others)))
+
+    def outside(self, name: str, bounds: str = "good") -> array:
+        """Mask of the plants with the value of a measurement outside its bounds.
+
+        bounds: "good" or "acceptable" thresholds
+        """
+
+        below = self.compare(name, "<", f"{name}_min_{bounds}")
+        above = self.compare(name, ">", f"{name}_max_{bounds}")
+        return self.any(below, above)
+
+    @staticmethod
+    def all(*masks: array) -> array:
+        """Mask of the plants selected by all masks."""
+        return _combine(masks, operator.and_)
+
+    @staticmethod
+    def any(*masks: array) -> array:
+        """Mask of the plants selected by any of the masks."""
+        return _combine(masks, operator.or_)
+
+    def ids(self, mask: array) -> list[int]:
+        """IDs of the plants selected by a mask."""
+
+        if HAS_NUMPY:
+            return _as_numpy(self.plant_ids)[_as_numpy(mask) != 0].tolist()
+        return list(compress(self.plant_ids, mask))
+
+    def aggregate(
+        self,
+        name: str,
+        function: str = "mean",
+        by: str | None = None,
+        mask: array | None = None,
+    ) -> Any:
+        """Aggregate a field, ignoring missing values (NaN).
+
+        function: "count", "sum", "mean", "min" or "max"
+        by: field to group by (e.g. "garden" or a status field), plants
+            without garden are grouped under NO_GARDEN
+        mask: plants to include (default: all plants)
+
+        Returns the value, or a dict of values by group, if `by` is given.
+        """
+
+        aggregate = _AGGREGATES.get(function)
+        if aggregate is None:
+            raise ValueError(f"Unknown aggregate '{function}'")
+
+        if HAS_NUMPY:
+            return self._aggregate_numpy(function, name, by, mask)
+
+        values: Iterable[Any] = self.column(name)
+        if mask is not None:
+            values = compress(values, mask)
+
+        if by is None:
+            return aggregate(_present(values))
+
+        keys: Iterable[Any] = self.column(by)
+        if mask is not None:
+            keys = compress(keys, mask)
+
+        groups: dict[Any, list[float]] = {}
+        for key, value in zip(keys, values):
+            if not isnan(value):
+                groups.setdefault(key, []).append(value)
+
+        return {key: aggregate(group) for key, group in groups.items()}
+
+    def _aggregate_numpy(
+        self,
+        function: str,
+        name: str,
+        by: str | None,
+        mask: array | None,
+    ) -> Any:
+        """Aggregate a field with numpy (groups reduced in one pass each)."""
+
+        values = _as_numpy(self.column(name))
+        selected = ~numpy.isnan(values)
+        if mask is not None:
+            selected &= _as_numpy(mask) != 0
+
+        if by is None:
+            return _AGGREGATES[function](values[selected].tolist())
+
+        keys, groups = numpy.unique(
+            _as_numpy(self.column(by))[selected], return_inverse=True
+        )
+        if not keys.size:
+            return {}
+        values = values[selected]
+        counts = numpy.bincount(groups)
+
+        results: Any
+        if function == "count":
+            results = counts
+        elif function in ("sum", "mean"):
+            # summed in order of the plants, as by the builtins
+            results = numpy.bincount(groups, weights=values)
+            if function == "mean":
+                results = results / counts
+        else:
+            # the values of each group in a contiguous run, reduced per run
+            reduce_runs = numpy.minimum if function == "min" else numpy.maximum
+            runs = values[numpy.argsort(groups, kind="stable")]
+            results = reduce_runs.reduceat(runs, numpy.cumsum(counts) - counts)
+
+        return dict(zip(keys.tolist(), results.tolist()))
+
+    def to_numpy(self) -> dict[str, Any]:
+        """Columns as NumPy arrays (without copy), requires numpy."""
+
+        if not HAS_NUMPY:
+            raise ImportError("Export to NumPy requires numpy")
+
+        return {
+            "plant_id": _as_numpy(self.plant_ids),
+            "garden": _as_numpy(self.gardens),
+            **{name: _as_numpy(values) for name, values in self.columns.items()},
+        }
+
+    def to_arrow(self) -> Any:
+        """Columns as Arrow table (missing values as nulls), requires pyarrow."""
+
+        try:
+            # pylint: disable-next=import-outside-toplevel
+            import pyarrow  # type: ignore [import-not-found]
+        except ImportError as err:
+            raise ImportError("Export to Arrow requires pyarrow") from err
+
+        columns: dict[str, Any] = {
+            "plant_id": pyarrow.array(self.plant_ids, type=pyarrow.int64()),
+            "garden": pyarrow.array(
+                [None if garden == NO_GARDEN else garden for garden in self.gardens],
+                type=pyarrow.int64(),
+            ),
+        }
+        for name, values in self.columns.items():
+            if values.typecode == "d":
+                columns[name] = pyarrow.array(
+                    values, type=pyarrow.float64(), from_pandas=True  # NaN as null
+                )
+            elif name in BOOL_FIELDS:
+                columns[name] = pyarrow.array(map(bool, values), type=pyarrow.bool_())
+            else:
+                columns[name] = pyarrow.array(values, type=pyarrow.int8())
+
+        return pyarrow.table(columns)
+
+
+def _combine(masks: tuple[Any, ...], combine: Callable[[int, int], int]) -> array:
+    """Combine masks bytewise (as integers with one byte per plant)."""
+
+    if len(masks) == 1:
+        return masks[0]
+
+    combined = reduce(combine, (int.from_bytes(mask, "little") for mask in masks))
+    return array("b", combined.to_bytes(len(masks[0]), "little"))
+
+
+def _as_numpy(values: array) -> Any:
+    """Array as NumPy array (without copy)."""
+    return numpy.frombuffer(values, dtype=_NUMPY_TYPES[values.typecode])
+
+
+def _as_mask(selected: Any) -> array:
+    """Mask of a boolean NumPy array."""
+    return array("b", selected.tobytes())
+
+
+def _present(values: Iterable[float]) -> list[float]:
+    """Values without missing values (NaN)."""
+    return [value for value in values if not isnan(value)]
+
+
+def _mean(values: list[float]) -> float:
+    """Mean of values (NaN if there are none)."""
+    return sum(values) / len(values) if values else _NAN
+
+
+_AGGREGATES: dict[str, Callable[[list[float]], float]] = {
+    "count": len,
+    "sum": sum,
+    "mean": _mean,
+    "min": lambda values: min(values, default=_NAN),
+    "max": lambda values: max(values, default=_NAN),
+}
+
+_NUMPY_TYPES = {"b": "int8", "d": "float64", "q": "int64"}
@@ -0,0 +1,276 @@
+"""Cache for plant images of FYTA API."""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+
+@dataclass
+class CachedImage:
+    """Cached plant image."""
+
+    content_type: str
+    content: bytes
+    digest: str
+
+
+class ImageCache:
+    """LRU cache of plant images keyed by URL.
+
+    The images in memory are limited to `max_size` bytes, the least recently
+    used images are removed first. If a directory is given, the images are
+    additionally stored on disk by the SHA-256 hash of their content, so that
+    equal images of different URLs are stored once. The images on disk are
+    limited to `max_disk_size` bytes and `max_disk_entries` URLs, the least
+    recently used URLs and images no longer referenced are removed first.
+
+    The disk is accessed in a worker thread by async_get() and async_set(),
+    get() and set() access it directly.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self,
+        max_size: int = 32 * 1024 * 1024,
+        directory: str | Path | None = None,
+        max_disk_size: int = 256 * 1024 * 1024,
+        max_disk_entries: int = 4096,
+    ) -> None:
+        """Initialize image cache."""
+
+        self.max_size = max_size
+        self.size = 0
+        self.directory = None if directory is None else Path(directory)
+        self.max_disk_size = max_disk_size
+        self.max_disk_entries = max_disk_entries
+        self.disk_size = 0
+
+        self._images: OrderedDict[str, CachedImage] = OrderedDict()
+
+        # URL hash -> (content type, digest) of the images on disk, LRU first
+        self._disk_urls: OrderedDict[str, tuple[str, str]] | None = None
+        # digest -> [size, number of URLs] of the images on disk
+        self._disk_images: dict[str, list[int]] = {}
+        self._disk_lock = threading.Lock()
+
+        if self.directory is not None:
+            (self.directory / "urls").mkdir(parents=True, exist_ok=True)
+            (self.directory / "images").mkdir(parents=True, exist_ok=True)
+
+    def __contains__(self, url: str) -> bool:
+        """Check if the image of an URL is cached."""
+        return url in self._images or self._read(url) is not None
+
+    def get(self, url: str) -> CachedImage | None:
+        """Get the cached image of an URL."""
+
+        image = self._get(url)
+        if image is None and (image := self._read(url)) is not None:
+            self._add(url, image)
+
+        return image
+
+    async def async_get(self, url: str) -> CachedImage | None:
+        """Get the cached image of an URL, reading the disk in a worker thread."""
+
+        image = self._get(url)
+        if image is None and self.directory is not None:
+            image = await asyncio.to_thread(self._read, url)
+            if image is not None:
+                self._add(url, image)
+
+        return image
+
+    def set(
+        self, url: str, content_type: str, content: bytes, digest: str | None = None
+    ) -> CachedImage:
+        """Store the image of an URL."""
+
+        image = _cached_image(content_type, content, digest)
+
+        self._add(url, image)
+        self._write(url, image)
+
+        return image
+
+    async def async_set(
+        self, url: str, content_type: str, content: bytes, digest: str | None = None
+    ) -> CachedImage:
+        """Store the image of an URL, writing the disk in a worker thread."""
+
+        image = _cached_image(content_type, content, digest)
+
+        self._add(url, image)
+        if self.directory is not None:
+            await asyncio.to_thread(self._write, url, image)
+
+        return image
+
+    def _get(self, url: str) -> CachedImage | None:
+        """Get the image of an URL from memory."""
+
+        image = self._images.get(url)
+        if image is not None:
+            self._images.move_to_end(url)
+
+        return image
+
+    def _add(self, url: str, image: CachedImage) -> None:
+        """Add an image to memory and remove least recently used images."""
+
+        if (previous := self._images.pop(url, None)) is not None:
+            self.size -= len(previous.content)
+
+        if len(image.content) > self.max_size:
+            return
+
+        self._images[url] = image
+        self.size += len(image.content)
+
+        while self.size > self.max_size:
+            _, removed = self._images.popitem(last=False)
+            self.size -= len(removed.content)
+
+    def _read(self, url: str) -> CachedImage | None:
+        """Read the image of an URL from disk."""
+
+        if self.directory is None:
+            return None
+
+        with self._disk_lock:
+            disk_urls = self._load_disk_index(self.directory)
+            key = _url_key(url)
+            if (reference := disk_urls.get(key)) is None:
+                return None
+
+            content_type, digest = reference
+            try:
+                content = (self.directory / "images" / digest).read_bytes()
+                # the modification time keeps the LRU order across restarts
+                os.utime(self.directory / "urls" / key)
+            except OSError:
+                return None
+
+            disk_urls.move_to_end(key)
+
+        return CachedImage(content_type, content, digest)
+
+    def _write(self, url: str, image: CachedImage) -> None:
+        """Write the image of an URL to disk and remove least recently used URLs."""
+
+        if self.directory is None or len(image.content) > self.max_disk_size:
+            return
+
+        with self._disk_lock:
+            disk_urls = self._load_disk_index(self.directory)
+
+            if image.digest not in self._disk_images:
+                image_path = self.directory / "images" / image.digest
+                tmp_path = image_path.with_suffix(".tmp")
+                tmp_path.write_bytes(image.content)
+                tmp_path.replace(image_path)
+                self._disk_images[image.digest] = [len(image.content), 0]
+                self.disk_size += len(image.content)
+            self._disk_images[image.digest][1] += 1
+
+            key = _url_key(url)
+            (self.directory / "urls" / key).write_text(
+                json.dumps(
+                    {"content_type": image.content_type, "digest": image.digest}
+                ),
+                encoding="utf-8",
+            )
+            if (previous := disk_urls.pop(key, None)) is not None:
+                self._release_disk_image(self.directory, previous[1])
+            disk_urls[key] = (image.content_type, image.digest)
+
+            self._evict_disk(self.directory, disk_urls)
+
+    def _load_disk_index(self, directory: Path) -> OrderedDict[str, tuple[str, str]]:
+        """Index of the URLs on disk, scanned on first access (with the lock held)."""
+
+        if self._disk_urls is not None:
+            return self._disk_urls
+
+        references = []
+        for path in (directory / "urls").iterdir():
+            try:
+                reference = json.loads(path.read_text(encoding="utf-8"))
+                references.append(
+                    (
+                        path.stat().st_mtime,
+                        path.name,
+                        reference["content_type"],
+                        reference["digest"],
+                    )
+                )
+            except (OSError, ValueError, KeyError, TypeError):
+                path.unlink(missing_ok=True)
+
+        disk_urls: OrderedDict[str, tuple[str, str]] = OrderedDict()
+        for _, key, content_type, digest in sorted(references):
+            if digest not in self._disk_images:
+                try:
+                    size = (directory / "images" / digest).stat().st_size
+                except OSError:
+                    (directory / "urls" / key).unlink(missing_ok=True)
+                    continue
+                self._disk_images[digest] = [size, 0]
+                self.disk_size += size
+            self._disk_images[digest][1] += 1
+            disk_urls[key] = (content_type, digest)
+
+        # images without URL, e.g. left by an interrupted write
+        for path in (directory / "images").iterdir():
+            if path.name not in self._disk_images:
+                path.unlink(missing_ok=True)
+
+        self._disk_urls = disk_urls
+        self._evict_disk(directory, disk_urls)
+        return disk_urls
+
+    def _evict_disk(
+        self, directory: Path, disk_urls: OrderedDict[str, tuple[str, str]]
+    ) -> None:
+        """Remove least recently used URLs from disk (with the lock held)."""
+
+        while disk_urls and (
+            self.disk_size > self.max_disk_size
+            or len(disk_urls) > self.max_disk_entries
+        ):
+            key, (_, digest) = disk_urls.popitem(last=False)
+            (directory / "urls" / key).unlink(missing_ok=True)
+            self._release_disk_image(directory, digest)
+
+    def _release_disk_image(self, directory: Path, digest: str) -> None:
+        """Remove a reference to an image on disk, and the image if unused."""
+
+        entry = self._disk_images[digest]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._disk_images[digest]
+            self.disk_size -= entry[0]
+            (directory / "images" / digest).unlink(missing_ok=True)
+
+
+def _cached_image(
+    content_type: str, content: bytes, digest: str | None
+) -> CachedImage:
+    """Cached image of a content, hashed if the digest is not known."""
+
+    return CachedImage(
+        content_type=content_type,
+        content=content,
+        digest=hashlib.sha256(content).hexdigest() if digest is None else digest,
+    )
+
+
+def _url_key(url: str) -> str:
+    """Name of the file referencing the image of an URL."""
+    return hashlib.sha256(url.encode()).hexdigest()
@@ -0,0 +1,303 @@
+"""Instrumentation of requests to FYTA API."""
+
+import heapq
+from bisect import bisect_left
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+PARSE_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 5e-3)
+
+
+@dataclass(frozen=True, slots=True)
+class RequestMetric:
+    """Metric of a finished request.
+
+    endpoint: "login", "plant_list", "plant", "measurements" or "image"
+    status: HTTP status of the last attempt (None, if no response was received)
+    latency: seconds until the response headers were received, incl. retries
+    size: size of the response body on the wire from Content-Length (None,
+        if unknown, e.g. for chunked responses), i.e. the compressed size of
+        compressed responses
+    encoding: Content-Encoding of the response (None, if not compressed)
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    endpoint: str
+    method: str
+    url: str
+    status: int | None
+    latency: float
+    size: int | None = None
+    retries: int = 0
+    encoding: str | None = None
+
+
+class Instrumentation:
+    """Hooks called by the client on the hot paths.
+
+    Subclass and override the hooks of interest. The hooks are called in the
+    event loop and should return quickly.
+    """
+
+    def request_started(self, endpoint: str, method: str, url: str) -> None:
+        """Call when a request is started."""
+
+    def request_finished(self, metric: RequestMetric) -> None:
+        """Call when a request has finished (successful or not)."""
+
+    def request_retried(
+        self, endpoint: str, status: int | None, delay: float
+    ) -> None:
+        """Call when a request is retried after delay seconds.
+
+        status: HTTP status of the failed attempt (None, if the connection failed)
+        """
+
+    def token_refreshed(self, latency: float, success: bool) -> None:
+        """Call when a new access token was requested."""
+
+    def plant_parsed(self, plant_id: int, seconds: float) -> None:
+        """Call when the data of a plant was parsed."""
+
+
+class Histogram:
+    """Histogram with fixed buckets (upper bounds, as in Prometheus)."""
+
+    __slots__ = ("buckets", "count", "counts", "sum")
+
+    def __init__(self, buckets: Iterable[float]) -> None:
+        """Initialize histogram."""
+
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last bucket: +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Add a value."""
+
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> list[tuple[float, int]]:
+        """Cumulative counts per upper bound (incl. +Inf)."""
+
+        result: list[tuple[float, int]] = []
+        total = 0
+        for bound, count in zip((*self.buckets, float("inf")), self.counts):
+            total += count
+            result.append((bound, total))
+
+        return result
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile (upper bound of the bucket containing it)."""
+
+        if self.count == 0:
+            return float("nan")
+
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound
+
+        return float("inf")  # pragma: no cover
+
+
+@dataclass
+class MetricsCollector(Instrumentation):
+    """Collector of request metrics with histograms.
+
+    The metrics can be exported in the Prometheus text format or as a dict,
+    e.g. to be forwarded to OpenTelemetry. The slowest requests are kept
+    with their URL to find slow plants.
+
+    The response sizes and `bytes_received` are taken from the Content-Length
+    of the responses, responses without (e.g. chunked) are not included.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    keep_slowest: int = 10
+
+    requests: dict[tuple[str, str, str], Histogram] = field(default_factory=dict)
+    sizes: dict[str, Histogram] = field(default_factory=dict)
+    bytes_received: dict[tuple[str, str], int] = field(default_factory=dict)
+    retries: dict[tuple[str, str], int] = field(default_factory=dict)
+    in_flight: int = 0
+    token_refreshes: dict[str, int] = field(default_factory=dict)
+    token_refresh_latency: Histogram = field(
+        default_factory=lambda: Histogram(LATENCY_BUCKETS)
+    )
+    plant_parse_time: Histogram = field(
+        default_factory=lambda: Histogram(PARSE_BUCKETS)
+    )
+
+    _slowest: list[tuple[float, int, RequestMetric]] = field(
+        default_factory=list, repr=False
+    )
+    _sequence: int = field(default=0, repr=False)
+
+    def request_started(self, endpoint: str, method: str, url: str) -> None:
+        """Count the requests in flight."""
+        self.in_flight += 1
+
+    def request_finished(self, metric: RequestMetric) -> None:
+        """Record latency and size of a request."""
+
+        self.in_flight -= 1
+
+        key = (metric.endpoint, metric.method, str(metric.status or "error"))
+        if (histogram := self.requests.get(key)) is None:
+            histogram = self.requests[key] = Histogram(LATENCY_BUCKETS)
+        histogram.observe(metric.latency)
+
+        if metric.size is not None:
+            if (sizes := self.sizes.get(metric.endpoint)) is None:
+                sizes = self.sizes[metric.endpoint] = Histogram(SIZE_BUCKETS)
+            sizes.observe(metric.size)
+            key_bytes = (metric.endpoint, metric.encoding or "identity")
+            self.bytes_received[key_bytes] = (
+                self.bytes_received.get(key_bytes, 0) + metric.size
+            )
+
+        if self.keep_slowest > 0:
+            self._sequence += 1
+            item = (metric.latency, self._sequence, metric)
+            if len(self._slowest) < self.keep_slowest:
+                heapq.heappush(self._slowest, item)
+            elif item[0] > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, item)
+
+    def request_retried(
+        self, endpoint: str, status: int | None, delay: float
+    ) -> None:
+        """Count the retries."""
+
+        key = (endpoint, str(status or "error"))
+        self.retries[key] = self.retries.get(key, 0) + 1
+
+    def token_refreshed(self, latency: float, success: bool) -> None:
+        """Record a token refresh."""
+
+        result = "success" if success else "failure"
+        self.token_refreshes[result] = self.token_refreshes.get(result, 0) + 1
+        self.token_refresh_latency.observe(latency)
+
+    def plant_parsed(self, plant_id: int, seconds: float) -> None:
+        """Record the parse time of a plant."""
+        self.plant_parse_time.observe(seconds)
+
+    def slowest(self) -> list[RequestMetric]:
+        """Slowest requests, slowest first."""
+        return [metric for _, _, metric in sorted(self._slowest, reverse=True)]
+
+    def as_dict(self) -> dict[str, Any]:
+        """Metrics as dict (count, sum, p50, p95 and p99 of the histograms)."""
+
+        def summary(histogram: Histogram) -> dict[str, float]:
+            return {
+                "count": histogram.count,
+                "sum": histogram.sum,
+                "p50": histogram.quantile(0.5),
+                "p95": histogram.quantile(0.95),
+                "p99": histogram.quantile(0.99),
+            }
+
+        return {
+            "requests": {
+                f"{method} {endpoint} {status}": summary(histogram)
+                for (endpoint, method, status), histogram in self.requests.items()
+            },
+            "response_sizes": {
+                endpoint: summary(histogram) for endpoint, histogram in self.sizes.items()
+            },
+            "bytes_received": {
+                f"{endpoint} {encoding}": count
+                for (endpoint, encoding), count in self.bytes_received.items()
+            },
+            "retries": {
+                f"{endpoint} {status}": count
+                for (endpoint, status), count in self.retries.items()
+            },
+            "in_flight": self.in_flight,
+            "token_refreshes": dict(self.token_refreshes),
+            "token_refresh_latency": summary(self.token_refresh_latency),
+            "plant_parse_time": summary(self.plant_parse_time),
+        }
+
+    def export_prometheus(self, prefix: str = "fyta") -> str:
+        """Metrics in the Prometheus text exposition format."""
+
+        lines: list[str] = []
+
+        def header(name: str, kind: str, description: str) -> None:
+            lines.append(f"# HELP {prefix}_{name} {description}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+
+        def histogram(name: str, labels: dict[str, str], values: Histogram) -> None:
+            label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+            separator = "," if label_text else ""
+            for bound, total in values.cumulative():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(
+                    f'{prefix}_{name}_bucket{{{label_text}{separator}le="{le}"}} {total}'
+                )
+            lines.append(f"{prefix}_{name}_sum{{{label_text}}} {values.sum!r}")
+            lines.append(f"{prefix}_{name}_count{{{label_text}}} {values.count}")
+
+        header("request_duration_seconds", "histogram", "Latency of requests.")
+        for (endpoint, method, status), values in self.requests.items():
+            histogram(
+                "request_duration_seconds",
+                {"endpoint": endpoint, "method": method, "status": status},
+                values,
+            )
+
+        header(
+            "response_size_bytes",
+            "histogram",
+            "Content-Length of responses "
+            "(responses without Content-Length are not counted).",
+        )
+        for endpoint, values in self.sizes.items():
+            histogram("response_size_bytes", {"endpoint": endpoint}, values)
+
+        header(
+            "response_bytes_total",
+            "counter",
+            "Bytes of responses on the wire by Content-Length "
+            "(responses without Content-Length are not counted).",
+        )
+        for (endpoint, encoding), count in self.bytes_received.items():
+            lines.append(
+                f'{prefix}_response_bytes_total{{endpoint="{endpoint}",'
+                f'encoding="{encoding}"}} {count}'
+            )
+
+        header("request_retries_total", "counter", "Retries of requests.")
+        for (endpoint, status), count in self.retries.items():
+            lines.append(
+                f'{prefix}_request_retries_total{{endpoint="{endpoint}",'
+                f'status="{status}"}} {count}'
+            )
+
+        header("requests_in_flight", "gauge", "Requests in flight.")
+        lines.append(f"{prefix}_requests_in_flight {self.in_flight}")
+
+        header("token_refreshes_total", "counter", "Requests of access tokens.")
+        for result, count in self.token_refreshes.items():
+            lines.append(f'{prefix}_token_refreshes_total{{result="{result}"}} {count}')
+
+        header("token_refresh_duration_seconds", "histogram", "Latency of logins.")
+        histogram("token_refresh_duration_seconds", {}, self.token_refresh_latency)
+
+        header("plant_parse_duration_seconds", "histogram", "Parse time of plants.")
+        histogram("plant_parse_duration_seconds", {}, self.plant_parse_time)
+
+        return "\n".join(lines) + "\n"
@@ -1,10 +1,21 @@
 """Models for FYTA."""
-from dataclasses import dataclass, field
-from datetime import datetime
+import sys
+from array import array
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field, fields
+from datetime import UTC, datetime, tzinfo
 from enum import IntEnum
-from typing import Any
+from itertools import compress
+from math import isnan
+from operator import attrgetter
+from statistics import fmean
+from types import NoneType
+from typing import Any, get_args, get_type_hints
 
 from mashumaro import DataClassDictMixin, field_options
+from mashumaro.exceptions import InvalidFieldValue, MissingField
+
+from .fyta_time import parse_datetime, timestamp_codec, utc_timestamp
 
 
 @dataclass
@@ -39,16 +50,23 @@ class SensorStatus(IntEnum):
     ERROR = 2
 
 
-@dataclass
+@dataclass(slots=True)
 class Plant(DataClassDictMixin):
-    """Plant model."""
+    """Plant model.
+
+    Plants are slotted and plants with the same thresholds share the
+    threshold values, to keep large numbers of plants compact in memory.
+    """
 
     # pylint: disable=too-many-instance-attributes
 
     battery_level: float | None
-    fertilise_last: datetime | None
-    fertilise_next: datetime | None
-    last_updated: datetime | None
+    fertilise_last: datetime | None = field(
+        metadata=field_options(deserialize=parse_datetime))
+    fertilise_next: datetime | None = field(
+        metadata=field_options(deserialize=parse_datetime))
+    last_updated: datetime | None = field(
+        metadata=field_options(deserialize=parse_datetime))
     light: float | None
     light_min_acceptable: float | None
     light_min_good: float | None
@@ -101,83 +119,514 @@ class Plant(DataClassDictMixin):
     @classmethod
     def __pre_deserialize__(cls, d: dict[Any, Any]) -> dict[Any, Any]:
 
-        d |= {"sensor_available": True}
-        d |= {"online": True}
-
-        if d.get("measurements") is not None:
-            d |= {"battery_level": d["measurements"]["battery"]}
-            d |= {"light": d["measurements"]["light"]["values"]["current"]}
-            d |= {"light_max_acceptable": d["measurements"]
-                  ["light"]["values"]["max_acceptable"]}
-            d |= {"light_max_good": d["measurements"]
-                  ["light"]["values"]["max_good"]}
-            d |= {"light_min_acceptable": d["measurements"]
-                  ["light"]["values"]["min_acceptable"]}
-            d |= {"light_min_good": d["measurements"]
-                  ["light"]["values"]["min_good"]}
-            d |= {"light_status": int(
-                d["measurements"]["light"].get("status") or 0)}
-            d |= {"moisture": d["measurements"]
-                  ["moisture"]["values"]["current"]}
-            d |= {"moisture_max_acceptable": d["measurements"]
-                  ["moisture"]["values"]["max_acceptable"]}
-            d |= {"moisture_max_good": d["measurements"]
-                  ["moisture"]["values"]["max_good"]}
-            d |= {"moisture_min_acceptable": d["measurements"]
-                  ["moisture"]["values"]["min_acceptable"]}
-            d |= {"moisture_min_good": d["measurements"]
-                  ["moisture"]["values"]["min_good"]}
-            d |= {"moisture_status": int(
-                d["measurements"]["moisture"].get("status") or 0)}
-            d |= {"nutrients_status": int(
-                d["measurements"]["nutrients"].get("status") or 0)}
-            d |= {"ph": d["measurements"].get(
-                "ph").get("values").get("current")}
-            d |= {"salinity": d["measurements"]
-                  ["salinity"]["values"]["current"]}
-            d |= {"salinity_max_acceptable": d["measurements"]
-                  ["salinity"]["values"]["max_acceptable"]}
-            d |= {"salinity_max_good": d["measurements"]
-                  ["salinity"]["values"]["max_good"]}
-            d |= {"salinity_min_acceptable": d["measurements"]
-                  ["salinity"]["values"]["min_acceptable"]}
-            d |= {"salinity_min_good": d["measurements"]
-                  ["salinity"]["values"]["min_good"]}
-            d |= {"salinity_status": int(
-                d["measurements"]["salinity"].get("status") or 0)}
-            d |= {"temperature": d["measurements"]
-                  ["temperature"]["values"]["current"]}
-            d |= {"temperature_max_acceptable": d["measurements"]
-                  ["temperature"]["values"]["max_acceptable"]}
-            d |= {"temperature_max_good": d["measurements"]
-                  ["temperature"]["values"]["max_good"]}
-            d |= {"temperature_min_acceptable": d["measurements"]
-                  ["temperature"]["values"]["min_acceptable"]}
-            d |= {"temperature_min_good": d["measurements"]
-                  ["temperature"]["values"]["min_good"]}
-            d |= {"temperature_status": int(
-                d["measurements"]["temperature"].get("status") or 0)}
-
-        if d.get("sensor") is not None:
-            d |= {"last_updated": d["sensor"]["received_data_at"]}
-            d |= {"low_battery": d["sensor"]["is_battery_low"]}
-            d |= {"sensor_id": d["sensor"]["id"]}
-            d |= {"sw_version": d["sensor"]["version"]}
-        d |= {"sensor_status": int(d.get("sensor", {}).get("status") or 0)}
-
-        d |= {"notification_light": d.get(
-            "notifications", {}).get("light", False)}
-        d |= {"notification_nutrition": d.get(
-            "notifications", {}).get("nutrition", False)}
-        d |= {"notification_temperature": d.get(
-            "notifications", {}).get("temperature", False)}
-        d |= {"notification_water": d.get(
-            "notifications", {}).get("water", False)}
-
-        d |= {"fertilise_last": d.get(
-            "fertilisation", {}).get("last_fertilised_at")}
-        d |= {"fertilise_next": d.get("fertilisation", {}).get("fertilise_at")}
-        d |= {"repotted": d.get("fertilisation", {}).get(
-            "was_repotted", False)}
-
-        return d
+        return d | _extract_plant_fields(d)
+
+    @classmethod
+    def __post_deserialize__(cls, obj: "Plant") -> "Plant":
+
+        thresholds = _get_thresholds(obj)
+        shared_thresholds = _shared_thresholds.get(thresholds)
+        if shared_thresholds is None:
+            if len(_shared_thresholds) >= _MAX_SHARED_THRESHOLDS:
+                _shared_thresholds.clear()
+            shared_thresholds = _shared_thresholds.setdefault(thresholds, thresholds)
+        for name, value in zip(_THRESHOLD_FIELDS, shared_thresholds):
+            setattr(obj, name, value)
+
+        for name in _SHARED_STRING_FIELDS:
+            if isinstance(value := getattr(obj, name), str):
+                setattr(obj, name, sys.intern(value))
+
+        return obj
+
+
+_THRESHOLD_FIELDS = tuple(
+    f"{measurement}_{bound}"
+    for measurement in ("light", "moisture", "salinity", "temperature")
+    for bound in ("min_acceptable", "min_good", "max_acceptable", "max_good")
+)
+_SHARED_STRING_FIELDS = (
+    "plant_origin_path",
+    "plant_thumb_path",
+    "scientific_name",
+    "sw_version",
+)
+_MAX_SHARED_THRESHOLDS = 4096
+
+_get_thresholds = attrgetter(*_THRESHOLD_FIELDS)
+_get_plant_values = attrgetter(*(plant_field.name for plant_field in fields(Plant)))
+_shared_thresholds: dict[tuple[Any, ...], tuple[Any, ...]] = {}
+
+
+_VALUE = None  # value as is
+_REQUIRED = object()  # field left out, if the key is missing (raises MissingField)
+
+
+def _status(value: Any) -> int:
+    """Status of a measurement (0 if missing)."""
+    return int(value or 0)
+
+
+# field of the Plant model, path of the value in the FYTA API data,
+# conversion of the value and default value (if the key does not exist)
+_PLANT_FIELD_PATHS: tuple[
+    tuple[str, tuple[str, ...], Callable[[Any], Any] | None, Any], ...
+] = (
+    ("battery_level", ("measurements", "battery"), _VALUE, _REQUIRED),
+    *(
+        (
+            f"{measurement}{suffix}",
+            ("measurements", measurement, "values", key),
+            _VALUE,
+            _REQUIRED,
+        )
+        for measurement in ("light", "moisture", "salinity", "temperature")
+        for suffix, key in (
+            ("", "current"),
+            ("_max_acceptable", "max_acceptable"),
+            ("_max_good", "max_good"),
+            ("_min_acceptable", "min_acceptable"),
+            ("_min_good", "min_good"),
+        )
+    ),
+    *(
+        (f"{measurement}_status", ("measurements", measurement, "status"), _status, None)
+        for measurement in ("light", "moisture", "nutrients", "salinity", "temperature")
+    ),
+    ("ph", ("measurements", "ph", "values", "current"), _VALUE, None),
+    ("last_updated", ("sensor", "received_data_at"), _VALUE, _REQUIRED),
+    ("low_battery", ("sensor", "is_battery_low"), _VALUE, _REQUIRED),
+    ("sensor_id", ("sensor", "id"), _VALUE, _REQUIRED),
+    ("sw_version", ("sensor", "version"), _VALUE, _REQUIRED),
+    ("sensor_status", ("sensor", "status"), _status, None),
+    ("notification_light", ("notifications", "light"), _VALUE, False),
+    ("notification_nutrition", ("notifications", "nutrition"), _VALUE, False),
+    ("notification_temperature", ("notifications", "temperature"), _VALUE, False),
+    ("notification_water", ("notifications", "water"), _VALUE, False),
+    ("fertilise_last", ("fertilisation", "last_fertilised_at"), _VALUE, None),
+    ("fertilise_next", ("fertilisation", "fertilise_at"), _VALUE, None),
+    ("repotted", ("fertilisation", "was_repotted"), _VALUE, False),
+)
+
+
+def _compile_field_paths(
+    paths: Iterable[tuple[str, tuple[str, ...], Callable[[Any], Any] | None, Any]],
+    constants: dict[str, Any],
+) -> Callable[[dict[str, Any]], dict[str, Any]]:
+    """Compile field paths into a function, which extracts all fields in one pass.
+
+    Every nested dict is looked up once and missing dicts are treated as empty.
+    Fields with the default _REQUIRED are left out, if their key is missing,
+    so that mashumaro raises MissingField. The input data is not modified.
+    Values, which fail to convert, raise InvalidFieldValue like the fields
+    converted by mashumaro.
+    """
+
+    hints = get_type_hints(Plant)
+
+    # nested dicts by path: index of the parent dict and key
+    indexes: dict[tuple[str, ...], int] = {(): 0}
+    lookups: list[tuple[int, str]] = []
+    values: list[tuple[str, int, str, Any, Callable[[Any], Any] | None]] = []
+
+    for name, path, conversion, default in paths:
+        for depth in range(1, len(path)):
+            if path[:depth] not in indexes:
+                indexes[path[:depth]] = len(indexes)
+                lookups.append((indexes[path[: depth - 1]], path[depth - 1]))
+
+        values.append((name, indexes[path[:-1]], path[-1], default, conversion))
+
+    def extract(data: dict[str, Any]) -> dict[str, Any]:
+        dicts = [data]
+        for parent, key in lookups:
+            dicts.append(dicts[parent].get(key) or {})
+
+        result = constants.copy()
+        for name, index, key, default, conversion in values:
+            value = dicts[index].get(key, default)
+            if value is _REQUIRED:
+                continue
+            if conversion is None:
+                result[name] = value
+                continue
+            try:
+                result[name] = conversion(value)
+            except Exception as err:
+                raise InvalidFieldValue(name, hints[name], value, Plant) from err
+
+        return result
+
+    return extract
+
+
+_PLANT_CONSTANTS = {"sensor_available": True, "online": True}
+
+_extract_plant_fields = _compile_field_paths(_PLANT_FIELD_PATHS, _PLANT_CONSTANTS)
+
+
+class LazyPlant(Plant):
+    """Plant, which converts the fields of the raw plant data on first access.
+
+    The conversion of a field is the same as in `Plant.from_dict` and its
+    result is kept, so each field is converted at most once. Useful, if only
+    a few fields of a plant are used, e.g. to forward them.
+
+        plant = LazyPlant.from_raw(data["plant"])
+        plant.moisture  # only the moisture is converted
+    """
+
+    __slots__ = ("_raw", "_tz")
+
+    @classmethod
+    def from_raw(cls, data: dict[str, Any], tz: tzinfo | None = None) -> "LazyPlant":
+        """Create plant from the plant data of the FYTA API (without conversion).
+
+        tz: time zone of `last_updated` (default: as received)
+        """
+
+        plant = cls.__new__(cls)
+        object.__setattr__(plant, "_raw", data)
+        object.__setattr__(plant, "_tz", tz)
+        return plant
+
+    def __getattr__(self, name: str) -> Any:
+        """Convert a field, which was not accessed before."""
+
+        if (convert := _LAZY_FIELDS.get(name)) is None:
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'"
+            )
+
+        value = convert(self._raw)
+        if name == "last_updated" and value is not None and self._tz is not None:
+            value = timestamp_codec(self._tz).localize(value)
+        elif name in _SHARED_STRING_FIELDS and isinstance(value, str):
+            value = sys.intern(value)
+
+        setattr(self, name, value)
+        return value
+
+    def __eq__(self, other: object) -> bool:
+        """Compare the fields with another plant (lazy or not)."""
+
+        if not isinstance(other, Plant):
+            return NotImplemented
+        return _get_plant_values(self) == _get_plant_values(other)
+
+    __hash__ = None  # type: ignore [assignment]
+
+    def to_plant(self) -> Plant:
+        """Convert all fields into a plant."""
+        return Plant.__post_deserialize__(Plant(*_get_plant_values(self)))
+
+
+def _lazy_field(
+    name: str,
+    annotation: Any,
+    extract: Callable[[dict[str, Any]], Any],
+    deserialize: Callable[[Any], Any] | None,
+) -> Callable[[dict[str, Any]], Any]:
+    """Create the conversion of a field of the raw plant data."""
+
+    args = get_args(annotation)
+    optional = NoneType in args
+    kind = next(arg for arg in args if arg is not NoneType) if args else annotation
+    to_value: Callable[[Any], Any] = deserialize or kind
+
+    def convert(data: dict[str, Any]) -> Any:
+        value = extract(data)
+        if value is None and optional:
+            return None
+        try:
+            return to_value(value)
+        except Exception as err:
+            raise InvalidFieldValue(name, annotation, value, Plant) from err
+
+    return convert
+
+
+def _constant(value: Any) -> Callable[[dict[str, Any]], Any]:
+    """Create a field, which has the same value for all plants."""
+
+    def extract(data: dict[str, Any]) -> Any:  # pylint: disable=unused-argument
+        return value
+
+    return extract
+
+
+def _field_path(
+    entry: tuple[str, tuple[str, ...], Callable[[Any], Any] | None, Any],
+    annotation: Any,
+) -> Callable[[dict[str, Any]], Any]:
+    """Create the lookup of a field path in the raw plant data."""
+
+    extract_fields = _compile_field_paths([entry], {})
+    name = entry[0]
+
+    def extract(data: dict[str, Any]) -> Any:
+        try:
+            return extract_fields(data)[name]
+        except KeyError:
+            raise MissingField(name, annotation, Plant) from None
+
+    return extract
+
+
+def _raw_key(name: str, key: str, annotation: Any) -> Callable[[dict[str, Any]], Any]:
+    """Create the lookup of a top-level key of the raw plant data."""
+
+    def extract(data: dict[str, Any]) -> Any:
+        try:
+            return data[key]
+        except KeyError:
+            raise MissingField(name, annotation, Plant) from None
+
+    return extract
+
+
+def _lazy_fields() -> dict[str, Callable[[dict[str, Any]], Any]]:
+    """Conversions of all fields of the plant model."""
+
+    paths = {entry[0]: entry for entry in _PLANT_FIELD_PATHS}
+    hints = get_type_hints(Plant)
+    result: dict[str, Callable[[dict[str, Any]], Any]] = {}
+
+    for plant_field in fields(Plant):
+        name = plant_field.name
+        annotation = hints[name]
+        if name in _PLANT_CONSTANTS:
+            result[name] = _constant(_PLANT_CONSTANTS[name])
+            continue
+        if name in paths:
+            extract = _field_path(paths[name], annotation)
+        else:
+            key = plant_field.metadata.get("alias") or name
+            extract = _raw_key(name, key, annotation)
+        result[name] = _lazy_field(
+            name, annotation, extract, plant_field.metadata.get("deserialize")
+        )
+
+    return result
+
+
+@dataclass
+class PlantMeasurements:
+    """Measurement history model of a plant.
+
+    The samples are stored column-wise: sample i consists of the values at
+    index i of `timestamps`, `light`, `temperature`, `soil_moisture` and
+    `soil_fertility`. Timestamps are UTC epoch seconds, missing values NaN.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    timestamps: "array[float]"
+    light: "array[float]"
+    temperature: "array[float]"
+    soil_moisture: "array[float]"
+    soil_fertility: "array[float]"
+    dli_light_timestamps: "array[float]"
+    dli_light: "array[float]"
+    absolute_values: dict[str, tuple[float, float]]
+    thresholds: dict[str, float]
+
+    @classmethod
+    def from_dict(cls, d: dict[str, Any]) -> "PlantMeasurements":
+        """Create measurement history from the response of the FYTA API."""
+
+        samples = d.get("measurements") or []
+        dli_samples = d.get("dli_light") or []
+
+        return cls(
+            timestamps=array("d", (utc_timestamp(s["date_utc"]) for s in samples)),
+            light=_float_array(samples, "light"),
+            temperature=_float_array(samples, "temperature"),
+            soil_moisture=_float_array(samples, "soil_moisture"),
+            soil_fertility=_float_array(samples, "soil_fertility"),
+            dli_light_timestamps=array(
+                "d", (utc_timestamp(s["date_utc"]) for s in dli_samples)
+            ),
+            dli_light=_float_array(dli_samples, "dli_light"),
+            absolute_values={
+                key: (float(values["min"]), float(values["max"]))
+                for key, values in (d.get("absolute_values") or {}).items()
+            },
+            thresholds={
+                key: float(value)
+                for key, value in (d.get("thresholds") or {}).items()
+                if value is not None
+            },
+        )
+
+    def __len__(self) -> int:
+        """Number of samples."""
+        return len(self.timestamps)
+
+    def datetime_at(self, index: int) -> datetime:
+        """Time of a sample as UTC datetime."""
+        return datetime.fromtimestamp(self.timestamps[index], UTC)
+
+    def last_sample_at(self) -> float | None:
+        """Time of the newest sample (None, if there are no samples)."""
+        return max(self.timestamps) if self.timestamps else None
+
+    def extend(self, newer: "PlantMeasurements") -> int:
+        """Append the samples, which are newer than the newest sample.
+
+        The new samples are appended in chronological order, the thresholds
+        and absolute values are replaced. The DLI of the newest day is a
+        running total, so it is replaced by a newer value of the same day.
+        Returns the number of new samples.
+        """
+
+        appended = _append_newer(
+            self.timestamps, _get_series(self), newer.timestamps, _get_series(newer)
+        )
+        _append_newer(
+            self.dli_light_timestamps,
+            [self.dli_light_timestamps, self.dli_light],
+            newer.dli_light_timestamps,
+            [newer.dli_light_timestamps, newer.dli_light],
+            replace_last=True,
+        )
+        self.absolute_values = newer.absolute_values
+        self.thresholds = newer.thresholds
+
+        return appended
+
+    def trim(self, before: float) -> int:
+        """Remove the samples before a time, returns the number of removed samples."""
+
+        keep = [timestamp >= before for timestamp in self.timestamps]
+        removed = len(keep) - sum(keep)
+        if removed:
+            for name in _SERIES:
+                setattr(self, name, array("d", compress(getattr(self, name), keep)))
+
+        keep = [timestamp >= before for timestamp in self.dli_light_timestamps]
+        if not all(keep):
+            self.dli_light_timestamps = array(
+                "d", compress(self.dli_light_timestamps, keep)
+            )
+            self.dli_light = array("d", compress(self.dli_light, keep))
+
+        return removed
+
+    def downsample(self, interval: float, function: str = "mean") -> "PlantMeasurements":
+        """Aggregate the samples into buckets of `interval` seconds.
+
+        function: "mean", "min" or "max" of the values in a bucket
+        The buckets are aligned to the epoch (e.g. days start at 00:00 UTC)
+        and the timestamps of the result are the starts of the buckets.
+        Missing values are ignored, buckets without values are NaN.
+
+            hourly = measurements.downsample(3600, "max")
+        """
+
+        aggregate = _DOWNSAMPLE_AGGREGATES.get(function)
+        if aggregate is None:
+            raise ValueError(f"Unknown aggregate '{function}'")
+
+        timestamps, series = _downsample(
+            self.timestamps, _get_series(self)[1:], interval, aggregate
+        )
+        dli_timestamps, dli_series = _downsample(
+            self.dli_light_timestamps, [self.dli_light], interval, aggregate
+        )
+
+        return PlantMeasurements(
+            timestamps=timestamps,
+            light=series[0],
+            temperature=series[1],
+            soil_moisture=series[2],
+            soil_fertility=series[3],
+            dli_light_timestamps=dli_timestamps,
+            dli_light=dli_series[0],
+            absolute_values=dict(self.absolute_values),
+            thresholds=dict(self.thresholds),
+        )
+
+
+_SERIES = ("timestamps", "light", "temperature", "soil_moisture", "soil_fertility")
+
+
+def _get_series(measurements: PlantMeasurements) -> list["array[float]"]:
+    """Timestamps and values of the samples."""
+    return [getattr(measurements, name) for name in _SERIES]
+
+
+_DOWNSAMPLE_AGGREGATES: dict[str, Callable[[list[float]], float]] = {
+    "mean": fmean,
+    "min": min,
+    "max": max,
+}
+
+
+def _append_newer(
+    timestamps: "array[float]",
+    series: list["array[float]"],
+    new_timestamps: "array[float]",
+    new_series: list["array[float]"],
+    replace_last: bool = False,
+) -> int:
+    """Append the samples newer than the newest timestamp (in time order).
+
+    replace_last: replace the values of the newest timestamp by new values
+    of the same timestamp (for running totals)
+    """
+
+    position = max(range(len(timestamps)), key=timestamps.__getitem__, default=None)
+    last = float("-inf") if position is None else timestamps[position]
+
+    if replace_last and position is not None:
+        for index, timestamp in enumerate(new_timestamps):
+            if timestamp == last:
+                for values, new_values in zip(series, new_series):
+                    values[position] = new_values[index]
+
+    indices = sorted(
+        (index for index, timestamp in enumerate(new_timestamps) if timestamp > last),
+        key=new_timestamps.__getitem__,
+    )
+    for values, new_values in zip(series, new_series):
+        values.extend(new_values[index] for index in indices)
+
+    return len(indices)
+
+
+def _downsample(
+    timestamps: "array[float]",
+    series: list["array[float]"],
+    interval: float,
+    aggregate: Callable[[list[float]], float],
+) -> tuple["array[float]", list["array[float]"]]:
+    """Aggregate series into buckets of interval seconds."""
+
+    keys = [timestamp - timestamp % interval for timestamp in timestamps]
+    buckets = sorted(set(keys))
+    positions = {key: position for position, key in enumerate(buckets)}
+    indices = [positions[key] for key in keys]
+    nan = float("nan")
+
+    result: list[array] = []
+    for values in series:
+        groups: list[list[float]] = [[] for _ in buckets]
+        for position, value in zip(indices, values):
+            if not isnan(value):
+                groups[position].append(value)
+        result.append(array("d", (aggregate(group) if group else nan for group in groups)))
+
+    return array("d", buckets), result
+
+
+def _float_array(samples: list[dict[str, Any]], key: str) -> "array[float]":
+    """Collect the values of a series into an array (NaN for missing values)."""
+    nan = float("nan")
+    return array(
+        "d",
+        (nan if (value := s.get(key)) is None else float(value) for s in samples),
+    )
+
+
+_LAZY_FIELDS = _lazy_fields()
@@ -0,0 +1,168 @@
+"""Pool of connectors to manage several FYTA accounts."""
+
+import asyncio
+from concurrent.futures import Executor
+from datetime import datetime
+from typing import Self
+
+from aiohttp import ClientSession, TCPConnector
+
+from .fyta_connector import FytaConnector
+from .fyta_exceptions import FytaError
+from .fyta_metrics import Instrumentation
+from .fyta_models import Plant
+from .fyta_ratelimit import TokenBucket
+
+
+class FytaConnectorPool:
+    """Pool of connectors of several FYTA accounts sharing one session.
+
+    All accounts use the same connection pool. The number of concurrent
+    requests is limited for the pool (max_concurrency) and for each account
+    (max_concurrency_per_account), so that large accounts do not block the
+    requests of other accounts.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    # pylint: disable=too-many-arguments
+    # pylint: disable=too-many-positional-arguments
+
+    def __init__(
+        self,
+        max_concurrency: int = 20,
+        max_concurrency_per_account: int = 4,
+        tz: str = "",
+        session: ClientSession | None = None,
+        connection_limit: int = 100,
+        rate_limit: float | None = None,
+        rate_limit_per_account: float | None = None,
+        instrumentation: Instrumentation | None = None,
+        parse_executor: Executor | None = None,
+    ) -> None:
+        """Initialize connector pool.
+
+        session: session to use instead of the session created by the pool
+        connection_limit: maximal number of open connections of the pool session
+        rate_limit: maximal requests per second of all accounts
+        rate_limit_per_account: maximal requests per second of each account
+        instrumentation: hooks for the metrics of all accounts
+        parse_executor: thread or process pool parsing the plants of all accounts
+        """
+
+        self.connectors: dict[str, FytaConnector] = {}
+        self.failed_accounts: dict[str, FytaError] = {}
+        self.max_concurrency_per_account = max_concurrency_per_account
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.timezone = tz
+        self.connection_limit = connection_limit
+        self.rate_limiter = None if rate_limit is None else TokenBucket(rate_limit)
+        self.rate_limit_per_account = rate_limit_per_account
+        self.instrumentation = instrumentation
+        self.parse_executor = parse_executor
+
+        self._session = session
+        self._close_session = session is None
+
+    @property
+    def session(self) -> ClientSession:
+        """Session shared by all accounts of the pool."""
+
+        if self._session is None:
+            self._session = ClientSession(
+                connector=TCPConnector(
+                    limit=self.connection_limit,
+                    ttl_dns_cache=300,
+                    keepalive_timeout=60,
+                )
+            )
+            self._close_session = True
+
+        return self._session
+
+    def add_account(
+        self,
+        email: str,
+        password: str,
+        access_token: str = "",
+        expiration: datetime | None = None,
+        tz: str | None = None,
+    ) -> FytaConnector:
+        """Add an account to the pool."""
+
+        connector = FytaConnector(
+            email,
+            password,
+            access_token,
+            expiration,
+            self.timezone if tz is None else tz,
+            self.session,
+        )
+        connector.client.request_semaphore = self.semaphore
+        connector.client.instrumentation = self.instrumentation
+        connector.parse_executor = self.parse_executor
+        if self.rate_limit_per_account is not None:
+            connector.client.rate_limiters.append(
+                TokenBucket(self.rate_limit_per_account)
+            )
+        if self.rate_limiter is not None:
+            connector.client.rate_limiters.append(self.rate_limiter)
+        self.connectors[email] = connector
+
+        return connector
+
+    def remove_account(self, email: str) -> None:
+        """Remove an account from the pool."""
+
+        self.connectors.pop(email, None)
+        self.failed_accounts.pop(email, None)
+
+    async def update_all_plants(
+        self, incremental: bool = False, timeout: float | None = None
+    ) -> dict[str, dict[int, Plant]]:
+        """Get data of all plants of all accounts.
+
+        Accounts, which could not be updated, are skipped and the errors are
+        stored in `failed_accounts`. The `timeout` is the budget in seconds
+        of the update of each account (see FytaConnector.update_all_plants).
+        """
+
+        connectors = list(self.connectors.values())
+        results = await asyncio.gather(
+            *(
+                connector.update_all_plants(
+                    max_concurrency=self.max_concurrency_per_account,
+                    incremental=incremental,
+                    timeout=timeout,
+                )
+                for connector in connectors
+            ),
+            return_exceptions=True,
+        )
+
+        plants: dict[str, dict[int, Plant]] = {}
+        failed_accounts: dict[str, FytaError] = {}
+        for connector, result in zip(connectors, results):
+            if isinstance(result, FytaError):
+                failed_accounts[connector.email] = result
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                plants[connector.email] = result
+
+        self.failed_accounts = failed_accounts
+
+        return plants
+
+    async def close(self) -> None:
+        """Close the session of the pool."""
+
+        if self._session is not None and self._close_session:
+            await self._session.close()
+
+    async def __aenter__(self) -> Self:
+        """Enter the runtime context of the pool."""
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        """Close the pool at the end of the runtime context."""
+        await self.close()
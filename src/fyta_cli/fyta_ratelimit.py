@@ -0,0 +1,95 @@
+"""Rate limiting and retries for requests to FYTA API."""
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+
+
+class TokenBucket:
+    """Token bucket limiting the rate of requests.
+
+    Up to `capacity` requests can be sent at once, afterwards the requests
+    are limited to `rate` requests per second.
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        """Initialize token bucket."""
+
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+
+        self.rate = rate
+        self.capacity = max(1.0, rate) if capacity is None else capacity
+        self.tokens = self.capacity
+
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        """Add the tokens accumulated since the last update."""
+
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Wait until a request may be sent."""
+
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+@dataclass
+class RetryPolicy:
+    """Retries of requests rejected because of load (429), server errors (5xx)
+    or failed connections (e.g. server disconnects).
+
+    The delay before retry n is random between 0 and base_delay * 2**n
+    (at most max_delay), unless the server sends a Retry-After header.
+    """
+
+    max_retries: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    retry_statuses: frozenset[int] = field(
+        default_factory=lambda: frozenset({429, 500, 502, 503, 504})
+    )
+
+    def delay(self, attempt: int, retry_after: str | None = None) -> float:
+        """Delay in seconds before the retry after attempt (starting with 0)."""
+
+        if (
+            retry_after is not None
+            and (seconds := _parse_retry_after(retry_after)) is not None
+        ):
+            return min(self.max_delay, seconds)
+
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+def _parse_retry_after(value: str) -> float | None:
+    """Parse a Retry-After header (seconds or HTTP date)."""
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=UTC)
+
+    return max(0.0, (retry_at - datetime.now(UTC)).total_seconds())
@@ -0,0 +1,208 @@
+"""Scheduler polling FYTA plants at the time of their next sensor data."""
+
+import asyncio
+import inspect
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from datetime import timedelta
+from statistics import median
+
+from .fyta_connector import FytaConnector
+from .fyta_exceptions import (
+    FytaAuthentificationError,
+    FytaConnectionError,
+    FytaPasswordError,
+    FytaPlantError,
+)
+from .fyta_models import Plant, SensorStatus
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PlantScheduler:
+    """Scheduler polling each plant shortly after its next expected sensor data.
+
+    The upload interval of each sensor is estimated from the history of
+    `Plant.last_updated`. A plant is polled `poll_delay` after its expected
+    upload. If no new data arrives or the sensor is offline, the polling of
+    the plant backs off exponentially up to `max_interval`.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    # pylint: disable=too-many-arguments
+    # pylint: disable=too-many-positional-arguments
+
+    def __init__(
+        self,
+        connector: FytaConnector,
+        callback: Callable[[int, Plant], Awaitable[None] | None] | None = None,
+        default_interval: timedelta = timedelta(minutes=60),
+        min_interval: timedelta = timedelta(minutes=1),
+        max_interval: timedelta = timedelta(hours=6),
+        poll_delay: timedelta = timedelta(minutes=1),
+        plant_list_interval: timedelta = timedelta(hours=1),
+        max_concurrency: int = 4,
+    ) -> None:
+        """Initialize scheduler.
+
+        callback: called with plant ID and plant after each update of a plant
+        """
+
+        self.connector = connector
+        self.callback = callback
+        self.default_interval = default_interval.total_seconds()
+        self.min_interval = min_interval.total_seconds()
+        self.max_interval = max_interval.total_seconds()
+        self.poll_delay = poll_delay.total_seconds()
+        self.plant_list_interval = plant_list_interval.total_seconds()
+        self.max_concurrency = max_concurrency
+
+        self.next_poll: dict[int, float] = {}
+
+        self._history: dict[int, deque[float]] = {}
+        self._misses: dict[int, int] = {}
+        self._next_plant_list = 0.0
+        self._task: asyncio.Task[None] | None = None
+
+    def expected_interval(self, plant_id: int) -> float:
+        """Estimated seconds between two uploads of the sensor of a plant."""
+
+        history = self._history.get(plant_id)
+        if history is None or len(history) < 2:
+            return self.default_interval
+
+        intervals = [later - earlier for earlier, later in zip(history, list(history)[1:])]
+        return max(self.min_interval, median(intervals))
+
+    def record(self, plant_id: int, plant: Plant | None, now: float) -> float:
+        """Record the polled data of a plant and schedule its next poll."""
+
+        last_updated = (
+            None
+            if plant is None or plant.last_updated is None
+            else plant.last_updated.timestamp()
+        )
+        history = self._history.setdefault(plant_id, deque(maxlen=8))
+
+        if last_updated is not None and (not history or last_updated > history[-1]):
+            history.append(last_updated)
+            self._misses[plant_id] = 0
+        else:
+            self._misses[plant_id] = self._misses.get(plant_id, -1) + 1
+
+        offline = plant is None or not plant.online or (
+            plant.sensor_status == SensorStatus.ERROR
+        )
+        backoff = min(
+            self.max_interval, self.min_interval * 2 ** self._misses[plant_id]
+        )
+
+        if offline or last_updated is None:
+            next_poll = now + max(backoff, self.default_interval)
+        else:
+            next_poll = history[-1] + self.expected_interval(plant_id) + self.poll_delay
+            if next_poll <= now:
+                next_poll = now + backoff  # data is overdue
+
+        next_poll = min(max(next_poll, now + self.min_interval), now + self.max_interval)
+        self.next_poll[plant_id] = next_poll
+
+        return next_poll
+
+    async def poll(self, now: float | None = None) -> list[int]:
+        """Update the plant list, if due, and poll all plants, which are due.
+
+        Returns the IDs of the polled plants.
+        """
+
+        now = time.time() if now is None else now
+
+        if now >= self._next_plant_list:
+            plant_list = await self.connector.update_plant_list()
+            for plant_id in plant_list:
+                self.next_poll.setdefault(plant_id, now)
+            for plant_id in set(self.next_poll) - set(plant_list):
+                self._remove(plant_id)
+            self._next_plant_list = now + self.plant_list_interval
+
+        due = [plant_id for plant_id, next_poll in self.next_poll.items() if next_poll <= now]
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def update(plant_id: int) -> None:
+            async with semaphore:
+                try:
+                    plant = await self.connector.update_plant_data(plant_id)
+                except (FytaConnectionError, FytaPlantError) as err:
+                    _LOGGER.debug("Polling of plant %s failed: %s", plant_id, err)
+                    plant = None
+
+            self.record(plant_id, plant, time.time())
+            if plant is None:
+                return
+
+            self.connector.plants[plant_id] = plant
+            self.connector.plant_events.publish({plant_id: plant})
+            if self.callback is not None:
+                result = self.callback(plant_id, plant)
+                if inspect.isawaitable(result):
+                    await result
+
+        await asyncio.gather(*(update(plant_id) for plant_id in due))
+
+        return due
+
+    async def run(self) -> None:
+        """Poll the plants until the scheduler is stopped.
+
+        Failed requests are retried at the next poll. If the authentication
+        fails (e.g. because the password was changed), polling stops and the
+        error is raised, as retries would fail as well.
+        """
+
+        while True:
+            try:
+                await self.poll()
+            except (FytaConnectionError, FytaPlantError) as err:
+                _LOGGER.debug("Polling failed: %s", err)
+                self._next_plant_list = time.time() + self.min_interval
+            except (FytaAuthentificationError, FytaPasswordError) as err:
+                _LOGGER.error("Polling stopped, authentication failed: %r", err)
+                raise
+
+            wake_up = min([self._next_plant_list, *self.next_poll.values()])
+            await asyncio.sleep(max(0.0, wake_up - time.time()))
+
+    def start(self) -> None:
+        """Start polling in the background."""
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop polling.
+
+        Raises the error, which stopped the polling before (see `run`).
+        """
+
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._task = None
+
+    def _remove(self, plant_id: int) -> None:
+        """Forget a plant, which is not available anymore."""
+
+        self.next_poll.pop(plant_id, None)
+        self._history.pop(plant_id, None)
+        self._misses.pop(plant_id, None)
+        self.connector.plants.pop(plant_id, None)
+        self.connector.plant_events.publish({}, removed=[plant_id])
@@ -0,0 +1,424 @@
+"""Compact binary snapshots of the state of a FytaConnector.
+
+A snapshot contains the account (email, access token and expiration, but
+not the password), the plant list, the plants and the measurements. The
+layout is columnar: each field of all plants is stored as one array, and
+all strings are stored once in a string table.
+
+    header   magic "FYTA", format version, byte order
+    strings  string table (lengths and UTF-8 text)
+    account  email, access token and expiration
+    list     plant IDs, nicknames, time of sensor data, sensor availability,
+             garden IDs
+    failed   IDs of failed plants
+    plants   plant IDs and one column per field of Plant
+    history  measurement arrays per plant
+"""
+
+from __future__ import annotations
+
+import json
+import struct
+import sys
+from array import array
+from collections.abc import Iterable
+from dataclasses import fields
+from datetime import UTC, datetime, timedelta, tzinfo
+from enum import IntEnum
+from math import isnan
+from typing import TYPE_CHECKING, Any
+
+from .fyta_models import Plant, PlantMeasurements
+
+if TYPE_CHECKING:
+    from .fyta_connector import FytaConnector
+
+MAGIC = b"FYTA"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<4sHB")
+_COUNT = struct.Struct("<I")
+_NO_STRING = 0xFFFFFFFF
+_NO_INT = -(2**63)
+_NAN = float("nan")
+_EPOCH = datetime(1970, 1, 1)
+
+# kinds of datetime values
+_NONE, _NAIVE, _AWARE = 0, 1, 2
+
+_MEASUREMENT_ARRAYS = (
+    "timestamps",
+    "light",
+    "temperature",
+    "soil_moisture",
+    "soil_fertility",
+    "dli_light_timestamps",
+    "dli_light",
+)
+
+
+def _column_kind(annotation: Any) -> str:
+    """Storage of a field of Plant."""
+
+    if annotation in (float, float | None):
+        return "float"
+    if annotation in (datetime, datetime | None):
+        return "datetime"
+    if annotation is bool:
+        return "bool"
+    if annotation is int:
+        return "int"
+    if isinstance(annotation, type) and issubclass(annotation, IntEnum):
+        return "enum"
+    return "str"
+
+
+def _enum_members(annotation: Any) -> dict[int, IntEnum]:
+    """Members of an enum by value (empty for other types)."""
+
+    if _column_kind(annotation) != "enum":
+        return {}
+    return {member.value: member for member in annotation}
+
+
+# name, storage and members (of enums) of the fields of Plant
+_PLANT_COLUMNS: tuple[tuple[str, str, dict[int, IntEnum]], ...] = tuple(
+    (f.name, _column_kind(f.type), _enum_members(f.type)) for f in fields(Plant)
+)
+
+
+class _Writer:
+    """Writer of the sections of a snapshot."""
+
+    def __init__(self) -> None:
+        """Initialize writer."""
+
+        self.parts: list[bytes] = []
+        self.strings: dict[str, int] = {}
+
+    def string(self, value: str | None) -> int:
+        """Index of a string in the string table."""
+
+        if value is None:
+            return _NO_STRING
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+        return index
+
+    def array(self, values: array) -> None:
+        """Write an array with its length."""
+
+        self.parts.append(_COUNT.pack(len(values)))
+        self.parts.append(values.tobytes())
+
+    def ints(self, values: Iterable[int]) -> None:
+        """Write a column of integers."""
+        self.array(array("q", values))
+
+    def flags(self, values: Iterable[int]) -> None:
+        """Write a column of small integers (bools, enums)."""
+        self.array(array("b", values))
+
+    def floats(self, values: Iterable[float | None]) -> None:
+        """Write a column of floats (None as NaN)."""
+        self.array(array("d", (_NAN if value is None else value for value in values)))
+
+    def texts(self, values: Iterable[str | None]) -> None:
+        """Write a column of strings as indices in the string table."""
+        self.array(array("I", (self.string(value) for value in values)))
+
+    def datetimes(self, values: Iterable[datetime | None]) -> None:
+        """Write a column of datetimes as kinds and epoch seconds."""
+
+        kinds = array("b")
+        timestamps = array("d")
+        for value in values:
+            if value is None:
+                kinds.append(_NONE)
+                timestamps.append(0.0)
+            elif value.tzinfo is None:
+                kinds.append(_NAIVE)
+                timestamps.append(value.replace(tzinfo=UTC).timestamp())
+            else:
+                kinds.append(_AWARE)
+                timestamps.append(value.timestamp())
+        self.array(kinds)
+        self.array(timestamps)
+
+    def string_table(self) -> bytes:
+        """String table (lengths in characters and UTF-8 text)."""
+
+        lengths = array("I", (len(value) for value in self.strings))
+        text = "".join(self.strings).encode("utf-8")
+        return b"".join(
+            (
+                _COUNT.pack(len(lengths)),
+                lengths.tobytes(),
+                _COUNT.pack(len(text)),
+                text,
+            )
+        )
+
+
+class _Reader:
+    """Reader of the sections of a snapshot."""
+
+    def __init__(self, data: bytes, offset: int, swap: bool, timezone: tzinfo) -> None:
+        """Initialize reader."""
+
+        self.data = memoryview(data)
+        self.offset = offset
+        self.swap = swap
+        self.timezone = timezone
+        self.strings: list[str] = []
+
+    def array(self, typecode: str) -> array:
+        """Read an array written with its length."""
+
+        (count,) = _COUNT.unpack_from(self.data, self.offset)
+        start = self.offset + _COUNT.size
+        values = array(typecode)
+        self.offset = start + count * values.itemsize
+        if self.offset > len(self.data):
+            raise ValueError("Snapshot is truncated")
+        values.frombytes(self.data[start : self.offset])
+        if self.swap:
+            values.byteswap()
+        return values
+
+    def ints(self) -> list[int]:
+        """Read a column of integers."""
+        return self.array("q").tolist()
+
+    def flags(self) -> list[int]:
+        """Read a column of small integers."""
+        return self.array("b").tolist()
+
+    def floats(self) -> list[float | None]:
+        """Read a column of floats (NaN as None), equal values are shared."""
+
+        shared: dict[float, float] = {}
+        return [
+            None if isnan(value) else shared.setdefault(value, value)
+            for value in self.array("d").tolist()
+        ]
+
+    def texts(self) -> list[str | None]:
+        """Read a column of strings."""
+
+        strings = self.strings
+        return [
+            None if index == _NO_STRING else strings[index]
+            for index in self.array("I")
+        ]
+
+    def datetimes(self) -> list[datetime | None]:
+        """Read a column of datetimes (aware datetimes in the timezone).
+
+        Equal datetimes are shared.
+        """
+
+        kinds = self.array("b")
+        timestamps = self.array("d")
+        timezone = self.timezone
+        shared: dict[tuple[int, float], datetime | None] = {}
+
+        values: list[datetime | None] = []
+        for key in zip(kinds, timestamps):
+            value = shared.get(key)
+            if value is None:
+                kind, timestamp = key
+                if kind == _NONE:
+                    value = None
+                elif kind == _NAIVE:
+                    value = _EPOCH + timedelta(seconds=timestamp)
+                else:
+                    value = datetime.fromtimestamp(timestamp, timezone)
+                shared[key] = value
+            values.append(value)
+
+        return values
+
+    def string_table(self) -> None:
+        """Read the string table."""
+
+        lengths = self.array("I")
+        (size,) = _COUNT.unpack_from(self.data, self.offset)
+        start = self.offset + _COUNT.size
+        self.offset = start + size
+        text = str(self.data[start : self.offset], "utf-8")
+
+        strings: list[str] = []
+        position = 0
+        for length in lengths:
+            strings.append(text[position : position + length])
+            position += length
+        self.strings = strings
+
+    def plants(self) -> dict[int, Plant]:
+        """Read the plants."""
+
+        plant_ids = self.ints()
+        columns: list[list[Any]] = []
+        for _, kind, members in _PLANT_COLUMNS:
+            if kind == "float":
+                columns.append(self.floats())
+            elif kind == "datetime":
+                columns.append(self.datetimes())
+            elif kind == "bool":
+                columns.append([bool(value) for value in self.flags()])
+            elif kind == "enum":
+                columns.append([members[value] for value in self.flags()])
+            elif kind == "int":
+                columns.append(self.ints())
+            else:
+                columns.append(self.texts())
+
+        # equal values are shared by the columns, like in Plant.from_dict
+        return {
+            plant_id: Plant(*values)
+            for plant_id, values in zip(plant_ids, zip(*columns))
+        }
+
+    def measurements(self) -> dict[int, PlantMeasurements]:
+        """Read the measurements."""
+
+        plant_ids = self.ints()
+        arrays = [
+            [self.array("d") for _ in _MEASUREMENT_ARRAYS] for _ in plant_ids
+        ]
+        dicts = self.texts()
+
+        measurements: dict[int, PlantMeasurements] = {}
+        for plant_id, columns, text in zip(plant_ids, arrays, dicts):
+            absolute_values, thresholds = json.loads(text or "[{}, {}]")
+            series: dict[str, Any] = dict(zip(_MEASUREMENT_ARRAYS, columns))
+            measurements[plant_id] = PlantMeasurements(
+                **series,
+                absolute_values={
+                    key: (minimum, maximum)
+                    for key, (minimum, maximum) in absolute_values.items()
+                },
+                thresholds=thresholds,
+            )
+
+        return measurements
+
+
+def dump_state(connector: FytaConnector) -> bytes:
+    """Dump the state of a connector into a snapshot."""
+
+    client = connector.client
+    writer = _Writer()
+
+    # account
+    writer.texts([client.email, client.access_token])
+    writer.datetimes([client.expiration])
+
+    # plant list
+    plant_ids = list(connector.plant_list)
+    writer.ints(plant_ids)
+    writer.texts(connector.plant_list.values())
+    writer.datetimes(connector.plant_received_data_at.get(i) for i in plant_ids)
+    writer.flags(
+        -1 if (has_sensor := connector.plant_has_sensor.get(i)) is None else has_sensor
+        for i in plant_ids
+    )
+    writer.ints(
+        _NO_INT if (garden := connector.plant_garden.get(i)) is None else garden
+        for i in plant_ids
+    )
+    writer.ints(connector.failed_plants)
+
+    # plants
+    plants = list(connector.plants.values())
+    writer.ints(connector.plants)
+    for name, kind, _ in _PLANT_COLUMNS:
+        values = [getattr(plant, name) for plant in plants]
+        if kind == "float":
+            writer.floats(values)
+        elif kind == "datetime":
+            writer.datetimes(values)
+        elif kind in ("bool", "enum"):
+            writer.flags(values)
+        elif kind == "int":
+            writer.ints(values)
+        else:
+            writer.texts(values)
+
+    # measurements
+    writer.ints(connector.measurements)
+    for measurements in connector.measurements.values():
+        for name in _MEASUREMENT_ARRAYS:
+            writer.array(getattr(measurements, name))
+    writer.texts(
+        json.dumps([measurements.absolute_values, measurements.thresholds])
+        for measurements in connector.measurements.values()
+    )
+
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, sys.byteorder == "big")
+
+    return b"".join((header, writer.string_table(), *writer.parts))
+
+
+def load_state(connector: FytaConnector, data: bytes) -> None:
+    """Load the state of a connector from a snapshot.
+
+    The snapshot has to belong to the account of the connector. Datetimes
+    are restored in the timezone of the connector.
+    """
+
+    # pylint: disable=too-many-locals
+
+    try:
+        magic, version, big_endian = _HEADER.unpack_from(data)
+    except struct.error as err:
+        raise ValueError("Snapshot is truncated") from err
+    if magic != MAGIC:
+        raise ValueError("Data is not a snapshot of a FytaConnector")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}")
+
+    client = connector.client
+    reader = _Reader(
+        data, _HEADER.size, bool(big_endian) != (sys.byteorder == "big"), client.timezone
+    )
+
+    try:
+        reader.string_table()
+
+        email, access_token = reader.texts()
+        expiration = reader.datetimes()[0]
+        if email != client.email:
+            raise ValueError("Snapshot belongs to another account")
+
+        plant_ids = reader.ints()
+        nicknames = reader.texts()
+        received_data_at = reader.datetimes()
+        has_sensor = reader.flags()
+        gardens = reader.ints()
+        failed_plants = reader.ints()
+        plants = reader.plants()
+        measurements = reader.measurements()
+    except (struct.error, IndexError, KeyError, TypeError, UnicodeDecodeError) as err:
+        raise ValueError("Snapshot is corrupted") from err
+
+    client.access_token = access_token or ""
+    if expiration is not None:
+        client.expiration = expiration
+
+    connector.plant_list = dict(zip(plant_ids, nicknames))  # type: ignore [arg-type]
+    connector.plant_received_data_at = dict(zip(plant_ids, received_data_at))
+    connector.plant_has_sensor = {
+        plant_id: bool(flag)
+        for plant_id, flag in zip(plant_ids, has_sensor)
+        if flag != -1
+    }
+    connector.plant_garden = {
+        plant_id: None if garden == _NO_INT else garden
+        for plant_id, garden in zip(plant_ids, gardens)
+    }
+    connector.failed_plants = failed_plants
+    connector.plants = plants
+    connector.measurements = measurements
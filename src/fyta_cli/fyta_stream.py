@@ -0,0 +1,142 @@
+"""Incremental parsing of JSON responses of FYTA API."""
+
+import codecs
+import json
+import re
+from collections.abc import AsyncIterable, AsyncIterator
+from typing import Any
+
+_SPECIAL_CHARS = re.compile(r'[{}\[\]"\\]')
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+class JsonArrayScanner:
+    """Scanner for the items of an array in a JSON object, fed in chunks.
+
+    The items of the array stored under `key` of the top-level object are
+    parsed as soon as they are complete. Only the text of the current item
+    is kept, so that the memory does not depend on the size of the array.
+    Items have to be objects or arrays.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, key: str) -> None:
+        """Initialize scanner."""
+
+        self.key = key
+        self.done = False
+
+        self._buffer = ""
+        self._depth = 0
+        self._in_string = False
+        self._string_start = -1
+        self._escape_index = -2
+        self._last_key: str | None = None
+        self._in_array = False
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, text: str) -> list[Any]:
+        """Feed the next chunk of text and return the completed items."""
+
+        if self.done:
+            return []
+
+        start = len(self._buffer)
+        self._buffer += text
+
+        if not self._in_array:
+            self._find_array(start)
+
+        if not self._in_array:
+            return []
+
+        return self._decode_items()
+
+    def close(self) -> None:
+        """Check that the array was read completely at the end of the text."""
+
+        if not self.done:
+            raise ValueError(f"Array '{self.key}' not found or incomplete")
+
+    def _find_array(self, start: int) -> None:
+        """Scan the text for the beginning of the array."""
+
+        buffer = self._buffer
+
+        for match in _SPECIAL_CHARS.finditer(buffer, start):
+            index = match.start()
+            if index == self._escape_index + 1:
+                continue  # escaped character
+            char = buffer[index]
+
+            if char == "\\":
+                self._escape_index = index
+            elif char == '"':
+                if not self._in_string:
+                    self._in_string = True
+                    self._string_start = index
+                    continue
+                self._in_string = False
+                if self._depth == 1:
+                    self._last_key = buffer[self._string_start + 1 : index]
+            elif self._in_string:
+                continue
+            elif char in "{[":
+                self._depth += 1
+                if char == "[" and self._depth == 2 and self._last_key == self.key:
+                    self._in_array = True
+                    self._buffer = buffer[index + 1 :]
+                    return
+            else:
+                self._depth -= 1
+
+        # keep an unfinished string, as it may be the key of the array
+        keep = self._string_start if self._in_string else len(buffer)
+        self._buffer = buffer[keep:]
+        self._string_start -= keep
+        self._escape_index -= keep
+
+    def _decode_items(self) -> list[Any]:
+        """Decode the complete items at the beginning of the buffer."""
+
+        items: list[Any] = []
+        buffer = self._buffer
+        index = 0
+
+        while True:
+            index = _SEPARATORS.match(buffer, index).end()  # type: ignore [union-attr]
+            if index == len(buffer):
+                break
+            if buffer[index] == "]":
+                self.done = True
+                break
+            try:
+                item, index = self._decoder.raw_decode(buffer, index)
+            except json.JSONDecodeError:
+                break  # item is not complete yet
+            items.append(item)
+
+        self._buffer = buffer[index:]
+
+        return items
+
+
+async def iter_json_array(
+    chunks: AsyncIterable[bytes], key: str
+) -> AsyncIterator[Any]:
+    """Parse the items of the array under key from a stream of JSON chunks."""
+
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    scanner = JsonArrayScanner(key)
+
+    async for chunk in chunks:
+        for item in scanner.feed(decoder.decode(chunk)):
+            yield item
+        if scanner.done:
+            return
+
+    for item in scanner.feed(decoder.decode(b"", final=True)):
+        yield item
+
+    scanner.close()
@@ -0,0 +1,125 @@
+"""Fast conversion of the timestamps of the FYTA API."""
+
+from datetime import datetime, timedelta, tzinfo
+from functools import lru_cache
+from typing import Any
+
+_EPOCH = datetime(1970, 1, 1)
+_LAST_SECOND = timedelta(minutes=59, seconds=59)
+_MAX_CACHED = 4096
+_UNKNOWN: Any = object()
+_SEEN: Any = object()
+
+
+class TimestampCodec:
+    """Conversion of FYTA timestamps ("2023-01-01 10:10:00") into a time zone.
+
+    FYTA timestamps are naive and interpreted in the local time of the system,
+    as `datetime.astimezone` does. Converted timestamps are memoized, so
+    unchanged plants are converted once (more than 10 times faster than
+    `astimezone` on repeated updates). The UTC offset of the local time is
+    cached for hours with more than one timestamp. A timestamp in an hour
+    seen for the first time costs slightly more than `astimezone`, so the
+    codec does not pay off for one-off conversions.
+
+        codec = timestamp_codec(ZoneInfo("Europe/Berlin"))
+        codec.localize("2023-01-01 10:10:00")
+        codec.epoch("2023-01-01 10:10:00")  # epoch seconds
+    """
+
+    __slots__ = ("_local_offsets", "_localized", "tz")
+
+    def __init__(self, tz: tzinfo) -> None:
+        """Initialize codec for a time zone."""
+
+        self.tz = tz
+        self._localized: dict[str | datetime, datetime] = {}
+        self._local_offsets: dict[tuple[int, int, int, int], float | None] = {}
+
+    def localize(self, value: str | datetime) -> datetime:
+        """Convert a timestamp (string or naive datetime) into the time zone."""
+
+        if (result := self._localized.get(value)) is not None:
+            return result
+
+        naive = parse_datetime(value) if isinstance(value, str) else value
+        if naive.tzinfo is None and (epoch := self._local_epoch(naive)) is not None:
+            result = datetime.fromtimestamp(epoch, self.tz)
+        else:
+            result = naive.astimezone(self.tz)
+
+        if len(self._localized) >= _MAX_CACHED:
+            self._localized.clear()
+        self._localized[value] = result
+        return result
+
+    def epoch(self, value: str | datetime) -> float:
+        """Convert a timestamp (string or datetime) into epoch seconds."""
+
+        naive = parse_datetime(value) if isinstance(value, str) else value
+        if naive.tzinfo is None and (epoch := self._local_epoch(naive)) is not None:
+            return epoch
+        return naive.timestamp()
+
+    def _local_epoch(self, naive: datetime) -> float | None:
+        """Epoch seconds of a naive datetime in the local time of the system.
+
+        None, if the UTC offset changes within the hour (e.g. at the start
+        of daylight saving time) or the hour is seen for the first time, as
+        the offset is only worth determining for hours with more timestamps.
+        """
+
+        hour = (naive.year, naive.month, naive.day, naive.hour)
+        offset = self._local_offsets.get(hour, _UNKNOWN)
+        if offset is _UNKNOWN:
+            if len(self._local_offsets) >= _MAX_CACHED:
+                self._local_offsets.clear()
+            self._local_offsets[hour] = _SEEN
+            return None
+        if offset is _SEEN:
+            offset = self._local_offsets[hour] = _hour_offset(
+                naive.replace(minute=0, second=0, microsecond=0)
+            )
+
+        if offset is None:
+            return None
+        return (naive - _EPOCH).total_seconds() - offset
+
+
+def _hour_offset(start: datetime) -> float | None:
+    """UTC offset of the local time during an hour (None, if not constant)."""
+
+    offsets = set()
+    for naive in (start, start + _LAST_SECOND):
+        local = naive.astimezone()
+        if local.replace(tzinfo=None) != naive:  # not existing local time
+            return None
+        offsets.add(local.utcoffset())
+
+    if len(offsets) != 1:
+        return None
+    return offsets.pop().total_seconds()  # type: ignore [union-attr]
+
+
+@lru_cache(maxsize=16)
+def timestamp_codec(tz: tzinfo) -> TimestampCodec:
+    """Shared codec of a time zone."""
+    return TimestampCodec(tz)
+
+
+@lru_cache(maxsize=_MAX_CACHED)
+def parse_datetime(value: str) -> datetime:
+    """Parse a FYTA timestamp ("2023-01-01 10:10:00" or "2023-01-01").
+
+    Equal timestamps share one datetime.
+    """
+    return datetime.fromisoformat(value)
+
+
+def utc_timestamp(value: str) -> float:
+    """Convert a UTC timestamp of the FYTA API into epoch seconds."""
+
+    naive = datetime.fromisoformat(value)  # unique per sample, not memoized
+    if naive.tzinfo is not None:
+        naive = naive.replace(tzinfo=None)
+    return (naive - _EPOCH).total_seconds()
@@ -1,22 +1,58 @@
 """Tests for fyta_cli."""
 
+# pylint: disable=too-many-lines
+
+import asyncio
+from collections.abc import AsyncIterator, Awaitable
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, UTC
+import hashlib
+import json
+import math
+import os
+from pathlib import Path
+import time
+from typing import Any
+from zoneinfo import ZoneInfo
 
+from aiohttp import ClientPayloadError, ServerDisconnectedError
 from aioresponses import aioresponses
+from mashumaro.exceptions import InvalidFieldValue, MissingField
 
 import pytest
 from syrupy.assertion import SnapshotAssertion
+from yarl import URL
 
+from fyta_cli import fyta_client, fyta_fleet
+from fyta_cli.fyta_cache import CacheEntry, FileResponseCache, SQLiteResponseCache
 from fyta_cli.fyta_client import FYTA_AUTH_URL, FYTA_PLANT_URL
 from fyta_cli.fyta_connector import FytaConnector
+from fyta_cli.fyta_emulator import FytaEmulator
+from fyta_cli.fyta_events import PlantAdded, PlantChanged, PlantEvent, PlantRemoved
+from fyta_cli.fyta_fleet import NO_GARDEN, FleetView
 from fyta_cli.fyta_exceptions import (
     FytaAuthentificationError,
     FytaConnectionError,
     FytaError,
     FytaPasswordError,
     FytaPlantError,
+    FytaRateLimitError,
+)
+from fyta_cli.fyta_images import ImageCache
+from fyta_cli.fyta_metrics import Histogram, MetricsCollector
+from fyta_cli.fyta_models import (
+    Credentials,
+    LazyPlant,
+    Plant,
+    PlantMeasurements,
+    PlantMeasurementStatus,
+    SensorStatus,
 )
-from fyta_cli.fyta_models import Credentials, Plant
+from fyta_cli.fyta_pool import FytaConnectorPool
+from fyta_cli.fyta_ratelimit import RetryPolicy, TokenBucket
+from fyta_cli.fyta_scheduler import PlantScheduler
+from fyta_cli.fyta_stream import JsonArrayScanner
+from fyta_cli.fyta_time import TimestampCodec, utc_timestamp
 
 from . import load_fixture
 
@@ -352,3 +388,1771 @@ async def test_get_plant_image_errors(
 
     await fyta_connector.client.close()
     assert fyta_connector.client.session.closed
+
+
+async def test_get_plant_image_retry(
+    responses: aioresponses,
+) -> None:
+    """Test that image downloads are retried, if the server fails."""
+    responses.post(
+        FYTA_AUTH_URL,
+        status=200,
+        body=load_fixture("login_response.json"),
+    )
+    responses.get(
+        "https://api.prod.fyta-app.de/user-plant/1/origin_path",
+        status=503,
+    )
+    responses.get(
+        "https://api.prod.fyta-app.de/user-plant/1/origin_path",
+        headers={"Content-Type": "image/png"},
+        status=200,
+        body=bytes([100]),
+    )
+
+    fyta_connector = FytaConnector("example@example.com", "examplepassword")
+    fyta_connector.client.retry_policy = RetryPolicy(base_delay=0.001)
+
+    response = await fyta_connector.get_plant_image(
+        "https://api.prod.fyta-app.de/user-plant/1/origin_path"
+    )
+    assert response == ("image/png", bytes([100]))
+
+    await fyta_connector.client.close()
+
+
+async def test_get_plant_image_unauthorized(
+    responses: aioresponses,
+) -> None:
+    """Test that a rejection by the image server keeps the access token."""
+    responses.post(
+        FYTA_AUTH_URL,
+        status=200,
+        body=load_fixture("login_response.json"),
+    )
+    responses.get(
+        "https://api.prod.fyta-app.de/user-plant/1/origin_path",
+        status=401,
+    )
+
+    fyta_connector = FytaConnector("example@example.com", "examplepassword")
+
+    response = await fyta_connector.get_plant_image(
+        "https://api.prod.fyta-app.de/user-plant/1/origin_path"
+    )
+    assert response is None
+    assert (
+        fyta_connector.client.access_token == "111111111111111111111111111111111111111"
+    )
+    assert len(responses.requests[("POST", URL(FYTA_AUTH_URL))]) == 1
+
+    await fyta_connector.client.close()
+
+
+async def test_get_plant_image_disconnect(
+    responses: aioresponses,
+) -> None:
+    """Test that failed connections of image downloads are reported as finished."""
+    responses.post(
+        FYTA_AUTH_URL,
+        status=200,
+        body=load_fixture("login_response.json"),
+    )
+    responses.get(
+        "https://api.prod.fyta-app.de/user-plant/1/origin_path",
+        status=500,
+    )
+    responses.get(
+        "https://api.prod.fyta-app.de/user-plant/1/origin_path",
+        exception=ServerDisconnectedError(),
+    )
+
+    collector = MetricsCollector()
+    fyta_connector = FytaConnector(
+        "example@example.com", "examplepassword", instrumentation=collector
+    )
+    fyta_connector.client.retry_policy = None
+
+    for _ in range(2):
+        response = await fyta_connector.get_plant_image(
+            "https://api.prod.fyta-app.de/user-plant/1/origin_path"
+        )
+        assert response is None
+
+    assert collector.in_flight == 0
+    assert collector.requests[("image", "GET", "500")].count == 1
+    assert collector.requests[("image", "GET", "error")].count == 1
+
+    await fyta_connector.client.close()
+
+
+async def test_update_all_plants_concurrent(
+    responses: aioresponses,
+) -> None:
+    """Test concurrent update of all plants with a failing plant."""
+    responses.get(
+        FYTA_PLANT_URL,
+        status=200,
+        body=load_fixture("get_user_plants.json"),
+    )
+    responses.get(
+        FYTA_PLANT_URL + f"/{0}",
+        status=200,
+        body=load_fixture("get_plant_details_0.json"),
+    )
+    responses.get(
+        FYTA_PLANT_URL + f"/{1}",
+        headers={"Content-Type": "text/html"},
+    )
+    responses.get(
+        FYTA_PLANT_URL + f"/{2}",
+        timeout=True,
+    )
+
+    fyta_connector = FytaConnector(
+        "example@example.com",
+        "examplepassword",
+        "111111111111111111111111111111111111111",
+        datetime.now() + timedelta(days=1)
+    )
+    plants: dict[int, Plant] = await fyta_connector.update_all_plants(
+        max_concurrency=3
+    )
+
+    assert list(plants) == [0]
+    assert plants[0].name == "Gummibaum"
+    # plant 2 has no sensor according to the plant list and is not requested
+    assert fyta_connector.failed_plants == [1]
+
+    with pytest.raises(ValueError):
+        await fyta_connector.update_all_plants(max_concurrency=0)
+
+    await fyta_connector.client.close()
+    assert fyta_connector.client.session.closed
+
+
+async def test_update_all_plants_disconnect(
+    responses: aioresponses,
+) -> None:
+    """Test that a disconnect of one plant keeps the other plants."""
+    responses.get(
+        FYTA_PLANT_URL,
+        status=200,
+        body=load_fixture("get_user_plants.json"),
+    )
+    responses.get(
+        FYTA_PLANT_URL + f"/{0}",
+        status=200,
+        body=load_fixture("get_plant_details_0.json"),
+    )
+    responses.get(
+        FYTA_PLANT_URL + f"/{1}",
+        exception=ServerDisconnectedError(),
+    )
+
+    fyta_connector = FytaConnector(
+        "example@example.com",
+        "examplepassword",
+        "111111111111111111111111111111111111111",
+        datetime.now() + timedelta(days=1)
+    )
+    fyta_connector.client.retry_policy = None
+    plants = await fyta_connector.update_all_plants(max_concurrency=2)
+
+    assert list(plants) == [0]
+    assert fyta_connector.failed_plants == [1]
+
+    await fyta_connector.client.close()
+
+
+async def test_update_all_plants_incremental(
+    responses: aioresponses,
+) -> None:
+    """Test incremental update of plants with new sensor data only."""
+    plant_list = json.loads(load_fixture("get_user_plants.json"))
+    responses.get(
+        FYTA_PLANT_URL,
+        status=200,
+        body=json.dumps(plant_list),
+    )
+    for plant_id in (0, 1, 2):
+        responses.get(
+            FYTA_PLANT_URL + f"/{plant_id}",
+            status=200,
+            body=load_fixture(f"get_plant_details_{plant_id}.json"),
+        )
+
+    fyta_connector = FytaConnector(
+        "example@example.com",
+        "examplepassword",
+        "111111111111111111111111111111111111111",
+        datetime.now() + timedelta(days=1)
+    )
+    plants: dict[int, Plant] = await fyta_connector.update_all_plants()
+
+    plant_list["plants"][0]["sensor"]["received_data_at"] = "2023-01-01 11:10:00"
+    plant_list["plants"][1]["nickname"] = "Cacao"
+    responses.get(
+        FYTA_PLANT_URL,
+        status=200,
+        body=json.dumps(plant_list),
+    )
+    responses.get(
+        FYTA_PLANT_URL + f"/{0}",
+        status=200,
+        body=load_fixture("get_plant_details_0.json"),
+    )
+
+    updated_plants = await fyta_connector.update_all_plants(incremental=True)
+
+    assert list(updated_plants) == [0, 1]
+    assert updated_plants[0] is not plants[0]
+    assert updated_plants[1].name == "Cacao"
+    assert updated_plants[1].moisture == plants[1].moisture
+    assert not fyta_connector.failed_plants
+
+    await fyta_connector.client.close()
+    assert fyta_connector.client.session.closed
+
+
+async def test_login_single_flight(
+    responses: aioresponses,
+) -> None:
+    """Test concurrent logins share one request to FYTA."""
+    responses.post(
+        FYTA_AUTH_URL,
+        status=200,
+        body=load_fixture("login_response.json"),
+    )
+
+    fyta_connector = FytaConnector(
+        "example@example.com",
+        "examplepassword",
+        "000000000000000000000000000000000000000",
+        datetime.now() + timedelta(seconds=30),
+    )
+
+    credentials = await asyncio.gather(
+        *(fyta_connector.login() for _ in range(3))
+    )
+
+    assert [c.access_token for c in credentials] == [
+        "111111111111111111111111111111111111111"
+    ] * 3
+    assert fyta_connector.client.token_valid
+
+    await fyta_connector.client.close()
+    assert fyta_connector.client.session.closed
+
+
+async def test_get_plant_measurements(
+    responses: aioresponses,
+) -> None:
+    """Test getting the measurement history of a plant."""
+    responses.post(
+        FYTA_PLANT_URL + f"/measurements/{0}",
+        status=200,
+        body=load_fixture("get_measurements.json"),
+    )
+
+    fyta_connector = FytaConnector(
+        "example@example.com",
+        "examplepassword",
+        "111111111111111111111111111111111111111",
+        datetime.now() + timedelta(days=1)
+    )
+    measurements = await fyta_connector.update_plant_measurements(0)
+
+    assert fyta_connector.measurements[0] is measurements
+    assert len(measurements) == 1
+    assert measurements.datetime_at(0) == datetime(2023, 1, 1, 1, tzinfo=UTC)
+    assert list(measurements.light) == [1.0]
+    assert list(measurements.temperature) == [18.0]
+    assert list(measurements.soil_moisture) == [61.0]
+    assert list(measurements.soil_fertility) == [0.5]
+    assert list(measurements.dli_light) == [0.04]
+    assert measurements.absolute_values["soil_moisture"] == (0.0, 85.0)
+    assert measurements.thresholds["moisture_min_good"] == 35.0
+
+    await fyta_connector.client.close()
+    assert fyta_connector.client.session.closed
+
+
+@pytest.mark.parametrize("cache_type", [FileResponseCache, SQLiteResponseCache])
+async def test_get_plant_data_cache(
+    responses: aioresponses,
+    tmp_path: Path,
+    cache_type: type[FileResponseCache] | type[SQLiteResponseCache],
+) -> None:
+    """Test caching and revalidation of plant data."""
+    responses.get(
+        FYTA_PLANT_URL + f"/{0}",
+        status=200,
+        headers={"ETag": '"abc"'},
+        body=load_fixture("get_plant_details_0.json"),
+    )
+    responses.get(
+        FYTA_PLANT_URL + f"/{0}",
+        status=304,
+    )
+
+    cache = cache_type(tmp_path / "cache")
+    fyta_connector = FytaConnector(
+        "example@example.com",
+        "examplepassword",
+        "111111111111111111111111111111111111111",
+        datetime.now() + timedelta(days=1),
+        cache=cache,
+    )
+
+    plant = await fyta_connector.update_plant_data(0)
+    cached_plant = await fyta_connector.update_plant_data(0)
+    assert cached_plant == plant
+
+    fyta_connector.client.cache_ttl["plant"] = 0
+    reads: list[str] = []
+    cache_get = cache.get
+
+    def recording_get(key: str) -> CacheEntry | None:
+        reads.append(key)
+        return cache_get(key)
+
+    cache.get = recording_get  # type: ignore [method-assign]
+    revalidated_plant = await fyta_connector.update_plant_data(0)
+    assert revalidated_plant == plant
+    assert reads == ["plant/0"]
+
+    requests = responses.requests[("GET", URL(FYTA_PLANT_URL + f"/{0}"))]
+    assert len(requests) == 2
+    assert requests[1].kwargs["headers"]["If-None-Match"] == '"abc"'
+
+    # "not modified" is an error, if there is no cached response
+    responses.get(
+        FYTA_PLANT_URL + f"/{1}",
+        status=304,
+    )
+    with pytest.raises(FytaPlantError):
+        await fyta_connector.update_plant_data(1)
+    assert reads[-1] == "plant/1"
+    assert cache_get("plant/1") is None
+
+    cache.close()
+    await fyta_connector.client.close()
+    assert fyta_connector.client.session.closed
+
+
+def test_sqlite_cache_batched_commits(tmp_path: Path) -> None:
+    """Test that the SQLite cache commits its changes in batches."""
+    path = tmp_path / "cache.sqlite"
+    cache = SQLiteResponseCache(path, commit_every=2, commit_interval=3600)
+    reader = SQLiteResponseCache(path)
+
+    cache.set("plant/0", CacheEntry({"id": 0}, 1.0))
+    assert cache.get("plant/0") == CacheEntry({"id": 0}, 1.0)
+    assert reader.get("plant/0") is None
+
+    cache.set("plant/1", CacheEntry({"id": 1}, 1.0))
+    assert reader.get("plant/0") == CacheEntry({"id": 0}, 1.0)
+
+    cache.delete("plant/0")
+    cache.flush()
+    assert reader.get("plant/0") is None
+
+    cache.close()
+    reader.close()
+
+
+def test_plant_from_dict_keeps_input() -> None:
+    """Test that the plant data is not modified by the deserialization."""
+    plant_data = json.loads(load_fixture("get_plant_details_0.json"))["plant"]
+    original_data = json.loads(load_fixture("get_plant_details_0.json"))["plant"]
+
+    plant = Plant.from_dict(plant_data)
+
+    assert plant_data == original_data
+    assert plant.light_min_good == 20.0
+    assert plant.nutrients_status == 3
+    assert plant.sensor_id == "AA:AA:AA:2B:AF:F4"
+
+
+def test_plant_compact() -> None:
+    """Test that plants are slotted and share equal thresholds."""
+    plant_0 = Plant.from_dict(
+        json.loads(load_fixture("get_plant_details_0.json"))["plant"]
+    )
+    plant_1 = Plant.from_dict(
+        json.loads(load_fixture("get_plant_details_1.json"))["plant"]
+    )
+
+    assert not hasattr(plant_0, "__dict__")
+    assert plant_0.light_max_good == plant_1.light_max_good
+    assert plant_0.light_max_good is plant_1.light_max_good
+    assert plant_0.salinity_min_good is plant_1.salinity_min_good
+
+
+async def test_connector_pool(
+    responses: aioresponses,
+) -> None:
+    """Test updating several accounts sharing one session."""
+    responses.get(
+        FYTA_PLANT_URL,
+        status=200,
+        body=load_fixture("get_user_plants.json"),
+    )
+    responses.get(
+        FYTA_PLANT_URL,
+        headers={"Content-Type": "text/html"},
+    )
+    for plant_id in (0, 1, 2):
+        responses.get(
+            FYTA_PLANT_URL + f"/{plant_id}",
+            status=200,
+            body=load_fixture(f"get_plant_details_{plant_id}.json"),
+        )
+
+    async with FytaConnectorPool(max_concurrency=2) as pool:
+        connector_1 = pool.add_account(
+            "example1@example.com",
+            "examplepassword",
+            "111111111111111111111111111111111111111",
+            datetime.now() + timedelta(days=1),
+        )
+        connector_2 = pool.add_account(
+            "example2@example.com",
+            "examplepassword",
+            "111111111111111111111111111111111111111",
+            datetime.now() + timedelta(days=1),
+        )
+        assert connector_1.client.session is connector_2.client.session
+
+        plants = await pool.update_all_plants()
+
+        assert list(plants) == ["example1@example.com"]
+        assert list(plants["example1@example.com"]) == [0, 1]
+        assert isinstance(pool.failed_accounts["example2@example.com"], FytaPlantError)
+
+        await connector_1.client.close()
+        assert not pool.session.closed
+
+    assert pool.session.closed
+
+
+async def test_get_plant_data_retry(
+    responses: aioresponses,
+) -> None:
+    """Test retries of requests rejected by the server."""
+    responses.get(
+        FYTA_PLANT_URL + f"/{0}",
+        status=429,
+        headers={"Retry-After": "0"},
+    )
+    responses.get(
+        FYTA_PLANT_URL + f"/{0}",
+        status=503,
+    )
+    responses.get(
+        FYTA_PLANT_URL + f"/{0}",
+        status=200,
+        body=load_fixture("get_plant_details_0.json"),
+    )
+    responses.get(
+        FYTA_PLANT_URL + f"/{1}",
+        status=429,
+        repeat=True,
+    )
+
+    fyta_connector = FytaConnector(
+        "example@example.com",
+        "examplepassword",
+        "111111111111111111111111111111111111111",
+        datetime.now() + timedelta(days=1)
+    )
+    fyta_connector.client.retry_policy = RetryPolicy(max_retries=2, base_delay=0.01)
+    fyta_connector.client.rate_limiters.append(TokenBucket(1000))
+
+    plant = await fyta_connector.update_plant_data(0)
+    assert plant is not None
+
+    with pytest.raises(FytaRateLimitError):
+        await fyta_connector.update_plant_data(1)
+
+    assert len(responses.requests[("GET", URL(FYTA_PLANT_URL + f"/{1}"))]) == 3
+
+    await fyta_connector.client.close()
+    assert fyta_connector.client.session.closed
+
+
+async def test_get_plant_data_retry_disconnect(
+    responses: aioresponses,
+) -> None:
+    """Test retries of requests, whose connection failed."""
+    responses.get(
+        FYTA_PLANT_URL + f"/{0}",
+        exception=ServerDisconnectedError(),
+    )
+    responses.get(
+        FYTA_PLANT_URL + f"/{0}",
+        status=200,
+        body=load_fixture("get_plant_details_0.json"),
+    )
+    responses.get(
+        FYTA_PLANT_URL + f"/{1}",
+        exception=ServerDisconnectedError(),
+        repeat=True,
+    )
+
+    collector = MetricsCollector()
+    fyta_connector = FytaConnector(
+        "example@example.com",
+        "examplepassword",
+        "111111111111111111111111111111111111111",
+        datetime.now() + timedelta(days=1),
+        instrumentation=collector,
+    )
+    fyta_connector.client.retry_policy = RetryPolicy(max_retries=2, base_delay=0.01)
+
+    plant = await fyta_connector.update_plant_data(0)
+    assert plant is not None
+    assert len(responses.requests[("GET", URL(FYTA_PLANT_URL + f"/{0}"))]) == 2
+
+    with pytest.raises(FytaConnectionError):
+        await fyta_connector.update_plant_data(1)
+
+    assert len(responses.requests[("GET", URL(FYTA_PLANT_URL + f"/{1}"))]) == 3
+    assert collector.retries == {("plant", "error"): 3}
+
+    await fyta_connector.client.close()
+
+
+async def test_token_bucket() -> None:
+    """Test rate of token bucket."""
+    token_bucket = TokenBucket(rate=100, capacity=1)
+
+    start = time.monotonic()
+    for _ in range(4):
+        await token_bucket.acquire()
+
+    assert time.monotonic() - start >= 0.025
+
+    retry_policy = RetryPolicy(base_delay=1, max_delay=5)
+    assert retry_policy.delay(0, "3") == 3
+    assert retry_policy.delay(0, "120") == 5
+    assert 0 <= retry_policy.delay(10) <= 5
+
+
+async def test_get_plant_list_stream(
+    responses: aioresponses,
+) -> None:
+    """Test streaming the list of plants."""
+    responses.get(
+        FYTA_PLANT_URL,
+        status=200,
+        body=load_fixture("get_user_plants.json"),
+    )
+
+    fyta_connector = FytaConnector(
+        "example@example.com",
+        "examplepassword",
+        "111111111111111111111111111111111111111",
+        datetime.now() + timedelta(days=1),
+    )
+    fyta_connector.client.stream_plant_list = True
+
+    plant_list = await fyta_connector.update_plant_list()
+
+    assert plant_list == {0: "Gummibaum", 1: "Kakaobaum", 2: "Traumpflanze"}
+    assert fyta_connector.plant_received_data_at[2] is None
+
+    await fyta_connector.client.close()
+    assert fyta_connector.client.session.closed
+
+async def test_get_plant_list_stream_errors(
+    responses: aioresponses, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that errors while streaming the list of plants are wrapped."""
+    responses.get(
+        FYTA_PLANT_URL,
+        status=200,
+        body='{"plants": [{"id": 0}, {"id": 1,',
+    )
+
+    fyta_connector = FytaConnector(
+        "example@example.com",
+        "examplepassword",
+        "111111111111111111111111111111111111111",
+        datetime.now() + timedelta(days=1),
+    )
+    fyta_connector.client.stream_plant_list = True
+
+    with pytest.raises(FytaPlantError):
+        async for _ in fyta_connector.client.iter_plant_list():
+            pass
+
+    async def disconnect(*_: Any) -> AsyncIterator[dict[str, Any]]:
+        yield {"id": 0}
+        raise ClientPayloadError("Response payload is not completed")
+
+    monkeypatch.setattr(fyta_client, "iter_json_array", disconnect)
+    responses.get(
+        FYTA_PLANT_URL,
+        status=200,
+        body=load_fixture("get_user_plants.json"),
+    )
+
+    with pytest.raises(FytaConnectionError):
+        async for _ in fyta_connector.client.iter_plant_list():
+            pass
+
+    await fyta_connector.client.close()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+def test_json_array_scanner(chunk_size: int) -> None:
+    """Test incremental parsing of an array split into chunks."""
+    data = json.loads(load_fixture("get_user_plants.json"))
+    data["gardens"][0]["garden_name"] = 'Garden "plants": [{'
+    data["plants"][0]["nickname"] = 'Gummi\\baum [1] {"2"}'
+    text = json.dumps({"info": {"plants": []}} | data)
+
+    scanner = JsonArrayScanner("plants")
+    items = []
+    for index in range(0, len(text), chunk_size):
+        items += scanner.feed(text[index : index + chunk_size])
+    scanner.close()
+
+    assert items == data["plants"]
+
+    with pytest.raises(ValueError):
+        JsonArrayScanner("plants").close()
+
+
+async def test_get_plant_images(
+    responses: aioresponses,
+    tmp_path: Path,
+) -> None:
+    """Test fetching and caching the images of several plants."""
+    responses.post(
+        FYTA_AUTH_URL,
+        status=200,
+        body=load_fixture("login_response.json"),
+    )
+    for path in ("user/0", "user/1", "species/201"):
+        responses.get(
+            f"https://api.prod.fyta-app.de/{path}",
+            headers={"Content-Type": "image/png"},
+            status=200,
+            body=path.encode(),
+        )
+
+    fyta_connector = FytaConnector(
+        "example@example.com",
+        "examplepassword",
+        image_cache=ImageCache(directory=tmp_path),
+    )
+    for plant_id in (0, 1):
+        plant = Plant.from_dict(
+            json.loads(load_fixture(f"get_plant_details_{plant_id}.json"))["plant"]
+        )
+        plant.user_thumb_path = f"https://api.prod.fyta-app.de/user/{plant_id}"
+        plant.plant_thumb_path = "https://api.prod.fyta-app.de/species/201"
+        fyta_connector.plants[plant_id] = plant
+
+    images = await fyta_connector.get_plant_images()
+    assert images == {
+        "https://api.prod.fyta-app.de/user/0": ("image/png", b"user/0"),
+        "https://api.prod.fyta-app.de/species/201": ("image/png", b"species/201"),
+        "https://api.prod.fyta-app.de/user/1": ("image/png", b"user/1"),
+    }
+
+    # images are taken from the cache
+    assert await fyta_connector.get_plant_images() == images
+
+    # images are read from disk
+    image_cache = ImageCache(max_size=10, directory=tmp_path)
+    assert image_cache.get("https://api.prod.fyta-app.de/user/0") is not None
+    assert image_cache.get("https://api.prod.fyta-app.de/user/1") is not None
+    assert image_cache.size == 6
+    assert image_cache.get("https://api.prod.fyta-app.de/unknown") is None
+
+    await fyta_connector.client.close()
+    assert fyta_connector.client.session.closed
+
+
+async def test_get_plant_images_errors(
+    responses: aioresponses,
+) -> None:
+    """Test that images, which fail to download, do not abort the batch."""
+    responses.post(
+        FYTA_AUTH_URL,
+        status=200,
+        body=load_fixture("login_response.json"),
+        repeat=True,
+    )
+    responses.get(
+        "https://api.prod.fyta-app.de/user/0",
+        headers={"Content-Type": "image/png"},
+        status=200,
+        body=b"user/0",
+    )
+    responses.get("https://api.prod.fyta-app.de/user/1", status=401, repeat=True)
+    responses.get(
+        "https://api.prod.fyta-app.de/species/201",
+        exception=ServerDisconnectedError(),
+    )
+
+    fyta_connector = FytaConnector("example@example.com", "examplepassword")
+    fyta_connector.client.retry_policy = None
+    for plant_id in (0, 1):
+        plant = Plant.from_dict(
+            json.loads(load_fixture(f"get_plant_details_{plant_id}.json"))["plant"]
+        )
+        plant.user_thumb_path = f"https://api.prod.fyta-app.de/user/{plant_id}"
+        plant.plant_thumb_path = "https://api.prod.fyta-app.de/species/201"
+        fyta_connector.plants[plant_id] = plant
+
+    images = await fyta_connector.get_plant_images()
+    assert images == {
+        "https://api.prod.fyta-app.de/user/0": ("image/png", b"user/0"),
+        "https://api.prod.fyta-app.de/species/201": None,
+        "https://api.prod.fyta-app.de/user/1": None,
+    }
+
+    await fyta_connector.client.close()
+
+
+def test_image_cache_lru() -> None:
+    """Test removal of least recently used images."""
+    image_cache = ImageCache(max_size=10)
+
+    image_cache.set("a", "image/png", b"1234")
+    image_cache.set("b", "image/png", b"1234")
+    image_cache.get("a")
+    image_cache.set("c", "image/png", b"1234")
+
+    assert "a" in image_cache
+    assert "b" not in image_cache
+    assert "c" in image_cache
+    assert image_cache.size == 8
+
+
+def test_image_cache_disk_lru(tmp_path: Path) -> None:
+    """Test removal of least recently used images from disk."""
+    image_cache = ImageCache(
+        max_size=0, directory=tmp_path, max_disk_size=10, max_disk_entries=3
+    )
+
+    image_cache.set("a", "image/png", b"1234")
+    image_cache.set("b", "image/png", b"1234")  # same image as "a"
+    image_cache.set("c", "image/png", b"5678")
+    assert image_cache.disk_size == 8
+    assert image_cache.get("a") is not None
+
+    image_cache.set("d", "image/png", b"9012")
+    assert image_cache.disk_size == 8
+    assert "b" not in image_cache
+    assert "c" not in image_cache
+    assert len(list((tmp_path / "urls").iterdir())) == 2
+    assert len(list((tmp_path / "images").iterdir())) == 2
+
+    image_cache.set("e", "image/png", b"3456")
+    image_cache.set("f", "image/png", b"3456")
+    assert "a" not in image_cache
+    assert image_cache.disk_size == 8
+
+    # the limits are applied to an existing directory, oldest URLs first
+    for age, url in enumerate(("f", "e", "d")):
+        url_path = tmp_path / "urls" / hashlib.sha256(url.encode()).hexdigest()
+        os.utime(url_path, (1000 - age, 1000 - age))
+    image_cache = ImageCache(directory=tmp_path, max_disk_entries=2)
+    assert image_cache.get("d") is None
+    assert image_cache.get("e") is not None
+    assert image_cache.disk_size == 4
+    assert len(list((tmp_path / "images").iterdir())) == 1
+
+
+async def test_scheduler_next_poll() -> None:
+    """Test scheduling of plants by the interval of their sensor data."""
+    plant = Plant.from_dict(
+        json.loads(load_fixture("get_plant_details_0.json"))["plant"]
+    )
+    assert plant.last_updated is not None
+    start = plant.last_updated.replace(tzinfo=UTC)
+
+    fyta_connector = FytaConnector("example@example.com", "examplepassword")
+    scheduler = PlantScheduler(fyta_connector)
+
+    plant.last_updated = start
+    now = start.timestamp() + 10
+    assert scheduler.record(0, plant, now) == start.timestamp() + 3600 + 60
+
+    # sensor sends data every 30 minutes
+    plant.last_updated = start + timedelta(minutes=30)
+    now = plant.last_updated.timestamp() + 10
+    assert scheduler.record(0, plant, now) == plant.last_updated.timestamp() + 1860
+    assert scheduler.expected_interval(0) == 1800
+
+    # no new data: back off
+    now += 1900
+    assert scheduler.record(0, plant, now) == now + 120
+    assert scheduler.record(0, plant, now) == now + 240
+
+    # offline sensor
+    plant.sensor_status = SensorStatus.ERROR
+    assert scheduler.record(0, plant, now) == now + 3600
+    assert scheduler.record(1, None, now) == now + 3600
+
+    await fyta_connector.client.close()
+
+
+async def test_scheduler_poll(
+    responses: aioresponses,
+) -> None:
+    """Test polling of due plants."""
+    responses.get(
+        FYTA_PLANT_URL,
+        status=200,
+        body=load_fixture("get_user_plants.json"),
+    )
+    for plant_id in (0, 1, 2):
+        responses.get(
+            FYTA_PLANT_URL + f"/{plant_id}",
+            status=200,
+            body=load_fixture(f"get_plant_details_{plant_id}.json"),
+        )
+
+    fyta_connector = FytaConnector(
+        "example@example.com",
+        "examplepassword",
+        "111111111111111111111111111111111111111",
+        datetime.now() + timedelta(days=1)
+    )
+    updated_plants: list[int] = []
+    scheduler = PlantScheduler(
+        fyta_connector, lambda plant_id, _: updated_plants.append(plant_id)
+    )
+
+    now = time.time()
+    assert sorted(await scheduler.poll(now)) == [0, 1, 2]
+    assert sorted(updated_plants) == [0, 1]
+    assert sorted(fyta_connector.plants) == [0, 1]
+    assert all(next_poll > now for next_poll in scheduler.next_poll.values())
+
+    assert not await scheduler.poll(now + 1)
+
+    await fyta_connector.client.close()
+    assert fyta_connector.client.session.closed
+
+
+async def test_scheduler_authentication_error(
+    responses: aioresponses,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    """Test that polling stops, if the authentication fails."""
+    responses.post(
+        FYTA_AUTH_URL,
+        status=200,
+        body='{"statusCode": 401,"error": "Unauthorized","errors": [{"message": "Could not authenticate user"}]}',  # pylint: disable=line-too-long
+        repeat=True,
+    )
+
+    fyta_connector = FytaConnector("example@example.com", "examplepassword")
+    scheduler = PlantScheduler(fyta_connector, min_interval=timedelta(0))
+
+    with pytest.raises(FytaPasswordError):
+        await asyncio.wait_for(scheduler.run(), 1)
+    assert "authentication failed" in caplog.text
+    assert len(responses.requests[("POST", URL(FYTA_AUTH_URL))]) == 1
+
+    # the error of polling in the background is raised by stop
+    scheduler.start()
+    await asyncio.sleep(0.1)
+    with pytest.raises(FytaPasswordError):
+        await scheduler.stop()
+    await scheduler.stop()
+
+    await fyta_connector.client.close()
+
+
+async def test_plant_events(
+    responses: aioresponses,
+) -> None:
+    """Test change events after updates of all plants."""
+    plant_list = json.loads(load_fixture("get_user_plants.json"))
+    responses.get(
+        FYTA_PLANT_URL,
+        status=200,
+        body=json.dumps(plant_list),
+    )
+    for plant_id in (0, 1, 2):
+        responses.get(
+            FYTA_PLANT_URL + f"/{plant_id}",
+            status=200,
+            body=load_fixture(f"get_plant_details_{plant_id}.json"),
+        )
+
+    fyta_connector = FytaConnector(
+        "example@example.com",
+        "examplepassword",
+        "111111111111111111111111111111111111111",
+        datetime.now() + timedelta(days=1)
+    )
+    events: list[PlantEvent] = []
+    unsubscribe = fyta_connector.plant_events.subscribe(events.append)
+    iterator = fyta_connector.plant_events.events(maxsize=1)
+
+    await fyta_connector.update_all_plants()
+
+    assert [type(event) for event in events] == [PlantAdded, PlantAdded]
+    # the oldest event is dropped from the full buffer
+    assert await anext(iterator) == events[1]
+    assert iterator.dropped == 1
+
+    plant_details = json.loads(load_fixture("get_plant_details_0.json"))
+    plant_details["plant"]["sensor"]["is_battery_low"] = True
+    plant_details["plant"]["measurements"]["moisture"]["status"] = 2
+    plant_list["plants"] = plant_list["plants"][:1]
+    responses.get(
+        FYTA_PLANT_URL,
+        status=200,
+        body=json.dumps(plant_list),
+    )
+    responses.get(
+        FYTA_PLANT_URL + f"/{0}",
+        status=200,
+        body=json.dumps(plant_details),
+    )
+
+    events.clear()
+    await fyta_connector.update_all_plants()
+
+    assert {
+        (event.field, event.old_value, event.new_value)
+        for event in events
+        if isinstance(event, PlantChanged)
+    } == {
+        ("low_battery", False, True),
+        ("moisture_status", PlantMeasurementStatus.PERFECT, PlantMeasurementStatus.LOW),
+    }
+    assert [
+        event.plant_id for event in events if isinstance(event, PlantRemoved)
+    ] == [1]
+
+    unsubscribe()
+    await iterator.aclose()
+    assert not fyta_connector.plant_events.has_subscribers
+    # buffered events are returned after closing
+    assert [type(event) async for event in iterator] == [PlantRemoved]
+
+    # a waiting consumer is stopped by closing
+    async with fyta_connector.plant_events.events() as iterator:
+        next_event = asyncio.ensure_future(anext(iterator))
+        await asyncio.sleep(0)
+    with pytest.raises(StopAsyncIteration):
+        await next_event
+    assert not fyta_connector.plant_events.has_subscribers
+
+    await fyta_connector.client.close()
+    assert fyta_connector.client.session.closed
+
+
+async def test_plant_events_late_subscriber(
+    responses: aioresponses,
+) -> None:
+    """Test that subscribers only get the changes since the last update."""
+    plant_list = json.loads(load_fixture("get_user_plants.json"))
+    plant_list["plants"] = plant_list["plants"][:1]
+    responses.get(
+        FYTA_PLANT_URL,
+        status=200,
+        body=json.dumps(plant_list),
+        repeat=True,
+    )
+    responses.get(
+        FYTA_PLANT_URL + f"/{0}",
+        status=200,
+        body=load_fixture("get_plant_details_0.json"),
+    )
+    plant_details = json.loads(load_fixture("get_plant_details_0.json"))
+    plant_details["plant"]["sensor"]["is_battery_low"] = True
+    responses.get(
+        FYTA_PLANT_URL + f"/{0}",
+        status=200,
+        body=json.dumps(plant_details),
+        repeat=True,
+    )
+
+    fyta_connector = FytaConnector(
+        "example@example.com",
+        "examplepassword",
+        "111111111111111111111111111111111111111",
+        datetime.now() + timedelta(days=1)
+    )
+
+    events: list[PlantEvent] = []
+    unsubscribe = fyta_connector.plant_events.subscribe(events.append)
+    await fyta_connector.update_all_plants()
+    assert [type(event) for event in events] == [PlantAdded]
+    unsubscribe()
+
+    # low battery is changed without subscribers
+    await fyta_connector.update_all_plants()
+
+    events.clear()
+    fyta_connector.plant_events.subscribe(events.append)
+    await fyta_connector.update_all_plants()
+    assert not events
+
+    await fyta_connector.client.close()
+
+
+async def test_emulator() -> None:
+    """Test the connector against the FYTA emulator."""
+
+    async with FytaEmulator(
+        20, rate_limit=1000, burst=5, sensorless_ratio=0.2, seed=1
+    ) as emulator:
+        fyta_connector = emulator.connector()
+        fyta_connector.client.retry_policy = RetryPolicy(base_delay=0.001)
+
+        await fyta_connector.update_all_plants(max_concurrency=8)
+
+        assert not fyta_connector.failed_plants
+        assert len(fyta_connector.plant_list) == 20
+        assert emulator.throttled > 0
+
+        with_sensor = [
+            plant_id
+            for plant_id, plant in emulator.plants.items()
+            if plant["sensor"] is not None
+        ]
+        assert set(fyta_connector.plants) == set(with_sensor)
+        assert all(plant.online for plant in fyta_connector.plants.values())
+
+        plant_id = with_sensor[0]
+        measurements = await fyta_connector.update_plant_measurements(plant_id, "day")
+        assert len(measurements) == 96
+
+        image = await fyta_connector.get_plant_image(
+            fyta_connector.plants[plant_id].user_thumb_path
+        )
+        assert image is not None
+        assert image[0] == "image/jpeg"
+
+        await fyta_connector.client.close()
+
+        fyta_connector = emulator.connector()
+        fyta_connector.client.password = "wrong"
+        with pytest.raises(FytaPasswordError):
+            await fyta_connector.login()
+        await fyta_connector.client.close()
+
+
+async def test_emulator_expired_tokens() -> None:
+    """Test renewal of access tokens rejected by the FYTA emulator."""
+
+    async with FytaEmulator(3, sensorless_ratio=0, seed=1) as emulator:
+        fyta_connector = emulator.connector()
+
+        await fyta_connector.update_all_plants()
+        assert emulator.requests["/api/auth/login"] == 1
+
+        emulator.expire_tokens()
+        await fyta_connector.update_all_plants()
+        assert not fyta_connector.failed_plants
+        assert len(fyta_connector.plants) == 3
+        assert emulator.requests["/api/auth/login"] == 2
+
+        emulator.expire_tokens()
+        fyta_connector.client.stream_plant_list = True
+        assert len(await fyta_connector.client.get_plants()) == 3
+        assert emulator.requests["/api/auth/login"] == 3
+
+        # new access tokens are rejected as well
+        emulator.token_lifetime = timedelta(0)
+        emulator.expire_tokens()
+        with pytest.raises(FytaAuthentificationError):
+            await fyta_connector.client.get_plant_list()
+
+        await fyta_connector.client.close()
+
+
+async def test_metrics_collector() -> None:
+    """Test the instrumentation of requests against the FYTA emulator."""
+
+    collector = MetricsCollector(keep_slowest=3)
+
+    async with FytaEmulator(5, error_rate=0.3, seed=4) as emulator:
+        fyta_connector = emulator.connector(instrumentation=collector)
+        fyta_connector.client.retry_policy = RetryPolicy(
+            max_retries=10, base_delay=0.001
+        )
+
+        await fyta_connector.update_all_plants()
+        await fyta_connector.client.close()
+
+    assert emulator.errors > 0
+    assert collector.in_flight == 0
+    assert collector.token_refreshes == {"success": 1}
+    assert collector.requests[("plant", "GET", "200")].count == 5
+    assert collector.requests[("plant_list", "GET", "200")].count == 1
+    assert sum(collector.retries.values()) == emulator.errors
+    assert collector.plant_parse_time.count == 5
+    assert collector.sizes["plant"].count == 5
+    # JSON responses of the emulator are compressed as accepted by the client
+    assert collector.bytes_received[("plant", "deflate")] > 0
+
+    slowest = collector.slowest()
+    assert len(slowest) == 3
+    assert slowest[0].latency >= slowest[-1].latency
+
+    metrics = collector.as_dict()
+    assert metrics["requests"]["GET plant 200"]["count"] == 5
+
+    text = collector.export_prometheus()
+    assert (
+        'fyta_request_duration_seconds_count{endpoint="plant",method="GET",'
+        'status="200"} 5'
+    ) in text
+    assert 'fyta_token_refreshes_total{result="success"} 1' in text
+    assert 'fyta_plant_parse_duration_seconds_bucket{le="+Inf"} 5' in text
+    assert 'fyta_response_bytes_total{endpoint="plant",encoding="deflate"}' in text
+
+
+def test_histogram() -> None:
+    """Test the buckets and quantiles of histograms."""
+
+    histogram = Histogram((1.0, 2.0, 5.0))
+    for value in (0.5, 1.0, 1.5, 3.0, 10.0):
+        histogram.observe(value)
+
+    assert histogram.cumulative() == [(1.0, 2), (2.0, 3), (5.0, 4), (float("inf"), 5)]
+    assert histogram.quantile(0.5) == 2.0
+    assert histogram.sum == 16.0
+
+
+async def test_get_plant_data_coalesced(responses: aioresponses) -> None:
+    """Test that concurrent requests of a plant share one request."""
+    responses.get(
+        FYTA_PLANT_URL,
+        status=200,
+        body=load_fixture("get_user_plants.json"),
+    )
+    responses.get(
+        FYTA_PLANT_URL + f"/{0}",
+        status=200,
+        body=load_fixture("get_plant_details_0.json"),
+    )
+
+    fyta_connector = FytaConnector(
+        "example@example.com",
+        "examplepassword",
+        "111111111111111111111111111111111111111",
+        datetime.now() + timedelta(days=1)
+    )
+    fyta_connector.client.batch_window = 0.01
+    await fyta_connector.update_plant_list()
+
+    first, *others = await asyncio.gather(
+        *(fyta_connector.update_plant_data(0) for _ in range(3)),
+        fyta_connector.update_plant_data(2),
+    )
+
+    assert first is not None
+    assert others[:2] == [first, first]
+    assert others[2] is None  # plant without sensor, no request
+    assert not fyta_connector.client._plant_requests  # pylint: disable=protected-access
+
+    requests = [key for key in responses.requests if key[0] == "GET"]
+    assert len(requests) == 2
+    assert all(len(calls) == 1 for calls in responses.requests.values())
+
+    await fyta_connector.client.close()
+
+
+async def test_connector_snapshot() -> None:
+    """Test dump and load of the connector state."""
+
+    async with FytaEmulator(20, sensorless_ratio=0.2, seed=3) as emulator:
+        fyta_connector = emulator.connector(tz="Europe/Berlin")
+        await fyta_connector.update_all_plants(max_concurrency=4)
+        await fyta_connector.update_plant_measurements(
+            next(iter(fyta_connector.plants)), "day"
+        )
+        requests = sum(emulator.requests.values())
+        await fyta_connector.client.close()
+
+        data = fyta_connector.dump()
+        assert b"password" not in data
+
+        restored = emulator.connector(tz="Europe/Berlin")
+        restored.load(data)
+
+        assert sum(emulator.requests.values()) == requests
+        assert restored.client.token_valid
+        assert restored.access_token == fyta_connector.access_token
+        assert restored.expiration == fyta_connector.expiration
+        assert restored.plant_list == fyta_connector.plant_list
+        assert restored.plant_has_sensor == fyta_connector.plant_has_sensor
+        assert restored.plant_garden == fyta_connector.plant_garden
+        assert restored.plant_received_data_at == fyta_connector.plant_received_data_at
+        assert restored.plants == fyta_connector.plants
+        assert list(restored.measurements) == list(fyta_connector.measurements)
+        for plant_id, measurements in restored.measurements.items():
+            assert measurements == fyta_connector.measurements[plant_id]
+
+        await restored.update_all_plants(incremental=True)
+        assert sum(emulator.requests.values()) == requests + 1  # plant list only
+        await restored.client.close()
+
+        other = FytaConnector("other@example.com", "password")
+        with pytest.raises(ValueError):
+            other.load(data)
+        with pytest.raises(ValueError):
+            other.load(b"FYTA\x09\x00\x00")
+        with pytest.raises(ValueError):
+            fyta_connector.load(data[:-10])
+        await other.client.close()
+
+
+def _use_numpy(monkeypatch: pytest.MonkeyPatch, with_numpy: bool) -> None:
+    """Run the queries of the fleet view with or without numpy."""
+    if with_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(fyta_fleet, "HAS_NUMPY", False)
+
+
+@pytest.mark.parametrize("with_numpy", [True, False])
+async def test_fleet_view(
+    responses: aioresponses, monkeypatch: pytest.MonkeyPatch, with_numpy: bool
+) -> None:
+    """Test queries of the columnar fleet view."""
+    _use_numpy(monkeypatch, with_numpy)
+    responses.get(
+        FYTA_PLANT_URL,
+        status=200,
+        body=load_fixture("get_user_plants.json"),
+    )
+    for plant_id in (0, 1):
+        responses.get(
+            FYTA_PLANT_URL + f"/{plant_id}",
+            status=200,
+            body=load_fixture(f"get_plant_details_{plant_id}.json"),
+        )
+
+    fyta_connector = FytaConnector(
+        "example@example.com",
+        "examplepassword",
+        "111111111111111111111111111111111111111",
+        datetime.now() + timedelta(days=1)
+    )
+    await fyta_connector.update_all_plants()
+    plants = fyta_connector.plants
+
+    view = fyta_connector.fleet_view()
+    assert len(view) == 2
+
+    for field in ("moisture", "light", "temperature", "salinity"):
+        expected = [
+            plant_id
+            for plant_id, plant in plants.items()
+            if getattr(plant, field) is not None
+            and getattr(plant, field) < getattr(plant, f"{field}_min_good")
+        ]
+        assert view.ids(view.compare(field, "<", f"{field}_min_good")) == expected
+
+    low_light = view.compare("light", "<", "light_min_good")
+    battery = view.compare("battery_level", ">=", 50)
+    assert view.ids(view.all(low_light, battery)) == [
+        plant_id
+        for plant_id, plant in plants.items()
+        if plant.light is not None
+        and plant.light < plant.light_min_good  # type: ignore [operator]
+        and plant.battery_level is not None
+        and plant.battery_level >= 50
+    ]
+    assert view.ids(view.outside("light")) == view.ids(
+        view.any(low_light, view.compare("light", ">", "light_max_good"))
+    )
+
+    temperatures = [p.temperature for p in plants.values() if p.temperature is not None]
+    assert view.aggregate("temperature", "mean") == sum(temperatures) / len(temperatures)
+    assert view.aggregate("temperature", "max", by="garden") == {123: max(temperatures)}
+    statuses: dict[int, int] = {}
+    for plant in plants.values():
+        if plant.temperature is not None:
+            statuses[plant.moisture_status] = statuses.get(plant.moisture_status, 0) + 1
+    assert view.aggregate("temperature", "count", by="moisture_status") == statuses
+
+    empty = FleetView.from_plants({})
+    assert len(empty) == 0
+    assert empty.aggregate("temperature", "count") == 0
+    assert FleetView.from_plants(plants).aggregate(
+        "moisture", "count", by="garden"
+    ) == {NO_GARDEN: 2}
+
+    with pytest.raises(ValueError):
+        view.compare("unknown", "<", 1)
+
+    await fyta_connector.client.close()
+
+
+@pytest.mark.parametrize("with_numpy", [True, False])
+def test_fleet_view_missing_values(
+    monkeypatch: pytest.MonkeyPatch, with_numpy: bool
+) -> None:
+    """Test that plants without a value are never selected."""
+    _use_numpy(monkeypatch, with_numpy)
+    plants = {}
+    for plant_id in (0, 1):
+        plants[plant_id] = Plant.from_dict(
+            json.loads(load_fixture(f"get_plant_details_{plant_id}.json"))["plant"]
+        )
+    plants[1].moisture = None
+    view = FleetView.from_plants(plants)
+
+    for op in ("<", "<=", ">", ">=", "==", "!="):
+        assert 1 not in view.ids(view.compare("moisture", op, "moisture_min_good"))
+        assert 1 not in view.ids(view.compare("moisture", op, 50))
+        assert view.ids(view.compare("moisture_min_good", op, "moisture")) in (
+            [],
+            [0],
+        )
+        assert not view.ids(view.compare("moisture_min_good", op, math.nan))
+
+    assert view.ids(view.compare("moisture", "!=", -1)) == [0]
+
+
+def test_fleet_view_export() -> None:
+    """Test the export of the fleet view to NumPy."""
+
+    numpy = pytest.importorskip("numpy")
+
+    plant = Plant.from_dict(
+        json.loads(load_fixture("get_plant_details_0.json"))["plant"]
+    )
+    columns = FleetView.from_plants({0: plant}, {0: 123}).to_numpy()
+
+    assert columns["garden"].tolist() == [123]
+    assert numpy.isclose(columns["moisture"][0], plant.moisture)
+
+
+@pytest.mark.parametrize("executor_type", [ThreadPoolExecutor, ProcessPoolExecutor])
+async def test_update_all_plants_parse_executor(
+    responses: aioresponses,
+    executor_type: type[ThreadPoolExecutor] | type[ProcessPoolExecutor],
+) -> None:
+    """Test parsing of the plants in an executor."""
+    for _ in range(2):
+        responses.get(
+            FYTA_PLANT_URL,
+            status=200,
+            body=load_fixture("get_user_plants.json"),
+        )
+        for plant_id in (0, 1):
+            responses.get(
+                FYTA_PLANT_URL + f"/{plant_id}",
+                status=200,
+                body=load_fixture(f"get_plant_details_{plant_id}.json"),
+            )
+
+    fyta_connector = FytaConnector(
+        "example@example.com",
+        "examplepassword",
+        "111111111111111111111111111111111111111",
+        datetime.now() + timedelta(days=1),
+        tz="Europe/Berlin",
+    )
+    expected = await fyta_connector.update_all_plants()
+
+    with executor_type(max_workers=1) as executor:
+        fyta_connector.parse_executor = executor
+        fyta_connector.parse_batch_size = 1
+        plants = await fyta_connector.update_all_plants(max_concurrency=2)
+
+    assert plants == expected
+    assert plants[0].last_updated.tzinfo == expected[0].last_updated.tzinfo  # type: ignore [union-attr]
+
+    await fyta_connector.client.close()
+
+@pytest.mark.parametrize("executor_type", [None, ThreadPoolExecutor])
+async def test_update_all_plants_malformed_plant(
+    responses: aioresponses,
+    executor_type: type[ThreadPoolExecutor] | None,
+) -> None:
+    """Test that a malformed plant fails only this plant."""
+    responses.get(
+        FYTA_PLANT_URL,
+        status=200,
+        body=load_fixture("get_user_plants.json"),
+    )
+    responses.get(
+        FYTA_PLANT_URL + f"/{0}",
+        status=200,
+        body=load_fixture("get_plant_details_0.json"),
+    )
+    data = json.loads(load_fixture("get_plant_details_1.json"))
+    data["plant"]["status"] = "bad"
+    responses.get(
+        FYTA_PLANT_URL + f"/{1}",
+        status=200,
+        body=json.dumps(data),
+    )
+
+    fyta_connector = FytaConnector(
+        "example@example.com",
+        "examplepassword",
+        "111111111111111111111111111111111111111",
+        datetime.now() + timedelta(days=1),
+    )
+    if executor_type is not None:
+        fyta_connector.parse_executor = executor_type(max_workers=1)
+        fyta_connector.parse_batch_size = 2
+
+    plants = await fyta_connector.update_all_plants(max_concurrency=2)
+
+    assert list(plants) == [0]
+    assert fyta_connector.failed_plants == [1]
+
+    if fyta_connector.parse_executor is not None:
+        fyta_connector.parse_executor.shutdown()
+    await fyta_connector.client.close()
+
+
+async def test_update_plant_data_lazy(responses: aioresponses) -> None:
+    """Test lazy plants, which convert their fields on first access."""
+    for _ in range(2):
+        responses.get(
+            FYTA_PLANT_URL + f"/{0}",
+            status=200,
+            body=load_fixture("get_plant_details_0.json"),
+        )
+
+    fyta_connector = FytaConnector(
+        "example@example.com",
+        "examplepassword",
+        "111111111111111111111111111111111111111",
+        datetime.now() + timedelta(days=1),
+        tz="Europe/Berlin",
+    )
+    expected = await fyta_connector.update_plant_data(0)
+
+    fyta_connector.lazy_plants = True
+    plant = await fyta_connector.update_plant_data(0)
+
+    assert isinstance(plant, LazyPlant)
+    assert plant.moisture == 61.0
+    assert plant.moisture_status == PlantMeasurementStatus.PERFECT
+    # other fields are not converted yet
+    with pytest.raises(AttributeError):
+        object.__getattribute__(plant, "temperature")
+
+    assert plant == expected
+    assert plant.to_plant() == expected
+    assert not isinstance(plant.to_plant(), LazyPlant)
+    assert plant.last_updated.tzinfo == expected.last_updated.tzinfo  # type: ignore [union-attr]
+
+    await fyta_connector.client.close()
+
+
+@pytest.mark.parametrize(
+    ("key", "path"),
+    [
+        ("light_status", ("measurements", "light", "status")),
+        ("sensor_status", ("sensor", "status")),
+        ("status", ("status",)),
+    ],
+)
+def test_plant_malformed_status(key: str, path: tuple[str, ...]) -> None:
+    """Test that lazy and eager plants raise the same error for malformed data."""
+
+    data = json.loads(load_fixture("get_plant_details_0.json"))["plant"]
+    parent = data
+    for name in path[:-1]:
+        parent = parent[name]
+    parent[path[-1]] = "bad"
+
+    with pytest.raises(InvalidFieldValue) as eager_error:
+        Plant.from_dict(data)
+    with pytest.raises(InvalidFieldValue) as lazy_error:
+        getattr(LazyPlant.from_raw(data), key)
+
+    assert eager_error.value.field_name == lazy_error.value.field_name == key
+
+@pytest.mark.parametrize("key", ["sensor", "measurements"])
+def test_plant_missing_nested_data(key: str) -> None:
+    """Test that plants without sensor or measurements data are rejected."""
+
+    data = json.loads(load_fixture("get_plant_details_0.json"))["plant"]
+    del data[key]
+
+    with pytest.raises(MissingField):
+        Plant.from_dict(data)
+
+    lazy_plant = LazyPlant.from_raw(data)
+    with pytest.raises(MissingField):
+        lazy_plant.to_plant()
+
+
+@pytest.mark.parametrize("tz", ["Europe/Berlin", "America/New_York", "UTC"])
+def test_timestamp_codec(tz: str) -> None:
+    """Test that the timestamp codec converts as datetime.astimezone."""
+    zone = ZoneInfo(tz)
+    codec = TimestampCodec(zone)
+
+    # every 17 minutes of the year (incl. the daylight saving time changes)
+    value = datetime(2023, 1, 1)
+    while value < datetime(2024, 1, 1):
+        text = value.strftime("%Y-%m-%d %H:%M:%S")
+        expected = datetime.fromisoformat(text).astimezone(zone)
+        localized = codec.localize(text)
+        assert localized == expected
+        assert localized.utcoffset() == expected.utcoffset()
+        assert localized.tzinfo is zone
+        assert codec.epoch(text) == expected.timestamp()
+        value += timedelta(minutes=17)
+
+    assert codec.localize("2023-01-01 10:10:00") is codec.localize("2023-01-01 10:10:00")
+    assert utc_timestamp("2023-01-01 01:00:00") == datetime(2023, 1, 1, 1, tzinfo=UTC).timestamp()
+
+
+async def test_update_all_plants_timeout() -> None:
+    """Test that an update with timeout returns the plants fetched in time."""
+
+    async with FytaEmulator(20, latency=0.05) as emulator:
+        fyta_connector = emulator.connector()
+        await fyta_connector.login()
+
+        start = time.perf_counter()
+        plants = await fyta_connector.update_all_plants(max_concurrency=2, timeout=0.3)
+        elapsed = time.perf_counter() - start
+
+        # 20 plants with 2 in parallel take at least 0.5 s
+        assert elapsed < 0.4
+        assert plants
+        assert fyta_connector.failed_plants
+        assert set(plants) | set(fyta_connector.failed_plants) == set(
+            fyta_connector.plant_list
+        )
+        assert not fyta_connector.client._plant_requests  # pylint: disable=protected-access
+
+        plants = await fyta_connector.update_all_plants(max_concurrency=20, timeout=5)
+        assert len(plants) == 20
+        assert not fyta_connector.failed_plants
+
+        with pytest.raises(FytaConnectionError):
+            await fyta_connector.update_all_plants(timeout=0.01)
+
+        # waiting for a request slot (e.g. of a pool) counts toward the timeout
+        semaphore = asyncio.Semaphore(0)
+        fyta_connector.client.request_semaphore = semaphore
+        start = time.perf_counter()
+        with pytest.raises(FytaConnectionError):
+            await fyta_connector.update_all_plants(timeout=0.05)
+        assert time.perf_counter() - start < 0.5
+        assert semaphore.locked()
+
+        await fyta_connector.client.close()
+
+
+async def test_update_all_plants_timeout_shared_requests() -> None:
+    """Test that waiting for requests of other callers counts toward the timeout."""
+
+    async with FytaEmulator(3, sensorless_ratio=0, latency=1.0) as emulator:
+        fyta_connector = emulator.connector()
+        client = fyta_connector.client
+
+        # a login in flight of another caller
+        login = asyncio.create_task(client.login())
+        await asyncio.sleep(0)
+
+        start = time.perf_counter()
+        with pytest.raises(FytaConnectionError):
+            await fyta_connector.update_all_plants(timeout=0.2)
+        assert time.perf_counter() - start < 0.5
+
+        # the shared login is not cancelled by the timeout
+        await login
+        assert emulator.requests["/api/auth/login"] == 1
+
+        # a plant request in flight of another caller
+        plant_id = next(iter(emulator.plants))
+        request = asyncio.create_task(client.get_plant_data(plant_id))
+        await asyncio.sleep(0)
+
+        start = time.perf_counter()
+        with client.deadline(0.2):
+            with pytest.raises(FytaConnectionError):
+                await client.get_plant_data(plant_id)
+        assert time.perf_counter() - start < 0.5
+
+        assert (await request)["plant"]["id"] == plant_id
+
+        await client.close()
+
+async def test_shared_requests_deadline_of_waiter() -> None:
+    """Test that shared requests are not limited by the deadline of their starter."""
+
+    async def with_deadline(budget: float | None, request: Awaitable[Any]) -> Any:
+        with client.deadline(budget):
+            return await request
+
+    async with FytaEmulator(1, sensorless_ratio=0, latency=0.3) as emulator:
+        fyta_connector = emulator.connector()
+        client = fyta_connector.client
+
+        # the login is started by a caller with a short deadline
+        short = asyncio.create_task(with_deadline(0.05, client.login()))
+        await asyncio.sleep(0)
+        patient = asyncio.create_task(with_deadline(None, client.login()))
+
+        with pytest.raises(FytaConnectionError):
+            await short
+        assert (await patient).access_token == client.access_token
+        assert emulator.requests["/api/auth/login"] == 1
+
+        # the plant request is started by a caller with a short deadline
+        plant_id = next(iter(emulator.plants))
+        short = asyncio.create_task(
+            with_deadline(0.05, client.get_plant_data(plant_id))
+        )
+        await asyncio.sleep(0)
+        patient = asyncio.create_task(
+            with_deadline(None, client.get_plant_data(plant_id))
+        )
+
+        with pytest.raises(FytaConnectionError):
+            await short
+        assert (await patient)["plant"]["id"] == plant_id
+
+        await client.close()
+
+
+
+async def test_get_plant_data_encoding(responses: aioresponses) -> None:
+    """Test the negotiation of compressed responses."""
+    responses.get(
+        FYTA_PLANT_URL + f"/{0}",
+        status=200,
+        body=load_fixture("get_plant_details_0.json"),
+    )
+    responses.get(
+        FYTA_PLANT_URL + f"/{1}",
+        status=200,
+        body=load_fixture("get_plant_details_1.json"),
+        headers={"Content-Encoding": "compress"},
+    )
+
+    fyta_connector = FytaConnector(
+        "example@example.com",
+        "examplepassword",
+        "111111111111111111111111111111111111111",
+        datetime.now() + timedelta(days=1),
+    )
+
+    await fyta_connector.client.get_plant_data(0)
+    request = responses.requests[("GET", URL(FYTA_PLANT_URL + "/0"))][0]
+    headers = request.kwargs["headers"]
+    assert "gzip" in headers["Accept-Encoding"]
+    assert "Content-Type" not in headers
+    # the headers are built once and reused
+    client = fyta_connector.client
+    assert client._headers() is client._headers()  # pylint: disable=protected-access
+
+    with pytest.raises(FytaConnectionError):
+        await fyta_connector.client.get_plant_data(1)
+
+    await fyta_connector.client.close()
+
+
+async def test_sync_plant_measurements_same_day(
+    responses: aioresponses,
+) -> None:
+    """Test that the running DLI of the current day is updated by a sync."""
+    for light, dli_light, date in ((100, 1.5, "10:00:00"), (200, 2.5, "11:00:00")):
+        responses.post(
+            FYTA_PLANT_URL + f"/measurements/{0}",
+            status=200,
+            body=json.dumps(
+                {
+                    "measurements": [
+                        {"light": 50, "date_utc": "2023-01-02 09:00:00"},
+                        {"light": light, "date_utc": f"2023-01-02 {date}"},
+                    ],
+                    "dli_light": [
+                        {"dli_light": 3.0, "date_utc": "2023-01-01 00:00:00"},
+                        {"dli_light": dli_light, "date_utc": "2023-01-02 00:00:00"},
+                    ],
+                }
+            ),
+        )
+
+    fyta_connector = FytaConnector(
+        "example@example.com",
+        "examplepassword",
+        "111111111111111111111111111111111111111",
+        datetime.now() + timedelta(days=1)
+    )
+    await fyta_connector.sync_plant_measurements(0)
+    measurements = await fyta_connector.sync_plant_measurements(0)
+
+    assert list(measurements.light) == [50.0, 100.0, 200.0]
+    assert list(measurements.dli_light) == [3.0, 2.5]
+    assert len(measurements.dli_light_timestamps) == 2
+
+    await fyta_connector.client.close()
+
+
+def test_measurements_downsample() -> None:
+    """Test the aggregation of measurements into buckets."""
+    measurements = PlantMeasurements.from_dict(
+        {
+            "measurements": [
+                {"light": 1, "temperature": 18, "date_utc": "2023-01-01 01:30:00"},
+                {"light": 3, "temperature": None, "date_utc": "2023-01-01 01:00:00"},
+                {"light": 5, "temperature": 20, "date_utc": "2023-01-01 00:10:00"},
+            ],
+        }
+    )
+    start = datetime(2023, 1, 1, tzinfo=UTC).timestamp()
+
+    hourly = measurements.downsample(3600)
+    assert list(hourly.timestamps) == [start, start + 3600]
+    assert list(hourly.light) == [5.0, 2.0]
+    assert list(hourly.temperature) == [20.0, 18.0]
+    assert math.isnan(hourly.soil_moisture[0])
+
+    daily = measurements.downsample(86400, "max")
+    assert list(daily.timestamps) == [start]
+    assert list(daily.light) == [5.0]
+
+    assert measurements.trim(start + 3600) == 1
+    assert list(measurements.light) == [1.0, 3.0]
+
+    with pytest.raises(ValueError):
+        measurements.downsample(3600, "median")
+
+
+async def test_sync_plant_measurements() -> None:
+    """Test the incremental sync of measurement histories."""
+
+    async with FytaEmulator(1) as emulator:
+        fyta_connector = emulator.connector()
+
+        measurements = await fyta_connector.sync_plant_measurements(0)
+        assert len(measurements) == 720  # month
+        timestamps = list(measurements.timestamps)
+        assert timestamps == sorted(timestamps)
+
+        # the newest sample is just over an hour old, so the day timeline
+        # (every 15 minutes) is requested and its samples of the last hour
+        # are appended, samples older than 7 days are removed
+        measurements = await fyta_connector.sync_plant_measurements(
+            0, max_age=timedelta(days=7)
+        )
+        assert fyta_connector.measurements[0] is measurements
+        assert 3 <= len(measurements) - (7 * 24 - 1) <= 4
+        assert list(measurements.timestamps) == sorted(measurements.timestamps)
+        assert measurements.timestamps[0] >= time.time() - 7 * 86400
+
+        await fyta_connector.client.close()